@@ -0,0 +1 @@
+"""Benchmarks for dlink_dchs150_hass."""
@@ -0,0 +1,13 @@
+"""Fixtures for the dlink_dchs150_hass benchmarks."""
+
+from __future__ import annotations
+
+import pytest
+from pytest_socket import enable_socket, socket_allow_hosts
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_runtest_setup() -> None:
+    """Enable socket and allow local, for the simulated devices."""
+    enable_socket()
+    socket_allow_hosts(["127.0.0.1", "localhost", "::1"], allow_unix_socket=True)
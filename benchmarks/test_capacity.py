@@ -0,0 +1,235 @@
+"""
+How many devices one HA instance can poll before detections get to HA late.  For each
+fleet size, starts that many simulated devices in a child process, sets up a config
+entry for each in a test HA instance, lets them poll for a while, and measures:  CPU per
+poll, event loop lag, how late polls start, overruns, and how long a detection takes to
+become a state.  Run with `make capacity`;  the curve is saved under
+.benchmarks/capacity/, to compare across releases.
+
+CAPACITY_SIZES (default 10,50,200,500), CAPACITY_SECONDS (default 30) and
+CAPACITY_INTERVAL (default 1) override what gets measured.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.dchs150_motion.const import (
+    CONF_HOST,
+    CONF_INTERVAL,
+    CONF_PIN,
+    DOMAIN,
+)
+from custom_components.dchs150_motion.metrics import (
+    DetectionLatencyTracker,
+    LatencyHistogram,
+)
+from utils.hnap_simulator import serve_in_process
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from homeassistant.core import HomeAssistant
+
+    from custom_components.dchs150_motion.hass_integration import (
+        DlinkDchHassDataUpdateCoordinator,
+    )
+
+SIZES = [
+    int(size) for size in os.environ.get("CAPACITY_SIZES", "10,50,200,500").split(",")
+]
+SECONDS = float(os.environ.get("CAPACITY_SECONDS", "30"))
+INTERVAL = float(os.environ.get("CAPACITY_INTERVAL", "1"))
+# Let logins and the first polls settle before measuring
+WARM_UP_SECONDS = 5.0
+# How often, on average, each device detects something
+DETECT_EVERY_SECONDS = 5.0
+# How often to check how late the event loop is running
+LAG_PROBE_SECONDS = 0.05
+RESULTS = Path(__file__).parent.parent / ".benchmarks" / "capacity"
+
+_curve: list[dict[str, Any]] = []
+
+
+def _ms(histogram: LatencyHistogram) -> dict[str, float | None]:
+    """Summarize a histogram, in milliseconds."""
+    return {
+        name: None if value is None else round(value * 1000, 3)
+        for name, value in (
+            ("p50", histogram.percentile(0.5)),
+            ("p95", histogram.percentile(0.95)),
+            ("p99", histogram.percentile(0.99)),
+            ("max", histogram.max if histogram.count else None),
+        )
+    }
+
+
+def _merged(histograms: list[LatencyHistogram]) -> LatencyHistogram:
+    """Merge the histograms from every device."""
+    merged = LatencyHistogram()
+    for histogram in histograms:
+        merged.merge(histogram)
+    return merged
+
+
+async def _probe_loop_lag(lag: LatencyHistogram) -> None:
+    """Record how much later than asked for the event loop wakes us up."""
+    loop = asyncio.get_running_loop()
+    while True:
+        due = loop.time() + LAG_PROBE_SECONDS
+        await asyncio.sleep(LAG_PROBE_SECONDS)
+        lag.record(max(loop.time() - due, 0.0))
+
+
+def _manifest_version() -> str:
+    """Return the version of the integration being measured."""
+    manifest = (
+        Path(__file__).parent.parent / "custom_components" / DOMAIN / "manifest.json"
+    )
+    return json.loads(manifest.read_text(encoding="utf-8"))["version"]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def save_curve() -> Iterator[None]:
+    """Save (and show) the curve once every size has been measured."""
+    yield
+    if not _curve:
+        return
+    stamp = datetime.now(tz=UTC)
+    version = _manifest_version()
+    RESULTS.mkdir(parents=True, exist_ok=True)
+    path = RESULTS / f"{version}_{stamp:%Y%m%d_%H%M%S}.json"
+    path.write_text(
+        json.dumps(
+            {
+                "version": version,
+                "datetime": stamp.isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "interval": INTERVAL,
+                "seconds": SECONDS,
+                "curve": sorted(_curve, key=lambda point: point["devices"]),
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    print(f"\nCapacity curve saved to {path}")  # noqa: T201
+    print(  # noqa: T201
+        f"{'devices':>8} {'polls/s':>8} {'cpu/poll ms':>12} {'loop lag p99':>13} "
+        f"{'overruns':>9} {'detect p50':>11} {'detect p99':>11}",
+    )
+    for point in _curve:
+        print(  # noqa: T201
+            f"{point['devices']:>8} {point['polls_per_second']:>8.1f} "
+            f"{point['cpu_per_poll_ms']:>12.3f} {point['loop_lag_ms']['p99']!s:>13} "
+            f"{point['overruns']:>9} {point['detection_to_state_ms']['p50']!s:>11} "
+            f"{point['detection_to_state_ms']['p99']!s:>11}",
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("devices", SIZES)
+async def test_capacity(
+    hass: HomeAssistant,
+    enable_custom_integrations: None,  # noqa: ARG001
+    caplog: pytest.LogCaptureFixture,
+    devices: int,
+) -> None:
+    """Measure one point on the capacity curve."""
+    # Every detection gets logged, which would be most of what we measured
+    caplog.set_level(logging.WARNING, logger="custom_components.dchs150_motion")
+    # The test HA runs its loop in debug mode, which is far slower than the real thing
+    hass.loop.set_debug(False)
+    connection, child_connection = multiprocessing.Pipe()
+    fleet = multiprocessing.get_context("spawn").Process(
+        target=serve_in_process,
+        args=(devices, child_connection, DETECT_EVERY_SECONDS),
+        daemon=True,
+    )
+    fleet.start()
+    try:
+        addresses = await hass.async_add_executor_job(connection.recv)
+        entries = [
+            MockConfigEntry(
+                domain=DOMAIN,
+                title=address,
+                data={CONF_HOST: address, CONF_PIN: "123456"},
+                options={CONF_INTERVAL: INTERVAL},
+            )
+            for address in addresses
+        ]
+        for entry in entries:
+            entry.add_to_hass(hass)
+
+        started = time.monotonic()
+        assert await async_setup_component(hass, DOMAIN, {})
+        await hass.async_block_till_done()
+        setup_seconds = time.monotonic() - started
+        coordinators: list[DlinkDchHassDataUpdateCoordinator] = [
+            hass.data[DOMAIN][entry.entry_id] for entry in entries
+        ]
+
+        await asyncio.sleep(WARM_UP_SECONDS)
+        for coordinator in coordinators:
+            coordinator.latency = DetectionLatencyTracker()
+            coordinator.loop_lag = LatencyHistogram()
+        polls = sum(c.polls_succeeded + c.polls_failed for c in coordinators)
+        failed = sum(c.polls_failed for c in coordinators)
+        overruns = sum(c.overruns for c in coordinators)
+        loop_lag = LatencyHistogram()
+        probe = asyncio.create_task(_probe_loop_lag(loop_lag))
+        cpu = time.process_time()
+        started = time.monotonic()
+
+        await asyncio.sleep(SECONDS)
+
+        elapsed = time.monotonic() - started
+        cpu = time.process_time() - cpu
+        probe.cancel()
+        polls = sum(c.polls_succeeded + c.polls_failed for c in coordinators) - polls
+        failed = sum(c.polls_failed for c in coordinators) - failed
+        detection = _merged([c.latency.end_to_end for c in coordinators])
+        _curve.append(
+            {
+                "devices": devices,
+                "setup_seconds": round(setup_seconds, 3),
+                "polls": polls,
+                "failed_polls": failed,
+                "polls_per_second": polls / elapsed,
+                "cpu_per_poll_ms": cpu / polls * 1000 if polls else None,
+                "cpu_busy": cpu / elapsed,
+                "loop_lag_ms": _ms(loop_lag),
+                "poll_start_lag_ms": _ms(_merged([c.loop_lag for c in coordinators])),
+                "overruns": sum(c.overruns for c in coordinators) - overruns,
+                "behind": sum(c.behind for c in coordinators),
+                "detections": detection.count,
+                "detection_to_state_ms": _ms(detection),
+            },
+        )
+
+        for entry in entries:
+            assert await hass.config_entries.async_unload(entry.entry_id)
+        await hass.async_block_till_done()
+    finally:
+        connection.send("stop")
+        fleet.join(timeout=10)
+        if fleet.is_alive():
+            fleet.kill()
+
+    # Everything should have been polled, at the very least
+    assert polls >= devices
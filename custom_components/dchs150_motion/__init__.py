@@ -5,36 +5,63 @@ For more details about this integration, please refer to
 https://github.com/updrytwist/dlink-dchs150-hass
 """
 
+from __future__ import annotations
+
 import logging
+import sys
+from importlib import import_module
+from typing import TYPE_CHECKING
 
 __version__ = "0.3.0-dev0"
 
 __all__: list[str] = []
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.core_config import Config
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+    from homeassistant.core_config import Config
 
-from .hass_integration import HassIntegration
+    from .hass_integration import HassIntegration as HassIntegrationType
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
 
+async def _async_hass_integration(hass: HomeAssistant) -> type[HassIntegrationType]:
+    """
+    Return the HA side of the integration, importing it (off the event loop) the
+    first time.  Nothing here imports HA, so that the HNAP client (dch_wifi) can be
+    used, and imported quickly, without it.
+    """
+    name = f"{__package__}.hass_integration"
+    if (module := sys.modules.get(name)) is None:
+        module = await hass.async_add_import_executor_job(import_module, name)
+    return module.HassIntegration
+
+
 async def async_setup(hass: HomeAssistant, _config: Config) -> bool:
     """Perform setup.  Setup using YAML not supported . . ."""
-    return await HassIntegration.async_setup(hass)
+    integration = await _async_hass_integration(hass)
+    return await integration.async_setup(hass)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Perform initial setup."""
-    return await HassIntegration.async_setup_entry(hass, entry)
+    integration = await _async_hass_integration(hass)
+    return await integration.async_setup_entry(hass, entry)
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Handle removal of an entry."""
-    return await HassIntegration.async_unload_entry(hass, entry)
+    integration = await _async_hass_integration(hass)
+    return await integration.async_unload_entry(hass, entry)
 
 
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Reload config entry."""
-    await HassIntegration.async_reload_entry(hass, entry)
+    """Reload config entry (through HA, so its on-unload callbacks run)."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Handle the config entry being deleted."""
+    integration = await _async_hass_integration(hass)
+    await integration.async_remove_entry(hass, entry)
@@ -2,17 +2,21 @@
 
 from __future__ import annotations
 
+import calendar
+import copy
 import logging
-from datetime import date, datetime, timedelta
+from datetime import UTC, date, datetime, timedelta, tzinfo
 from typing import TYPE_CHECKING, Any
+from zoneinfo import ZoneInfo
 
 if TYPE_CHECKING:
     import aiohttp
 import homeassistant.util.dt
-import pytz
 
 if TYPE_CHECKING:
-    from homeassistant.config_entries import ConfigEntry
+    from collections.abc import Mapping
+
+    from .recording import TrafficRecorder
 
 from .const import (
     CONF_BACKOFF,
@@ -35,7 +39,16 @@ from .const import (
     DEFAULT_OP_STATUS,
     DEFAULT_SENSITIVITY,
 )
-from .dch_wifi import DeviceDetectionSettingsInfo, HNAPClient, NanoSOAPClient, TimeInfo
+from .dch_wifi import (
+    DeviceDetectionSettingsInfo,
+    HNAPClient,
+    HNAPMetrics,
+    MetadataCache,
+    NanoSOAPClient,
+    TimeInfo,
+    parse_detect_time,
+)
+from .tracing import tracer
 
 ACTION_BASE_URL = "http://purenetworks.com/HNAP1/"
 DEFAULT_LOGIN_NAME = "Admin"
@@ -45,111 +58,245 @@ _LOGGER: logging.Logger = logging.getLogger(__name__)
 HEADERS = {"Content-type": "application/json; charset=UTF-8"}
 
 
-def set_if_set(entry: ConfigEntry, key: str, default_value: Any) -> Any:  # noqa: ANN401
+def set_if_set(options: Mapping[str, Any], key: str, default_value: Any) -> Any:  # noqa: ANN401
     """If we have an option set, use it, otherwise stick to old."""
-    value = entry.options.get(key)
+    value = options.get(key)
     return value if value else default_value
 
 
 def fill_in_device_settings(
-    entry: ConfigEntry,
+    options: Mapping[str, Any],
 ) -> DeviceDetectionSettingsInfo | None:
-    """Fill in the info we're going to use to set up the device's motion/water settings."""
-    _LOGGER.debug("Fill in device settings: %s", entry.options)
-    if entry.options.get(CONF_BACKOFF):
+    """
+    Fill in the info we're going to use to set up the device's motion/water settings,
+    from an entry's options.
+    """
+    _LOGGER.debug("Fill in device settings: %s", options)
+    if options.get(CONF_BACKOFF) or options.get(CONF_SENSITIVITY):
         device_settings_info = DeviceDetectionSettingsInfo()
         device_settings_info.backoff = set_if_set(
-            entry,
+            options,
             CONF_BACKOFF,
             DEFAULT_BACKOFF_SECONDS,
         )
         device_settings_info.sensitivity = set_if_set(
-            entry,
+            options,
             CONF_SENSITIVITY,
             DEFAULT_SENSITIVITY,
         )
         device_settings_info.op_status = set_if_set(
-            entry,
+            options,
             CONF_OP_STATUS,
             DEFAULT_OP_STATUS,
         )
-        device_settings_info.nick_name = set_if_set(entry, CONF_NICK_NAME, None)
-        device_settings_info.description = set_if_set(entry, CONF_DESCRIPTION, None)
+        device_settings_info.nick_name = set_if_set(options, CONF_NICK_NAME, None)
+        device_settings_info.description = set_if_set(options, CONF_DESCRIPTION, None)
         return device_settings_info
     return None
 
 
-def fill_in_timezone(
-    time_zone_string: str,
-    entry: ConfigEntry | None = None,
-) -> TimeInfo:
-    """Fill in the info we're going to use to set up the device's time."""
+# Time info for each time zone, and the time (UTC) after which it needs recomputing
+_TIME_INFO_CACHE: dict[str, tuple[TimeInfo, datetime | None]] = {}
+
+# How far ahead we look for the next DST transition
+TRANSITION_SEARCH_DAYS = 366
+
+
+def next_utc_offset_change(zone: tzinfo, after: datetime) -> datetime | None:
+    """Find when a zone's UTC offset next changes (i.e., a DST transition), if ever."""
+    offset = after.astimezone(zone).utcoffset()
+    low = after
+    for _ in range(TRANSITION_SEARCH_DAYS):
+        high = low + timedelta(days=1)
+        if high.astimezone(zone).utcoffset() != offset:
+            break
+        low = high
+    else:
+        return None
+    # Narrow it down to the second
+    while high - low > timedelta(seconds=1):
+        middle = low + (high - low) / 2
+        if middle.astimezone(zone).utcoffset() == offset:
+            low = middle
+        else:
+            high = middle
+    return high.replace(microsecond=0)
+
+
+def dst_rule(zone: tzinfo, transition: datetime) -> tuple[int, int, int, str]:
+    """
+    Describe a DST transition the way the device wants it:  month, week of the month
+    (5 meaning the last), day of the week (0 is Sunday), and local time (e.g. 2:00AM)
+    on the clock as it was just before the change.
+    """
+    local = (transition - timedelta(seconds=1)).astimezone(zone) + timedelta(seconds=1)
+    days_in_month = calendar.monthrange(local.year, local.month)[1]
+    week = 5 if local.day + 7 > days_in_month else (local.day - 1) // 7 + 1
+    day_of_week = (local.weekday() + 1) % 7
+    hour = local.hour % 12 or 12
+    am_pm = "AM" if local.hour < 12 else "PM"  # noqa: PLR2004
+    return local.month, week, day_of_week, f"{hour}:{local.minute:02d}{am_pm}"
+
+
+def fill_in_dst_rules(time_info: TimeInfo, zone: tzinfo, now: datetime) -> bool:
+    """
+    Fill in the DST start and end rules from the zone's transitions this year.
+    Returns whether the zone has DST this year.
+    """
+    start = end = None
+    after = datetime(now.year, 1, 1, tzinfo=UTC)
+    while (start is None or end is None) and (
+        transition := next_utc_offset_change(zone, after)
+    ):
+        if transition.year != now.year:
+            break
+        if transition.astimezone(zone).dst():
+            start = start or transition
+        else:
+            end = end or transition
+        after = transition
+    if start is None or end is None:
+        # Doesn't do DST (or stopped this year), so the defaults are as good as any
+        return False
+    (
+        time_info.tz_dst_start_month,
+        time_info.tz_dst_start_week,
+        time_info.tz_dst_start_day_of_week,
+        time_info.tz_dst_start_time,
+    ) = dst_rule(zone, start)
+    (
+        time_info.tz_dst_end_month,
+        time_info.tz_dst_end_week,
+        time_info.tz_dst_end_day_of_week,
+        time_info.tz_dst_end_time,
+    ) = dst_rule(zone, end)
+    return True
+
+
+def time_info_valid_until(time_zone_string: str) -> datetime | None:
+    """Return when the cached time info for the zone next needs recomputing."""
+    cached = _TIME_INFO_CACHE.get(time_zone_string)
+    return cached[1] if cached else None
+
+
+def compute_time_info(time_zone_string: str, now: datetime) -> TimeInfo:
+    """
+    Work out the time info for a time zone as of now.  The device applies DST itself,
+    from the rules, so it gets the standard offset and whether the zone observes DST:
+    neither changes at a transition, so a transition doesn't mean a push.
+    """
     time_info = TimeInfo()
+    zone = ZoneInfo(time_zone_string)
+    local_now = now.astimezone(zone)
+    standard_offset = (local_now.utcoffset() or timedelta()) - (
+        local_now.dst() or timedelta()
+    )
+    hours = standard_offset.total_seconds() / (60 * 60)
+    time_info.tz_offset = round(hours)
+    if time_info.tz_offset != hours:
+        # The device only takes whole hours, so get as close as we can
+        _LOGGER.warning(
+            "%s is %s from UTC, but the device can only be set to whole hours, "
+            "so its clock will be set to %+d hours",
+            time_zone_string,
+            standard_offset,
+            time_info.tz_offset,
+        )
+    time_info.tz_dst = fill_in_dst_rules(time_info, zone, local_now)
+    return time_info
 
-    if time_zone_string:
-        tzinfo = homeassistant.util.dt.get_time_zone(time_zone_string)
-        t_now = datetime.now(tzinfo)
-        utc_offset = t_now.utcoffset()
-        t_utcoffset = utc_offset.total_seconds() if utc_offset else 0
 
-        tz_info = pytz.timezone(time_zone_string)
-        now = datetime.now(tz=tz_info)
-        is_dst = now.astimezone(tz_info).dst() != timedelta(0)
+def get_time_info(time_zone_string: str) -> TimeInfo:
+    """
+    Get the time info for a time zone.  This is computed once and shared, until the
+    zone's next DST transition.  Don't modify what you get back - copy it.
+    """
+    now = datetime.now(tz=UTC)
+    cached = _TIME_INFO_CACHE.get(time_zone_string)
+    if cached and (cached[1] is None or now < cached[1]):
+        return cached[0]
+
+    time_info = compute_time_info(time_zone_string, now)
+    valid_until = next_utc_offset_change(ZoneInfo(time_zone_string), now)
+    _TIME_INFO_CACHE[time_zone_string] = (time_info, valid_until)
+
+    _LOGGER.debug(
+        "Time zone settings: Time string from config = %s, "
+        "Daylight Savings = %s TZ Offset = %s, "
+        "DST from %s/%s/%s %s to %s/%s/%s %s, good until %s",
+        time_zone_string,
+        time_info.tz_dst,
+        time_info.tz_offset,
+        time_info.tz_dst_start_month,
+        time_info.tz_dst_start_week,
+        time_info.tz_dst_start_day_of_week,
+        time_info.tz_dst_start_time,
+        time_info.tz_dst_end_month,
+        time_info.tz_dst_end_week,
+        time_info.tz_dst_end_day_of_week,
+        time_info.tz_dst_end_time,
+        valid_until,
+    )
+    return time_info
 
-        time_info.tz_dst = is_dst
-        time_info.tz_offset = int(t_utcoffset / (60 * 60))
 
-        _LOGGER.debug(
-            "Time zone settings: Time string from config = %s, "
-            "UTC Offset = %s >> Daylight Savings = %s TZ Offset = %s",
-            time_zone_string,
-            t_utcoffset,
-            is_dst,
-            time_info.tz_offset,
+def fill_in_timezone(
+    time_zone_string: str,
+    options: Mapping[str, Any] | None = None,
+) -> TimeInfo:
+    """
+    Fill in the info we're going to use to set up the device's time, overridden by
+    an entry's options.
+    """
+    time_info = (
+        copy.copy(get_time_info(time_zone_string)) if time_zone_string else TimeInfo()
+    )
+
+    if options:
+        time_info.ntp_server = set_if_set(
+            options, CONF_NTP_SERVER, time_info.ntp_server
         )
-    if entry:
-        time_info.ntp_server = set_if_set(entry, CONF_NTP_SERVER, time_info.ntp_server)
         time_info.tz_offset = int(
-            set_if_set(entry, CONF_TZ_OFFSET, time_info.tz_offset),
+            set_if_set(options, CONF_TZ_OFFSET, time_info.tz_offset),
         )
-        time_info.tz_dst = bool(set_if_set(entry, CONF_TZ_DST, time_info.tz_dst))
+        time_info.tz_dst = bool(set_if_set(options, CONF_TZ_DST, time_info.tz_dst))
         time_info.tz_dst_start_month = set_if_set(
-            entry,
+            options,
             CONF_TZ_DST_START_MONTH,
             time_info.tz_dst_start_month,
         )
         time_info.tz_dst_start_week = set_if_set(
-            entry,
+            options,
             CONF_TZ_DST_START_WEEK,
             time_info.tz_dst_start_week,
         )
         time_info.tz_dst_start_day_of_week = set_if_set(
-            entry,
+            options,
             CONF_TZ_DST_START_DAY_OF_WEEK,
             time_info.tz_dst_start_day_of_week,
         )
         time_info.tz_dst_start_time = set_if_set(
-            entry,
+            options,
             CONF_TZ_DST_START_TIME,
             time_info.tz_dst_start_time,
         )
         time_info.tz_dst_end_month = set_if_set(
-            entry,
+            options,
             CONF_TZ_DST_END_MONTH,
             time_info.tz_dst_end_month,
         )
         time_info.tz_dst_end_week = set_if_set(
-            entry,
+            options,
             CONF_TZ_DST_END_WEEK,
             time_info.tz_dst_end_week,
         )
         time_info.tz_dst_end_day_of_week = set_if_set(
-            entry,
+            options,
             CONF_TZ_DST_END_DAY_OF_WEEK,
             time_info.tz_dst_end_day_of_week,
         )
         time_info.tz_dst_end_time = set_if_set(
-            entry,
+            options,
             CONF_TZ_DST_END_TIME,
             time_info.tz_dst_end_time,
         )
@@ -186,9 +333,12 @@ class DlinkDchHassApiClient:
             time_info,
             device_detection_settings_info,
             loop=None,
+            time_zone=homeassistant.util.dt.DEFAULT_TIME_ZONE,
         )
         self._prev_detect_time = None
         self._last_detect_time = None
+        # The last detection time as the device reported it, before skew correction
+        self._last_device_detect_time = None
 
     @property
     def device_type(self) -> str:
@@ -211,6 +361,44 @@ class DlinkDchHassApiClient:
         )
         return f"{device_name}{mac_address}{self._client.url_address}"
 
+    @property
+    def metadata_cache(self) -> MetadataCache:
+        """Return the device metadata cache."""
+        return self._client.metadata_cache
+
+    @property
+    def call_metrics(self) -> HNAPMetrics:
+        """Return the per-call latency and error metrics for the device."""
+        return self._client.metrics
+
+    def diagnostics(self) -> dict[str, Any]:
+        """Return a snapshot of the device's state, without talking to it."""
+        return self._client.diagnostics()
+
+    def start_recording(self) -> TrafficRecorder:
+        """Start recording our exchanges with the device."""
+        # Only imported when someone asks for a recording
+        from .recording import TrafficRecorder  # noqa: PLC0415
+
+        recorder = TrafficRecorder(self._host)
+        self._soap.recorder = recorder
+        return recorder
+
+    def stop_recording(self) -> TrafficRecorder | None:
+        """Stop recording, returning what was recorded (if we were recording)."""
+        recorder, self._soap.recorder = self._soap.recorder, None
+        return recorder
+
+    @property
+    def shed_optional_calls(self) -> bool:
+        """Return whether we're skipping calls we can live without."""
+        return self._client.shed_optional_calls
+
+    @shed_optional_calls.setter
+    def shed_optional_calls(self, value: bool) -> None:
+        """Start or stop skipping calls we can live without."""
+        self._client.shed_optional_calls = value
+
     @property
     def detection_type(self) -> str:
         """Return 'motion' or 'water'."""
@@ -218,7 +406,8 @@ class DlinkDchHassApiClient:
 
     async def async_get_data(self) -> dict:
         """Get data from the API."""
-        last_detection = await self.get_latest_detection()
+        with tracer.span("async_get_data"):
+            last_detection = await self.get_latest_detection()
         return {
             "last_detection": last_detection,
             "mac_address": self._client.mac_address,
@@ -227,8 +416,32 @@ class DlinkDchHassApiClient:
             "hardware_version": self._client.hardware_version,
             "device_name": self._client.device_name,
             "vendor_name": self._client.vendor_name,
+            "clock_offset": self.clock_offset,
         }
 
+    async def async_update_settings(
+        self,
+        time_info: TimeInfo | None,
+        device_detection_settings_info: DeviceDetectionSettingsInfo | None,
+    ) -> None:
+        """Apply new settings to the live device, only sending what changed."""
+        if await self._client.update_time_info(time_info):
+            _LOGGER.debug("Updated time settings on %s", self.full_device_name)
+        if await self._client.update_device_detection_settings(
+            device_detection_settings_info,
+        ):
+            _LOGGER.debug("Updated detection settings on %s", self.full_device_name)
+
+    async def async_update_time_info(self, time_info: TimeInfo | None) -> None:
+        """
+        Apply new time settings to the live device if they changed, otherwise just
+        check the device still has ours.
+        """
+        if await self._client.update_time_info(time_info):
+            _LOGGER.debug("Updated time settings on %s", self.full_device_name)
+        elif await self._client.verify_time_settings():
+            _LOGGER.info("Re-pushed time settings to %s", self.full_device_name)
+
     async def get_device_type(self) -> str:
         """Get the type of device that we are: DCH-S150 or DCH-S160."""
         if not self._client.model_name:
@@ -251,14 +464,21 @@ class DlinkDchHassApiClient:
         """Get motion detector settings."""
         return await self._client.get_device_detector_settings()
 
+    @property
+    def clock_offset(self) -> float | None:
+        """Return how far ahead (seconds) the device's clock is of ours, if known."""
+        return self._client.clock_skew.offset
+
     async def get_latest_detection(self) -> date:
         """Get the last motion detected time."""
         resp = await self._client.get_latest_detection()
-        if "LatestDetectTime" not in resp or not (
-            isinstance(resp["LatestDetectTime"], (float, str))
-        ):
+        device_detected = parse_detect_time(
+            resp.get("LatestDetectTime"),
+            homeassistant.util.dt.DEFAULT_TIME_ZONE,
+        )
+        if device_detected is None:
             # Not sure exactly what this means, but return something in the past.
-            last_detected = datetime(
+            device_detected = datetime(
                 year=2020,
                 month=1,
                 day=1,
@@ -267,23 +487,25 @@ class DlinkDchHassApiClient:
                 second=1,
                 tzinfo=homeassistant.util.dt.DEFAULT_TIME_ZONE,
             )
-        else:
-            last_detected = datetime.fromtimestamp(
-                float(resp["LatestDetectTime"]),
-                tz=homeassistant.util.dt.DEFAULT_TIME_ZONE,
-            )
+        if self._last_detect_time and device_detected == self._last_device_detect_time:
+            # Same detection, so keep the time we settled on, even if our idea of the
+            # device's clock has moved a little since
+            return self._last_detect_time
+
+        last_detected = self._client.clock_skew.correct(device_detected)
         current_time = datetime.now(
             tz=homeassistant.util.dt.DEFAULT_TIME_ZONE,
         )
-        if not self._last_detect_time or last_detected != self._last_detect_time:
-            _LOGGER.info(
-                "Detected new %s on %s - was %s now %s - current time: %s",
-                self.detection_type,
-                self._client.get_name(),
-                self._last_detect_time,
-                last_detected,
-                current_time,
-            )
-            self._prev_detect_time = self._last_detect_time
-            self._last_detect_time = last_detected
+        _LOGGER.info(
+            "Detected new %s on %s - was %s now %s (device says %s) - current time: %s",
+            self.detection_type,
+            self._client.get_name(),
+            self._last_detect_time,
+            last_detected,
+            device_detected,
+            current_time,
+        )
+        self._prev_detect_time = self._last_detect_time
+        self._last_detect_time = last_detected
+        self._last_device_detect_time = device_detected
         return last_detected
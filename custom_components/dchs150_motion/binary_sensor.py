@@ -3,14 +3,21 @@
 from __future__ import annotations
 
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import homeassistant.util.dt
 from homeassistant.components.binary_sensor import (
     BinarySensorDeviceClass,
     BinarySensorEntity,
 )
+from homeassistant.core import callback
+from homeassistant.helpers.restore_state import (
+    ExtraStoredData,
+    RestoredExtraData,
+    RestoreEntity,
+)
 
 if TYPE_CHECKING:
     from homeassistant.config_entries import ConfigEntry
@@ -20,7 +27,7 @@ if TYPE_CHECKING:
 
 from .const import CONF_BACKOFF, DEFAULT_BACKOFF_SECONDS, DEFAULT_SENSOR_NAME, DOMAIN
 from .dch_wifi import UnsupportedDeviceTypeError
-from .entity import DlinkDchHassEntity
+from .entity import DlinkDchHassEntity, restorable_data
 
 _LOGGER: logging.Logger = logging.getLogger(__name__)
 
@@ -36,15 +43,40 @@ async def async_setup_entry(
     async_add_devices([DlinkDchHassBinarySensor(coordinator, entry)])
 
 
-class DlinkDchHassBinarySensor(DlinkDchHassEntity, BinarySensorEntity):  # pyright: ignore
+class DlinkDchHassBinarySensor(DlinkDchHassEntity, BinarySensorEntity, RestoreEntity):  # pyright: ignore
     """dlink_DCH_hass_sensor class."""
 
     # TODO(tathamg@gmail.com): Resolve the incompatibility between Entity.available and CoordinatorEntity.available (want to use the latter) # noqa: TD003 FIX002
 
+    # Diagnostics, not worth keeping history of
+    _unrecorded_attributes = frozenset({"clock_offset"})
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the new state, and note how long the detection took to get here."""
+        super()._handle_coordinator_update()
+        self.coordinator.latency.written(time.time())
+
+    @property
+    def extra_restore_state_data(self) -> ExtraStoredData | None:
+        """Return what we need to pick up where we left off after a restart."""
+        if not self.data:
+            return None
+        return RestoredExtraData(restorable_data(self.data))
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:  # pyright: ignore
+        """Return diagnostic attributes."""
+        clock_offset = self.data.get("clock_offset")
+        # Whole seconds, so the attribute doesn't flap with every poll
+        return {
+            "clock_offset": round(clock_offset) if clock_offset is not None else None,
+        }
+
     @property
     def name(self) -> str | UndefinedType | None:  # pyright: ignore
         """Return the name of the binary_sensor."""
-        name = self.coordinator.data.get("device_name")
+        name = self.data.get("device_name")
         if not name:
             name = DEFAULT_SENSOR_NAME
         return name
@@ -52,7 +84,7 @@ class DlinkDchHassBinarySensor(DlinkDchHassEntity, BinarySensorEntity):  # pyrig
     @property
     def device_class(self) -> BinarySensorDeviceClass | None:  # pyright: ignore
         """Return the class of this binary_sensor."""
-        model_name = self.coordinator.data.get("model_name")
+        model_name = self.data.get("model_name")
         if model_name == "DCH-S150":
             return BinarySensorDeviceClass.MOTION
         if model_name == "DCH-S160":
@@ -65,7 +97,7 @@ class DlinkDchHassBinarySensor(DlinkDchHassEntity, BinarySensorEntity):  # pyrig
         backoff_seconds = self.config_entry.data.get(CONF_BACKOFF)
         if not backoff_seconds:
             backoff_seconds = DEFAULT_BACKOFF_SECONDS
-        last_detect_time = self.coordinator.data.get("last_detection")
+        last_detect_time = self.data.get("last_detection")
         current_time = datetime.now(
             tz=homeassistant.util.dt.DEFAULT_TIME_ZONE,
         )
@@ -3,13 +3,12 @@
 from __future__ import annotations
 
 import logging
-from functools import partial
 from typing import Any
 
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import callback
-from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from voluptuous import All, Length
 
 from .api import DlinkDchHassApiClient, fill_in_device_settings, fill_in_timezone
@@ -18,11 +17,13 @@ from .const import (
     CONF_DESCRIPTION,
     CONF_HOST,
     CONF_INTERVAL,
+    CONF_METRICS_EXPORT,
     CONF_NICK_NAME,
     CONF_NTP_SERVER,
     CONF_OP_STATUS,
     CONF_PIN,
     CONF_SENSITIVITY,
+    CONF_SUBNETS,
     CONF_TZ_DST,
     CONF_TZ_DST_END_DAY_OF_WEEK,
     CONF_TZ_DST_END_MONTH,
@@ -33,6 +34,7 @@ from .const import (
     CONF_TZ_DST_START_TIME,
     CONF_TZ_DST_START_WEEK,
     CONF_TZ_OFFSET,
+    DEFAULT_METRICS_EXPORT,
     DEVICE_POLLING_FREQUENCY,
     DOMAIN,
 )
@@ -47,9 +49,23 @@ from .dch_wifi import (
     UnableToResolveHostError,
     UnsupportedDeviceTypeError,
 )
+from .discovery import DiscoveredDevice, local_subnet, scan, subnet_hosts
 
 _LOGGER: logging.Logger = logging.getLogger(__name__)
 
+# How each failure to validate a device is reported:  the field it's down to, and the
+# error (also the abort reason, when importing)
+_VALIDATION_ERRORS: dict[type[Exception], tuple[str, str]] = {
+    AuthenticationError: (CONF_PIN, "authentication_error"),
+    GeneralCommunicationError: (CONF_HOST, "general_communication"),
+    DeviceReturnedError: ("base", "device_returned_error"),
+    RebootingError: ("base", "rebooting"),
+    UnableToResolveHostError: (CONF_HOST, "unable_to_resolve_host"),
+    UnableToConnectError: (CONF_HOST, "unable_to_connect"),
+    InvalidDeviceStateError: ("base", "invalid_device_state"),
+    UnsupportedDeviceTypeError: ("base", "unsupported_device_type"),
+}
+
 
 class DlinkDchHassOptionsFlowHandler(config_entries.OptionsFlow):
     """Config flow options handler for dlink_dch_hass."""
@@ -75,15 +91,22 @@ class DlinkDchHassOptionsFlowHandler(config_entries.OptionsFlow):
     async def load_device_detection_defaults(self) -> None:
         """Load the motion detection defaults."""
         _LOGGER.debug("Loading motion detection defaults")
-        session = async_create_clientsession(self.hass)
-        host = self.config_entry.data.get(CONF_HOST)
-        pin = self.config_entry.data.get(CONF_PIN)
-        if not host or not pin:
-            raise ValueError("Host or pin not found in config entry")
-        client = DlinkDchHassApiClient(host, pin, session, None, None)
+        coordinator = self.hass.data.get(DOMAIN, {}).get(self.config_entry.entry_id)
+        if coordinator is not None:
+            # Use the running client (and its cached settings), rather than logging in again
+            client = coordinator.api
+        else:
+            session = async_get_clientsession(self.hass)
+            host = self.config_entry.data.get(CONF_HOST)
+            pin = self.config_entry.data.get(CONF_PIN)
+            if not host or not pin:
+                raise ValueError("Host or pin not found in config entry")
+            client = DlinkDchHassApiClient(host, pin, session, None, None)
         settings = await client.async_get_device_detector_settings()
         _LOGGER.debug("Got device detector settings of: %s", settings)
-        self.device_detection_defaults = fill_in_device_settings(self.config_entry)
+        self.device_detection_defaults = fill_in_device_settings(
+            self.config_entry.options,
+        )
         if not self.device_detection_defaults:
             self.device_detection_defaults = DeviceDetectionSettingsInfo()
         if "Backoff" in settings:
@@ -121,6 +144,7 @@ class DlinkDchHassOptionsFlowHandler(config_entries.OptionsFlow):
                 CONF_TZ_DST_END_WEEK: time_zone_info.tz_dst_end_week,
                 CONF_TZ_DST_END_DAY_OF_WEEK: time_zone_info.tz_dst_end_day_of_week,
                 CONF_TZ_DST_END_TIME: time_zone_info.tz_dst_end_time,
+                CONF_METRICS_EXPORT: DEFAULT_METRICS_EXPORT,
             }
 
         if key in self.config_entry.options:
@@ -216,6 +240,10 @@ class DlinkDchHassOptionsFlowHandler(config_entries.OptionsFlow):
                         CONF_TZ_DST_END_TIME,
                         default=self.get_default(CONF_TZ_DST_END_TIME),
                     ): str,
+                    vol.Required(
+                        CONF_METRICS_EXPORT,
+                        default=self.get_default(CONF_METRICS_EXPORT),
+                    ): bool,
                 },
             ),
         )
@@ -231,6 +259,9 @@ class DlinkDchHassFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self) -> None:
         """Initialize."""
         self._errors = {}
+        # The PIN given before searching for the device, and what the search found
+        self._pin: str | None = None
+        self._discovered: dict[str, DiscoveredDevice] = {}
 
     async def async_step_user(
         self,
@@ -245,6 +276,11 @@ class DlinkDchHassFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         # if self._async_current_entries():
         #     return self.async_abort(reason="single_instance_allowed")
 
+        if user_input is not None and not user_input.get(CONF_HOST):
+            # No host, so go and look for it
+            self._pin = user_input[CONF_PIN]
+            return await self.async_step_discovery()
+
         if user_input is not None:
             _LOGGER.info("User input in FlowHandler async_step_user: %s", user_input)
             try:
@@ -252,7 +288,10 @@ class DlinkDchHassFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                     user_input[CONF_HOST],
                     user_input[CONF_PIN],
                 )
-
+            except tuple(_VALIDATION_ERRORS) as exc:
+                field, error = _VALIDATION_ERRORS[type(exc)]
+                self._errors[field] = error
+            else:
                 unique_id = (
                     self._mac_address if self._mac_address else user_input[CONF_HOST]
                 )
@@ -270,25 +309,99 @@ class DlinkDchHassFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                     title=user_input[CONF_HOST],
                     data=user_input,
                 )
-            except AuthenticationError:
-                self._errors[CONF_PIN] = "authentication_error"
-            except GeneralCommunicationError:
-                self._errors[CONF_HOST] = "general_communication"
-            except DeviceReturnedError:
-                self._errors["base"] = "device_returned_error"
-            except RebootingError:
-                self._errors["base"] = "rebooting"
-            except UnableToResolveHostError:
-                self._errors[CONF_HOST] = "unable_to_resolve_host"
-            except UnableToConnectError:
-                self._errors[CONF_HOST] = "unable_to_connect"
-            except InvalidDeviceStateError:
-                self._errors["base"] = "invalid_device_state"
-            except UnsupportedDeviceTypeError:
-                self._errors["base"] = "unsupported_device_type"
 
         return await self._show_config_form(user_input)
 
+    async def async_step_import(
+        self,
+        import_data: dict[str, Any],
+    ) -> config_entries.ConfigFlowResult:
+        """
+        Set up a device handed over by the onboard service, without a form.  Anything
+        besides the host and PIN becomes the entry's options.
+        """
+        host = import_data[CONF_HOST]
+        pin = import_data[CONF_PIN]
+        self._async_abort_entries_match({CONF_HOST: host})
+        try:
+            await self._test_credentials(host, pin)
+        except tuple(_VALIDATION_ERRORS) as exc:
+            return self.async_abort(reason=_VALIDATION_ERRORS[type(exc)][1])
+        await self.async_set_unique_id(self._mac_address or host)
+        self._abort_if_unique_id_configured()
+        _LOGGER.debug("Importing %s", host)
+        return self.async_create_entry(
+            title=host,
+            data={CONF_HOST: host, CONF_PIN: pin},
+            options={
+                key: value
+                for key, value in import_data.items()
+                if key not in {CONF_HOST, CONF_PIN}
+            },
+        )
+
+    async def async_step_discovery(
+        self,
+        user_input: dict | None = None,
+    ) -> config_entries.ConfigFlowResult:
+        """Search the given subnets for detectors that aren't set up yet."""
+        self._errors = {}
+        if user_input is not None:
+            try:
+                hosts = subnet_hosts(user_input[CONF_SUBNETS].split(","))
+            except ValueError:
+                self._errors[CONF_SUBNETS] = "invalid_subnets"
+            else:
+                devices = await scan(async_get_clientsession(self.hass), hosts)
+                configured = self._async_current_ids() | {
+                    entry.data.get(CONF_HOST)
+                    for entry in self._async_current_entries(include_ignore=False)
+                }
+                self._discovered = {
+                    device.host: device
+                    for device in devices
+                    if device.supported
+                    and not {device.host, device.mac_address} & configured
+                }
+                if self._discovered:
+                    return await self.async_step_pick_device()
+                self._errors["base"] = "no_devices_found"
+
+        subnets = (user_input or {}).get(CONF_SUBNETS)
+        if subnets is None:
+            subnets = await self.hass.async_add_executor_job(local_subnet) or ""
+        return self.async_show_form(
+            step_id="discovery",
+            data_schema=vol.Schema(
+                {vol.Required(CONF_SUBNETS, default=subnets): str},
+            ),
+            errors=self._errors,
+        )
+
+    async def async_step_pick_device(
+        self,
+        user_input: dict | None = None,
+    ) -> config_entries.ConfigFlowResult:
+        """Pick one of the detectors found, and set it up with the PIN given."""
+        if user_input is not None:
+            return await self.async_step_user(
+                {CONF_HOST: user_input[CONF_HOST], CONF_PIN: self._pin},
+            )
+        return self.async_show_form(
+            step_id="pick_device",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_HOST): vol.In(
+                        {
+                            host: f"{device.model} {device.mac_address or ''} ({host})"
+                            for host, device in self._discovered.items()
+                        },
+                    ),
+                },
+            ),
+            description_placeholders={"count": str(len(self._discovered))},
+        )
+
     @staticmethod
     @callback
     def async_get_options_flow(
@@ -321,7 +434,10 @@ class DlinkDchHassFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user",
             data_schema=vol.Schema(
                 {
-                    vol.Required(CONF_HOST, default=host): str,
+                    vol.Optional(
+                        CONF_HOST,
+                        description={"suggested_value": host},
+                    ): str,
                     vol.Required(CONF_PIN, default=pin): All(str, Length(6)),
                 },
             ),
@@ -330,14 +446,9 @@ class DlinkDchHassFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def _test_credentials(self, host: str, pin: str) -> None:
         """Try to use the credentials.  Will return exception if not so."""
-        session = async_create_clientsession(self.hass)
-        time_info = await self.hass.async_add_executor_job(
-            partial(
-                fill_in_timezone,
-                time_zone_string=self.hass.config.time_zone,
-                entry=None,
-            ),
-        )
+        # Share HA's session, as the entry will, rather than opening one per device
+        session = async_get_clientsession(self.hass)
+        time_info = fill_in_timezone(self.hass.config.time_zone, None)
 
         client = DlinkDchHassApiClient(host, pin, session, time_info, None)
         client_data = await client.async_get_data()
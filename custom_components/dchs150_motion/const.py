@@ -18,6 +18,8 @@ MOISTURE_ICON = "mdi:water"
 
 # Platforms
 BINARY_SENSOR = "binary_sensor"
+SENSOR = "sensor"
+PLATFORMS = [BINARY_SENSOR, SENSOR]
 
 # Configuration and options
 CONF_ENABLED = "enabled"
@@ -28,7 +30,9 @@ CONF_BACKOFF = "backoff"
 CONF_SENSITIVITY = "sensitivity"
 CONF_OP_STATUS = "op_status"
 CONF_NICK_NAME = "nick_name"
+CONF_METRICS_EXPORT = "metrics_export"
 CONF_DESCRIPTION = "description"
+CONF_SUBNETS = "subnets"
 
 CONF_NTP_SERVER = "ntp_server"
 CONF_TZ_OFFSET = "tz_offset"
@@ -57,7 +61,42 @@ REBOOT_HOUR = 3
 DEFAULT_SOAP_TIMEOUT = 10
 REBOOT_SOAP_TIMEOUT = 60
 
-# Time Zone Info (until I do it properly - this is Chicago!)
+# Finding detectors on the LAN:  probes in flight at once, how long (in seconds) to
+# wait for a connection and for the whole answer, and the most hosts to scan
+DISCOVERY_CONCURRENCY = 64
+DISCOVERY_CONNECT_TIMEOUT = 0.3
+DISCOVERY_TIMEOUT = 1.5
+DISCOVERY_MAX_HOSTS = 1024
+SUPPORTED_MODELS = ("DCH-S150", "DCH-S160")
+
+# Metadata cache lifetimes (in seconds) - these hardly ever change on the device
+DEVICE_SETTINGS_CACHE_SECONDS = 24 * 60 * 60
+SOAP_ACTIONS_CACHE_SECONDS = 7 * 24 * 60 * 60
+DETECTOR_SETTINGS_CACHE_SECONDS = 60 * 60
+
+# Device clock skew estimation
+CLOCK_SKEW_WINDOW = 60  # Samples (responses) to estimate from
+CLOCK_SKEW_MIN_SAMPLES = 5  # Don't trust an estimate from fewer than this
+CLOCK_SKEW_THRESHOLD = 0.5  # In seconds - don't bother correcting less than this
+
+# Pacing polls:  when a poll (plus however late it started) overruns the interval,
+# stretch the interval by this factor, up to this multiple of the configured one.
+# Relax it back after this many polls that would fit.
+INTERVAL_STRETCH_FACTOR = 1.5
+MAX_INTERVAL_STRETCH = 5
+INTERVAL_RECOVERY_POLLS = 5
+
+# How many of the device's most recent responses to keep for diagnostics
+RECENT_RESPONSE_COUNT = 20
+
+# How many trace spans to keep in memory (oldest are dropped first)
+TRACE_BUFFER_SIZE = 5000
+
+# Most exchanges with a device to keep in one traffic recording (later ones are dropped)
+TRAFFIC_RECORDING_LIMIT = 20000
+
+# Time Zone Info - these are just fallbacks; the real rules come from HA's time zone
+# (and these are Chicago!)
 DEFAULT_NTP_SERVER = "time.google.com"  # Reset this from ntp1.dlink.com!!
 DEFAULT_TZ_OFFSET = -6
 DEFAULT_TZ_DST = True
@@ -73,9 +112,46 @@ DEFAULT_TZ_DST_END_TIME = "2:00AM"
 # Defaults
 DEFAULT_NAME = "dlink_dchs150"
 DEFAULT_SENSOR_NAME = "dlink_sensor"
+DEFAULT_METRICS_EXPORT = False
 
 # For state management
-UPDATE_LISTENER_REMOVE = "update_listener_remove"
+METADATA_STORE = "metadata_store"
+TIME_TRANSITION_UNSUB = "time_transition_unsub"
+METRICS_EXPORTER = "metrics_exporter"
+
+# Where we serve OpenMetrics for the devices that opt in
+METRICS_URL = f"/api/{DOMAIN}/metrics"
+
+# Services
+SERVICE_SET_TRACE_SAMPLING = "set_trace_sampling"
+SERVICE_DUMP_TRACE = "dump_trace"
+SERVICE_PROFILE = "profile"
+SERVICE_RECORD_TRAFFIC = "record_traffic"
+SERVICE_ONBOARD = "onboard"
+SERVICE_PUSH_SETTINGS = "push_settings"
+ATTR_SAMPLE_RATE = "sample_rate"
+ATTR_FORMAT = "format"
+ATTR_CLEAR = "clear"
+ATTR_DURATION = "duration"
+ATTR_TOP = "top"
+ATTR_DEVICES = "devices"
+ATTR_HOSTS = "hosts"
+TRACE_FORMAT_JSON_LINES = "jsonl"
+TRACE_FORMAT_CHROME = "chrome"
+DEFAULT_PROFILE_SECONDS = 30
+MAX_PROFILE_SECONDS = 600
+DEFAULT_PROFILE_TOP = 40
+# What the profile summary is narrowed down to:  us, and the libraries we lean on
+PROFILE_RESTRICTION = "dchs150_motion|xmltodict|hmac|aiohttp"
+DEFAULT_RECORD_SECONDS = 300
+MAX_RECORD_SECONDS = 86400
+# Most devices to set up, or push settings to, at once
+BULK_CONCURRENCY = 16
+
+# Persistent storage
+STORAGE_KEY = f"{DOMAIN}.metadata"
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 30  # In seconds
 
 
 STARTUP_MESSAGE = f"""
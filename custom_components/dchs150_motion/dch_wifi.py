@@ -1,4 +1,4 @@
-"""Implements HNAP connectivity to a D-Link DCH-S150."""
+"""Implements HNAP connectivity to a D-Link DCH-S150 (no HA dependencies)."""
 
 # Use the project defogger-dch-s150 to connect your DCH-S150
 # to your wifi AP now that D-Link doesn't work.
@@ -9,22 +9,33 @@
 from __future__ import annotations
 
 import asyncio
+import copy
 import hmac
 import logging
-from datetime import datetime, timedelta
+import time
+import weakref
+from collections import Counter, deque
+from datetime import UTC, datetime, timedelta, tzinfo
+from email.utils import parsedate_to_datetime
 from enum import Enum
-from io import BytesIO
+from functools import partial
 from socket import gaierror
-from typing import Any, ClassVar
-from xml.etree.ElementTree import Element, ElementTree, ParseError  # nosec B405
+from typing import TYPE_CHECKING, Any, ClassVar
+from xml.parsers.expat import ExpatError  # nosec B407
 
 import aiohttp
-import defusedxml.ElementTree as DET  # noqa: N814
-import homeassistant.util.dt
 import xmltodict
 from aiohttp.client_exceptions import ClientConnectorError, ServerDisconnectedError
 
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from .recording import TrafficRecorder
+
 from .const import (
+    CLOCK_SKEW_MIN_SAMPLES,
+    CLOCK_SKEW_THRESHOLD,
+    CLOCK_SKEW_WINDOW,
     DEFAULT_BACKOFF_SECONDS,
     DEFAULT_NTP_SERVER,
     DEFAULT_OP_STATUS,
@@ -40,15 +51,32 @@ from .const import (
     DEFAULT_TZ_DST_START_TIME,
     DEFAULT_TZ_DST_START_WEEK,
     DEFAULT_TZ_OFFSET,
+    DETECTOR_SETTINGS_CACHE_SECONDS,
+    DEVICE_SETTINGS_CACHE_SECONDS,
     REBOOT_HOUR,
     REBOOT_SECONDS,
     REBOOT_SOAP_TIMEOUT,
+    RECENT_RESPONSE_COUNT,
+    SOAP_ACTIONS_CACHE_SECONDS,
 )
+from .metrics import LatencyHistogram
+from .tracing import tracer
 
 _LOGGER = logging.getLogger(__name__)
 
 ACTION_BASE_URL = "http://purenetworks.com/HNAP1/"
 DEFAULT_LOGIN_NAME = "Admin"
+# Calls starting with this are read-only, and can be safely shared between callers
+READ_ONLY_METHOD_PREFIX = "Get"
+WRITE_METHOD_PREFIX = "Set"
+
+# Device metadata that is safe to cache, and for how long (seconds)
+METADATA_CACHE_TTLS = {
+    "GetDeviceSettings": DEVICE_SETTINGS_CACHE_SECONDS,
+    "GetModuleSOAPActions": SOAP_ACTIONS_CACHE_SECONDS,
+    "GetMotionDetectorSettings": DETECTOR_SETTINGS_CACHE_SECONDS,
+    "GetWaterDetectorSettings": DETECTOR_SETTINGS_CACHE_SECONDS,
+}
 
 
 def str2hexstr(origin: str) -> str:
@@ -57,6 +85,16 @@ def str2hexstr(origin: str) -> str:
     return "".join([f"{ord(i):x}" for i in origin])
 
 
+def parse_detect_time(value: object, tz: tzinfo | None = None) -> datetime | None:
+    """Turn a LatestDetectTime (seconds since the epoch) into a time, if it is one."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        return datetime.fromtimestamp(float(value), tz=tz)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
 def _hmac(key: str, message: str) -> str:
     """Calculate HMAC-MD5 hash."""
     encoded_key = key.encode("utf-8")
@@ -127,6 +165,28 @@ class TimeInfo:
     tz_dst_end_day_of_week = DEFAULT_TZ_DST_END_DAY_OF_WEEK
     tz_dst_end_time = DEFAULT_TZ_DST_END_TIME
 
+    FIELDS: ClassVar[tuple[str, ...]] = (
+        "ntp_server",
+        "tz_offset",
+        "tz_dst",
+        "tz_dst_start_month",
+        "tz_dst_start_week",
+        "tz_dst_start_day_of_week",
+        "tz_dst_start_time",
+        "tz_dst_end_month",
+        "tz_dst_end_week",
+        "tz_dst_end_day_of_week",
+        "tz_dst_end_time",
+    )
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the settings, rather than the instances."""
+        if not isinstance(other, TimeInfo):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+    __hash__ = None  # pyright: ignore[reportAssignmentType]
+
 
 class DeviceDetectionSettingsInfo:
     """Structure for passing around motion detection / water settings info."""
@@ -137,6 +197,201 @@ class DeviceDetectionSettingsInfo:
     nick_name = None
     description = None
 
+    FIELDS: ClassVar[tuple[str, ...]] = (
+        "backoff",
+        "sensitivity",
+        "op_status",
+        "nick_name",
+        "description",
+    )
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the settings, rather than the instances."""
+        if not isinstance(other, DeviceDetectionSettingsInfo):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+    __hash__ = None  # pyright: ignore[reportAssignmentType]
+
+
+class MetadataCache:
+    """
+    TTL cache of the device metadata (settings, SOAP actions, and so on).
+
+    Entries are keyed the same way as in-flight calls:  (method, parameters).  Expiry
+    uses the wall clock, so that a snapshot can be persisted and reloaded across
+    restarts.
+    """
+
+    def __init__(self, ttls: dict[str, float] | None = None) -> None:
+        """Initialize an empty cache."""
+        self._ttls = METADATA_CACHE_TTLS if ttls is None else ttls
+        self._entries: dict[tuple, tuple[float, dict]] = {}
+        # Bumped on every change, so owners can tell when to persist us
+        self.version = 0
+
+    def is_cacheable(self, method: str) -> bool:
+        """Return True if results of this method can be cached."""
+        return method in self._ttls
+
+    def get(self, key: tuple) -> dict | None:
+        """Return the cached result for the call, if there is one and it's fresh."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+    def peek(self, key: tuple) -> dict | None:
+        """Return the cached result for the call, even if it has expired."""
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def put(self, key: tuple, value: dict) -> None:
+        """Cache the result of a call."""
+        self._entries[key] = (time.time() + self._ttls[key[0]], value)
+        self.version += 1
+
+    def invalidate(self, method: str) -> None:
+        """Drop all cached results for a method."""
+        keys = [key for key in self._entries if key[0] == method]
+        for key in keys:
+            del self._entries[key]
+        if keys:
+            self.version += 1
+
+    def clear(self) -> None:
+        """Drop everything."""
+        if self._entries:
+            self._entries.clear()
+            self.version += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable snapshot of the cache."""
+        return {
+            "entries": [
+                {
+                    "method": key[0],
+                    "params": [list(param) for param in key[1]],
+                    "expires": expires,
+                    "value": value,
+                }
+                for key, (expires, value) in self._entries.items()
+            ],
+        }
+
+    def load(self, data: dict[str, Any]) -> None:
+        """Load a snapshot previously returned by as_dict()."""
+        for entry in data.get("entries", []):
+            if not self.is_cacheable(entry["method"]):
+                continue
+            key = (entry["method"], tuple(tuple(param) for param in entry["params"]))
+            self._entries[key] = (float(entry["expires"]), entry["value"])
+        self.version += 1
+
+
+class ClockSkewEstimator:
+    """
+    Estimates how far the device's clock is off from ours, NTP-style:  each response
+    tells us the device's time somewhere between when we sent the request and when
+    we got the answer.  The device only reports whole seconds (in the HTTP Date
+    header), but averaging over many responses gets us well under that.
+    """
+
+    def __init__(
+        self,
+        window: int = CLOCK_SKEW_WINDOW,
+        min_samples: int = CLOCK_SKEW_MIN_SAMPLES,
+        resolution: float = 1.0,
+    ) -> None:
+        """Initialize with no samples."""
+        self._samples: deque[tuple[float, float]] = deque(maxlen=window)
+        self._min_samples = min_samples
+        self._resolution = resolution
+
+    def add_sample(self, sent: float, received: float, device_time: float) -> None:
+        """Add a sample:  our times either side of the exchange, and the device's."""
+        # The device's clock read somewhere in [device_time, device_time + resolution)
+        offset = device_time + self._resolution / 2 - (sent + received) / 2
+        self._samples.append((offset, received - sent))
+
+    def reset(self) -> None:
+        """Forget everything (e.g., the device rebooted and may have a new clock)."""
+        self._samples.clear()
+
+    @property
+    def offset(self) -> float | None:
+        """Return the device clock minus ours, in seconds, if we have a good idea."""
+        if len(self._samples) < self._min_samples:
+            return None
+        # Slow exchanges say little about when the device read its clock, so only use
+        # the faster half
+        round_trips = sorted(sample[1] for sample in self._samples)
+        cutoff = round_trips[len(round_trips) // 2]
+        offsets = [offset for offset, rtt in self._samples if rtt <= cutoff]
+        return sum(offsets) / len(offsets)
+
+    def correct(self, device_time: datetime) -> datetime:
+        """Map a device timestamp onto our clock, if the device's clock is off."""
+        offset = self.offset
+        if offset is None or abs(offset) < CLOCK_SKEW_THRESHOLD:
+            return device_time
+        return device_time - timedelta(seconds=offset)
+
+
+class HNAPMetrics:
+    """
+    Per-method call latencies, plus counts of failures by exception class and of
+    device status transitions.  Cheap enough to update on every call.
+    """
+
+    def __init__(self) -> None:
+        """Initialize with nothing recorded."""
+        self.latency: dict[str, LatencyHistogram] = {}
+        self.errors: Counter[str] = Counter()
+        self.transitions: Counter[tuple[HNAPDeviceStatus, HNAPDeviceStatus]] = Counter()
+
+    def record_call(self, method: str, seconds: float) -> None:
+        """Record how long a call took, successful or not."""
+        histogram = self.latency.get(method)
+        if histogram is None:
+            histogram = self.latency[method] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def record_error(self, exc: BaseException) -> None:
+        """Count a failure, by the class of what actually went wrong."""
+        self.errors[type(exc.__cause__ or exc).__name__] += 1
+
+    def record_transition(
+        self,
+        old_status: HNAPDeviceStatus,
+        new_status: HNAPDeviceStatus,
+    ) -> None:
+        """Count a change in device status."""
+        if old_status is not new_status:
+            self.transitions[old_status, new_status] += 1
+
+    def entered(self, status: HNAPDeviceStatus) -> int:
+        """Return how many times the device has gone into the given status."""
+        return sum(
+            count
+            for (_old_status, new_status), count in self.transitions.items()
+            if new_status is status
+        )
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return a summary suitable for diagnostics."""
+        return {
+            "calls": {
+                method: histogram.snapshot()
+                for method, histogram in self.latency.items()
+            },
+            "errors": dict(self.errors),
+            "status_transitions": {
+                f"{old_status.name}->{new_status.name}": count
+                for (old_status, new_status), count in self.transitions.items()
+            },
+        }
+
 
 class NanoSOAPClient:
     """Basic SOAP client."""
@@ -159,33 +414,19 @@ class NanoSOAPClient:
         self.address = f"http://{address}/HNAP1"
         self.action = action
         self.loop = loop or asyncio.get_event_loop()
-        self.session = session or aiohttp.ClientSession(loop=loop)
+        # Made when first needed, so a client that never talks to a device needs none
+        self.session = session
         self.headers = {}
-
-    def _generate_request_xml_old(self, method: str, **kwargs: dict[str, Any]) -> str:
-        """Generate a SOAP request."""
-        body = Element("soap:Body")
-        action = Element(method, self.ACTION_NS)
-        body.append(action)
-
-        for param, value in kwargs.items():
-            element = Element(param)
-            if isinstance(value, str) and len(value) > 0 and value[0] == "<":  # pyright: ignore[reportArgumentType]
-                # Assume it's raw XML
-                sub = DET.fromstring(value)
-                element.append(sub)
-            else:
-                element.text = str(value)
-            action.append(element)
-
-        envelope = Element("soap:Envelope", self.BASE_NS)
-        envelope.append(body)
-
-        file_handle = BytesIO()
-        tree = ElementTree(envelope)
-        tree.write(file_handle, encoding="utf-8", xml_declaration=True)
-
-        return file_handle.getvalue().decode("utf-8")
+        # Set to capture our exchanges with the device (see recording.py)
+        self.recorder: TrafficRecorder | None = None
+        # (received, method, response) for the device's most recent responses
+        self.recent_responses: deque[tuple[float, str, dict]] = deque(
+            maxlen=RECENT_RESPONSE_COUNT,
+        )
+        # Connections we've already used, to tell whether the session reuses them
+        self._connections: weakref.WeakSet = weakref.WeakSet()
+        self.requests = 0
+        self.new_connections = 0
 
     def _generate_request_xml(self, method: str, **kwargs: dict[str, Any]) -> str:
         """Generate a SOAP request."""
@@ -211,21 +452,66 @@ class NanoSOAPClient:
         self,
         method: str,
         timeout: int = 10,
+        *,
+        on_exchange: Callable[[float, float, float], None] | None = None,
         **kwargs: dict[str, Any],
     ) -> dict:
-        """Call a SOAP method."""
-        request_xml = self._generate_request_xml(method, **kwargs)
+        """
+        Call a SOAP method.  If the response tells us the device's time, on_exchange
+        gets (sent, received, device time) for this call.
+        """
+        with tracer.span("generate_request"):
+            request_xml = self._generate_request_xml(method, **kwargs)
 
         headers = self.headers.copy()
         headers["SOAPAction"] = f'"{self.action}{method}"'
 
+        with tracer.span("network", method=method):
+            sent = time.time()
+            try:
+                received, date, text = await self._post(request_xml, headers, timeout)
+            except Exception as exc:
+                if self.recorder is not None:
+                    self.recorder.record(method, kwargs, sent, time.time(), error=exc)
+                raise
+            if (
+                on_exchange is not None
+                and (device_time := self._device_time(date)) is not None
+            ):
+                on_exchange(sent, received, device_time)
+        if self.recorder is not None:
+            self.recorder.record(method, kwargs, sent, received, date=date, text=text)
+        with tracer.span("parse"):
+            result = self._parse_response(method, text)
+        self.recent_responses.append((received, method, result))
+        return result
+
+    async def _post(
+        self,
+        request_xml: str,
+        headers: dict[str, str],
+        timeout: int,  # noqa: ASYNC109
+    ) -> tuple[float, str | None, str]:
+        """
+        Send a request to the device.  Returns when the response came back (before
+        reading the body), its Date header, and its body.
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
         resp = await self.session.post(
             self.address,
             data=request_xml,
             headers=headers,
             timeout=aiohttp.ClientTimeout(total=timeout),
         )
-        text = await resp.text()
+        received = time.time()
+        # aiohttp has usually released the connection by now, but the response still
+        # knows which one it came in on.  Implementation detail, but useful.
+        self._record_connection(getattr(resp, "_protocol", None))
+        return received, resp.headers.get("Date"), await resp.text()
+
+    def _parse_response(self, method: str, text: str) -> dict:
+        """Pull the result for a method out of the device's SOAP response."""
         parsed = xmltodict.parse(text)
         if "soap:Envelope" not in parsed:
             _LOGGER.error("parsed: %s", str(parsed))
@@ -233,6 +519,33 @@ class NanoSOAPClient:
 
         return parsed["soap:Envelope"]["soap:Body"][method + "Response"]
 
+    def _record_connection(self, protocol: asyncio.Protocol | None) -> None:
+        """Note whether a request went out on a new connection or a reused one."""
+        if protocol is None:
+            return
+        self.requests += 1
+        if protocol not in self._connections:
+            self._connections.add(protocol)
+            self.new_connections += 1
+
+    def connection_stats(self) -> dict[str, int]:
+        """Return how well the session is reusing connections to the device."""
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.requests - self.new_connections,
+        }
+
+    def _device_time(self, date: str | None) -> float | None:
+        """Return the device's idea of the time, from the Date header of a response."""
+        if not date:
+            return None
+        try:
+            return parsedate_to_datetime(date).timestamp()
+        except (TypeError, ValueError):
+            _LOGGER.debug("Unable to parse Date header %s from %s", date, self.address)
+            return None
+
 
 class HNAPClient:
     """Client for the HNAP protocol."""
@@ -245,11 +558,20 @@ class HNAPClient:
         time_info: TimeInfo | None = None,
         device_detection_settings_info: DeviceDetectionSettingsInfo | None = None,
         loop: asyncio.EventLoop | None = None,
+        *,
+        clock: Callable[[], float] = time.time,
+        time_zone: tzinfo | None = None,
     ) -> None:
-        """Initialize a new HNAPClient instance."""
+        """
+        Initialize a new HNAPClient instance.  The clock (seconds since the epoch)
+        stamps our requests, and it and the time zone (the host's, if not given) decide
+        when the device gets rebooted.
+        """
         self.username = username
         self.password = password
         self.loop = loop or asyncio.get_event_loop()
+        self.clock = clock
+        self.time_zone = time_zone
         self._client = soap
         self._private_key = None
         self._cookie = None
@@ -257,11 +579,26 @@ class HNAPClient:
         self._timestamp = None
         self._status = HNAPDeviceStatus.UNKNOWN
         self._time_info = time_info
+        # What we last pushed to the device, so we don't push it again
+        self._pushed_time_info: TimeInfo | None = None
         self._device_detection_settings_info = device_detection_settings_info
+        self._in_flight: dict[tuple, asyncio.Task] = {}
+        self.metadata_cache = MetadataCache()
+        self.clock_skew = ClockSkewEstimator()
+        self.metrics = HNAPMetrics()
+        # Skip calls we can live without (settings read-backs), e.g. when polls are
+        # falling behind
+        self.shed_optional_calls = False
+        # Don't push time and detector settings on login (e.g., when all we're doing
+        # is setting the device's Wi-Fi)
+        self.skip_initialization = False
 
         self._next_reboot_hour = REBOOT_HOUR
         self._next_reboot_at = None
-        self._rebooted_at = None
+        # Deadlines and durations are kept on the monotonic clock, so that changes to
+        # the host's clock (NTP steps, etc.) can't make us reboot early or wait forever
+        self._next_reboot_deadline: float | None = None
+        self._rebooted_at: float | None = None
         self._reboot_seconds = REBOOT_SECONDS
         self.set_next_reboot()
 
@@ -285,7 +622,7 @@ class HNAPClient:
 
     def set_next_reboot(self) -> None:
         """Set the next reboot time to the next time at the _next_reboot_hour."""
-        now = datetime.now(tz=homeassistant.util.dt.DEFAULT_TIME_ZONE)
+        now = self._local_time(self.clock())
         next_reboot = now.replace(
             hour=self._next_reboot_hour,
             minute=0,
@@ -295,8 +632,17 @@ class HNAPClient:
         if next_reboot < now:
             next_reboot += timedelta(days=1)
         self._next_reboot_at = next_reboot
+        # Go via UTC, as wall-clock arithmetic is an hour out across a DST change
+        self._next_reboot_deadline = (
+            time.monotonic()
+            + (next_reboot.astimezone(UTC) - now.astimezone(UTC)).total_seconds()
+        )
         _LOGGER.debug("Next reboot at %s", self._next_reboot_at)
 
+    def _local_time(self, timestamp: float) -> datetime:
+        """Return the timestamp as a time in our time zone."""
+        return datetime.fromtimestamp(timestamp, tz=UTC).astimezone(self.time_zone)
+
     def get_status(self) -> HNAPDeviceStatus:
         """Return the status of the device."""
         return self._status
@@ -304,12 +650,38 @@ class HNAPClient:
     def set_status(self, status: HNAPDeviceStatus) -> None:
         """Set the status of the device."""
         _LOGGER.debug("Setting %s status to %s", self.device_name, status)
+        self.metrics.record_transition(self._status, status)
         self._status = status
 
     def get_name(self) -> str:
         """Return something to identify us."""
         return self._client.address
 
+    def diagnostics(self) -> dict[str, Any]:
+        """Return what we know about the device, without talking to it."""
+        return {
+            "address": self._client.address,
+            "status": self._status.name,
+            "initialized": self._ran_initialization,
+            "next_reboot_at": self._next_reboot_at.isoformat()
+            if self._next_reboot_at
+            else None,
+            "seconds_since_reboot": time.monotonic() - self._rebooted_at
+            if self._rebooted_at is not None
+            else None,
+            "clock_offset": self.clock_skew.offset,
+            "connections": self._client.connection_stats(),
+            "metrics": self.metrics.snapshot(),
+            "recent_responses": [
+                {
+                    "received": self._local_time(received).isoformat(),
+                    "method": method,
+                    "response": response,
+                }
+                for received, method, response in self._client.recent_responses
+            ],
+        }
+
     async def run_initialization(self) -> None:
         """
         Perform basic initialization.  Reset the time server for the device, and
@@ -333,8 +705,11 @@ class HNAPClient:
     async def reboot(self) -> None:
         """Reboot the device."""
         _LOGGER.info("Rebooting device - %s", self.get_name())
-        self._rebooted_at = datetime.now(tz=homeassistant.util.dt.DEFAULT_TIME_ZONE)
+        self._rebooted_at = time.monotonic()
         self.set_next_reboot()
+        # Firmware can change across a reboot, so trust nothing we've cached
+        self.metadata_cache.clear()
+        self.clock_skew.reset()
         self.set_status(HNAPDeviceStatus.REBOOTING)
         await self.call("Reboot", timeout=REBOOT_SOAP_TIMEOUT)
 
@@ -360,34 +735,74 @@ class HNAPClient:
             ModuleID=1,
         )
 
+    def _time_settings_params(self, time_info: TimeInfo) -> dict[str, Any]:
+        """Turn time info into the parameters for SetTimeSettings."""
+        return {
+            "NTP": "true",
+            "NTPServer": time_info.ntp_server,
+            "TimeZone": time_info.tz_offset,
+            "DaylightSaving": "true" if time_info.tz_dst else "false",
+            "DSTStartMonth": time_info.tz_dst_start_month,
+            "DSTStartWeek": time_info.tz_dst_start_week,
+            "DSTStartDayOfWeek": time_info.tz_dst_start_day_of_week,
+            "DSTStartTime": time_info.tz_dst_start_time,
+            "DSTEndMonth": time_info.tz_dst_end_month,
+            "DSTEndWeek": time_info.tz_dst_end_week,
+            "DSTEndDayOfWeek": time_info.tz_dst_end_day_of_week,
+            "DSTEndTime": time_info.tz_dst_end_time,
+        }
+
     async def set_time_settings(self) -> None:
-        """Set the time settings on the device.  In particular, reset from ntp1.dlink.com."""
+        """
+        Set the time settings on the device.  In particular, reset from ntp1.dlink.com.
+        The device keeps them across reconnects and reboots, so this only sends them if
+        they differ from what we last sent.
+        """
         if not self._time_info:
             return
+        if self._time_info == self._pushed_time_info:
+            _LOGGER.debug("Time settings unchanged for device - %s", self.get_name())
+            return
         _LOGGER.debug("Setting default time settings for device - %s", self.get_name())
         _ = await self.call(
             "SetTimeSettings",
             timeout=DEFAULT_SOAP_TIMEOUT,
-            NTP="true",
-            NTPServer=self._time_info.ntp_server,
-            TimeZone=self._time_info.tz_offset,
-            DaylightSaving="true" if self._time_info.tz_dst else "false",
-            DSTStartMonth=self._time_info.tz_dst_start_month,
-            DSTStartWeek=self._time_info.tz_dst_start_week,
-            DSTStartDayOfWeek=self._time_info.tz_dst_start_day_of_week,
-            DSTStartTime=self._time_info.tz_dst_start_time,
-            DSTEndMonth=self._time_info.tz_dst_end_month,
-            DSTEndWeek=self._time_info.tz_dst_end_week,
-            DSTEndDayOfWeek=self._time_info.tz_dst_end_day_of_week,
-            DSTEndTime=self._time_info.tz_dst_end_time,
+            **self._time_settings_params(self._time_info),
         )
-        if _LOGGER.isEnabledFor(logging.DEBUG):
+        self._pushed_time_info = copy.copy(self._time_info)
+        if self._wants_read_back():
             time_settings = await self.call(
                 "GetTimeSettings",
                 timeout=DEFAULT_SOAP_TIMEOUT,
             )
             _LOGGER.debug("Current time settings on the device: %s", time_settings)
 
+    def _wants_read_back(self) -> bool:
+        """Return whether to read back what we pushed, for the debug log."""
+        return _LOGGER.isEnabledFor(logging.DEBUG) and not self.shed_optional_calls
+
+    async def verify_time_settings(self) -> bool:
+        """
+        Check the device still has our time settings, pushing them if not.  Returns
+        True if they had to be pushed.
+        """
+        if not self._time_info or self.shed_optional_calls:
+            return False
+        current = await self.call("GetTimeSettings", timeout=DEFAULT_SOAP_TIMEOUT)
+        wanted = self._time_settings_params(self._time_info)
+        if all(str(current.get(name)) == str(value) for name, value in wanted.items()):
+            self._pushed_time_info = copy.copy(self._time_info)
+            return False
+        _LOGGER.debug(
+            "Time settings on %s are %s, but want %s",
+            self.get_name(),
+            current,
+            wanted,
+        )
+        self._pushed_time_info = None
+        await self._push_settings(self.set_time_settings)
+        return True
+
     async def set_device_settings(self) -> None:
         """Set the motion detection settings on the device."""
         if not self._device_detection_settings_info:
@@ -430,7 +845,7 @@ class HNAPClient:
             _LOGGER.debug("Device type of %s is not a supported type", self.model_name)
             raise UnsupportedDeviceTypeError(self.model_name)
 
-        if _LOGGER.isEnabledFor(logging.DEBUG):
+        if self._wants_read_back():
             device_settings = await self.get_device_detector_settings()
 
             _LOGGER.debug(
@@ -438,6 +853,42 @@ class HNAPClient:
                 device_settings,
             )
 
+    async def update_time_info(self, time_info: TimeInfo | None) -> bool:
+        """
+        Switch to new time settings, pushing them to the device if we're already up
+        and they differ from what we last pushed.  Returns True if they changed.
+        """
+        if time_info == self._time_info:
+            return False
+        self._time_info = time_info
+        if self._ran_initialization:
+            await self._push_settings(self.set_time_settings)
+        return True
+
+    async def update_device_detection_settings(
+        self,
+        device_detection_settings_info: DeviceDetectionSettingsInfo | None,
+    ) -> bool:
+        """
+        Switch to new motion/water detection settings, pushing them to the device if
+        we're already up and they differ from what we last pushed.  Returns True if
+        they changed.
+        """
+        if device_detection_settings_info == self._device_detection_settings_info:
+            return False
+        self._device_detection_settings_info = device_detection_settings_info
+        if self._ran_initialization:
+            await self._push_settings(self.set_device_settings)
+        return True
+
+    async def _push_settings(self, setter: Callable[[], Awaitable[None]]) -> None:
+        """Push settings to the device, re-pushing everything on next login if it fails."""
+        try:
+            await setter()
+        except Exception:
+            self._ran_initialization = False
+            raise
+
     async def login(self) -> None:
         """Authenticate with device and obtain cookie."""
         _LOGGER.debug("Logging into device - %s", self.get_name())
@@ -509,14 +960,14 @@ class HNAPClient:
         self.set_status(HNAPDeviceStatus.ONLINE)
 
         # This is overkill, but we want to reset all our devices to a better NTP server.
-        await self.run_initialization()
+        if not self.skip_initialization:
+            await self.run_initialization()
 
     async def device_actions(self) -> list:
         """Get all available actions for the device."""
         actions = await self.call("GetDeviceSettings", DEFAULT_SOAP_TIMEOUT)
         return [
-            lambda x: x[x.rfind("/") + 1 :](item)  # noqa: B023
-            for item in actions["SOAPActions"]["string"]
+            item[item.rfind("/") + 1 :] for item in actions["SOAPActions"]["string"]
         ]
 
     async def soap_actions(self, module_id: str) -> dict:
@@ -531,9 +982,8 @@ class HNAPClient:
         """Resolve any actions required by the current state of the device."""
         # See if we've passed our _reboot_at time:
         if (
-            self._next_reboot_at
-            and datetime.now(tz=homeassistant.util.dt.DEFAULT_TIME_ZONE)
-            > self._next_reboot_at
+            self._next_reboot_deadline is not None
+            and time.monotonic() > self._next_reboot_deadline
         ):
             self.set_status(HNAPDeviceStatus.NEEDS_REBOOT)
 
@@ -544,7 +994,8 @@ class HNAPClient:
             HNAPDeviceStatus.INTERNAL_ERROR,
             HNAPDeviceStatus.INVALID_PIN,
         ]:
-            await self.login()
+            with tracer.span("login"):
+                await self.login()
         elif self._status == HNAPDeviceStatus.INITIALIZING:
             # We shouldn't be here!
             self.set_status(HNAPDeviceStatus.UNKNOWN)
@@ -561,10 +1012,7 @@ class HNAPClient:
             # Get the time since the reboot was initiated
 
             reboot_seconds = (
-                (
-                    datetime.now(tz=homeassistant.util.dt.DEFAULT_TIME_ZONE)
-                    - self._rebooted_at
-                ).total_seconds()
+                time.monotonic() - self._rebooted_at
                 if self._rebooted_at is not None
                 else 0
             )
@@ -578,7 +1026,8 @@ class HNAPClient:
                 # We've rebooted, so now mark us as offline and ready to connect
                 self.set_status(HNAPDeviceStatus.DISCONNECTED)
                 # Try to login again
-                await self.login()
+                with tracer.span("login"):
+                    await self.login()
             else:
                 # Can't make calls at this point, as we're rebooting.
                 # Leave the status as REBOOTING
@@ -605,15 +1054,102 @@ class HNAPClient:
         timeout: int,
         **kwargs: Any,  # noqa: ANN401
     ) -> dict:
-        """Call an HNAP method (async)."""
+        """
+        Call an HNAP method (async).
+
+        Device metadata (see METADATA_CACHE_TTLS) is served from the metadata cache
+        while it's fresh.  Read-only calls (Get*) that are identical to one already in
+        flight share that request and its result, rather than hitting the device a
+        second time.  Note that the callers then share the same result dict, so don't
+        mutate it.
+        """
+        with tracer.span("HNAPClient.call", method=method):
+            return await self._call(method, timeout, **kwargs)
+
+    async def _call(
+        self,
+        method: str,
+        timeout: int,  # noqa: ASYNC109
+        **kwargs: Any,  # noqa: ANN401
+    ) -> dict:
+        """Call an HNAP method, using the cache or an in-flight call where we can."""
+        key = (method, tuple(sorted((k, str(v)) for k, v in kwargs.items())))
+        cacheable = self.metadata_cache.is_cacheable(method)
+        if cacheable:
+            cached = self.metadata_cache.get(key)
+            if cached is not None:
+                return cached
+
         # Do login if no login has been done before
         if method not in ("Reboot", "Login"):
-            await self.resolve_state()
+            with tracer.span("resolve_state"):
+                await self.resolve_state()
+
+        if not method.startswith(READ_ONLY_METHOD_PREFIX):
+            result = await self._request(method, timeout, **kwargs)
+            if method.startswith(WRITE_METHOD_PREFIX):
+                # What we cached about this is now stale
+                self.metadata_cache.invalidate(
+                    READ_ONLY_METHOD_PREFIX + method[len(WRITE_METHOD_PREFIX) :],
+                )
+            return result
+
+        # Only the request itself is shared:  resolve_state() above can log in, which
+        # makes calls of its own, and those must never end up waiting on themselves.
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(method, timeout, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(partial(self._call_done, key))
+        else:
+            _LOGGER.debug("Joining in-flight %s call for %s", method, self.get_name())
+        # Shield so that one caller being cancelled doesn't kill the call for the rest
+        result = await asyncio.shield(task)
+        if cacheable:
+            self._cache_metadata(key, result)
+        return result
 
+    def _cache_metadata(self, key: tuple, result: dict) -> None:
+        """Cache a metadata result, dumping the whole cache if the firmware changed."""
+        if key[0] == "GetDeviceSettings":
+            previous = self.metadata_cache.peek(key)
+            if previous and previous.get("FirmwareVersion") != result.get(
+                "FirmwareVersion",
+            ):
+                _LOGGER.info(
+                    "Firmware changed on %s from %s to %s",
+                    self.get_name(),
+                    previous.get("FirmwareVersion"),
+                    result.get("FirmwareVersion"),
+                )
+                self.metadata_cache.clear()
+        self.metadata_cache.put(key, result)
+
+    def _call_done(self, key: tuple, task: asyncio.Task) -> None:
+        """Drop a finished call from the in-flight table."""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # If every caller was cancelled, nobody else will look at the exception
+        if not task.cancelled():
+            task.exception()
+
+    async def _request(
+        self,
+        method: str,
+        timeout: int,  # noqa: ASYNC109
+        **kwargs: Any,  # noqa: ANN401
+    ) -> dict:
+        """Send the HNAP request to the device, mapping failures onto our status."""
         self._update_nauth_token(method)
+        started = time.perf_counter()
         try:
             try:
-                result = await self.soap().call(method, timeout, **kwargs)
+                result = await self.soap().call(
+                    method,
+                    timeout,
+                    on_exchange=self.clock_skew.add_sample,
+                    **kwargs,
+                )
                 if "ERROR" in result:
                     raise DeviceReturnedError(
                         f"{self.device_name} device {self.get_name()} returned a server error.",
@@ -635,7 +1171,7 @@ class HNAPClient:
                     "Server disconnected.  No specific diagnostic.  Perhaps reboot it?",
                 ) from exc
 
-            except ParseError as exc:
+            except ExpatError as exc:
                 self.set_status(HNAPDeviceStatus.INTERNAL_ERROR)
                 raise GeneralCommunicationError(
                     "Invalid response received from device.  Perhaps not a DCH-S1x0?",
@@ -673,10 +1209,13 @@ class HNAPClient:
                 raise GeneralCommunicationError(
                     f"Communication error from {self.get_name()}: {exc}",
                 ) from exc
-        except Exception:  # pylint: disable=broad-except
+        except Exception as exc:  # pylint: disable=broad-except
+            self.metrics.record_error(exc)
             if _LOGGER.isEnabledFor(logging.DEBUG):
                 _LOGGER.exception("Received exception for %s.", self.get_name())
             raise
+        finally:
+            self.metrics.record_call(method, time.perf_counter() - started)
 
         return result
 
@@ -685,13 +1224,12 @@ class HNAPClient:
         if not self._private_key:
             return
 
-        self._timestamp = int(
-            datetime.now(tz=homeassistant.util.dt.DEFAULT_TIME_ZONE).timestamp(),
-        )
-        self._auth_token = _hmac(
-            self._private_key,
-            f'{self._timestamp}"{ACTION_BASE_URL}{action}"',
-        )
+        with tracer.span("update_nauth_token"):
+            self._timestamp = int(self.clock())
+            self._auth_token = _hmac(
+                self._private_key,
+                f'{self._timestamp}"{ACTION_BASE_URL}{action}"',
+            )
 
     def soap(self) -> NanoSOAPClient:
         """Get SOAP client with updated headers."""
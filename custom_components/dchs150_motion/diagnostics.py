@@ -0,0 +1,48 @@
+"""Diagnostics support for dlink_dchs150_hass."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.diagnostics import async_redact_data
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+
+from .const import CONF_HOST, CONF_PIN, DOMAIN
+
+# Our own config (and where the device is), plus what it hands out when we log in
+TO_REDACT = {
+    CONF_HOST,
+    CONF_PIN,
+    "address",
+    "mac_address",
+    "DeviceMacId",
+    "Challenge",
+    "Cookie",
+    "PublicKey",
+}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry.  This never talks to the device."""
+    coordinator = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    diagnostics: dict[str, Any] = {
+        "entry": {
+            "data": dict(entry.data),
+            "options": dict(entry.options),
+        },
+    }
+    if coordinator:
+        diagnostics |= {
+            "last_update_success": coordinator.last_update_success,
+            "data": coordinator.data,
+            "detection_latency": coordinator.latency.snapshot(),
+            "pacing": coordinator.pacing(),
+            "device": coordinator.api.diagnostics(),
+        }
+    return async_redact_data(diagnostics, TO_REDACT)
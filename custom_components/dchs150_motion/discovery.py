@@ -0,0 +1,133 @@
+"""Finding DCH-S150/DCH-S160 detectors on the LAN (no HA dependencies)."""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+import socket
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+import xmltodict
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+from .const import (
+    DISCOVERY_CONCURRENCY,
+    DISCOVERY_CONNECT_TIMEOUT,
+    DISCOVERY_MAX_HOSTS,
+    DISCOVERY_TIMEOUT,
+    SUPPORTED_MODELS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Tight, so that addresses with nothing on them don't hold the scan up
+_PROBE_TIMEOUT = aiohttp.ClientTimeout(
+    total=DISCOVERY_TIMEOUT,
+    sock_connect=DISCOVERY_CONNECT_TIMEOUT,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class DiscoveredDevice:
+    """An HNAP device that answered a probe."""
+
+    host: str
+    model: str
+    mac_address: str | None = None
+    name: str | None = None
+
+    @property
+    def supported(self) -> bool:
+        """Return whether we know how to talk to this model."""
+        return self.model in SUPPORTED_MODELS
+
+
+def subnet_hosts(subnets: Iterable[str]) -> list[str]:
+    """
+    Return every host address in the subnets (CIDRs like 192.168.1.0/24).  Raises
+    ValueError for something that isn't a subnet, or if there are too many hosts to
+    scan.
+    """
+    hosts: dict[str, None] = {}
+    for subnet in subnets:
+        network = ipaddress.ip_network(subnet.strip(), strict=False)
+        if len(hosts) + network.num_addresses > DISCOVERY_MAX_HOSTS:
+            raise ValueError(f"More than {DISCOVERY_MAX_HOSTS} hosts to scan")
+        hosts.update(dict.fromkeys(str(host) for host in network.hosts()))
+    return list(hosts)
+
+
+def local_subnet() -> str | None:
+    """
+    Return the /24 around the address we'd use to reach the outside world, as a
+    guess at where the detectors are.  This blocks (briefly).
+    """
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            # Connecting a UDP socket sends nothing, but picks the outgoing address
+            sock.connect(("198.51.100.1", 9))
+            address = sock.getsockname()[0]
+    except OSError:
+        return None
+    return str(ipaddress.ip_network(f"{address}/24", strict=False))
+
+
+def parse_probe(host: str, text: str) -> DiscoveredDevice | None:
+    """Pull the device out of its answer to a probe, if it's an HNAP device."""
+    try:
+        parsed = xmltodict.parse(text)
+        settings: dict[str, Any] = parsed["soap:Envelope"]["soap:Body"][
+            "GetDeviceSettingsResponse"
+        ]
+    except Exception:  # noqa: BLE001
+        return None
+    if not settings or not settings.get("ModelName"):
+        return None
+    return DiscoveredDevice(
+        host,
+        settings["ModelName"],
+        settings.get("DeviceMacId"),
+        settings.get("DeviceName"),
+    )
+
+
+async def probe(session: aiohttp.ClientSession, host: str) -> DiscoveredDevice | None:
+    """
+    Ask the host what it is, with a single unauthenticated GET of /HNAP1/ (which an
+    HNAP device answers with its device settings).  Returns None for anything else,
+    including no answer.
+    """
+    try:
+        async with session.get(f"http://{host}/HNAP1/", timeout=_PROBE_TIMEOUT) as resp:
+            if resp.status != 200:  # noqa: PLR2004
+                return None
+            text = await resp.text()
+    except (aiohttp.ClientError, TimeoutError, UnicodeDecodeError):
+        return None
+    return parse_probe(host, text)
+
+
+async def scan(
+    session: aiohttp.ClientSession,
+    hosts: Iterable[str],
+    concurrency: int = DISCOVERY_CONCURRENCY,
+) -> list[DiscoveredDevice]:
+    """
+    Probe every host, at most `concurrency` at a time, returning the HNAP devices
+    that answered (in the order given).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe_one(host: str) -> DiscoveredDevice | None:
+        async with semaphore:
+            return await probe(session, host)
+
+    found = await asyncio.gather(*(probe_one(host) for host in hosts))
+    devices = [device for device in found if device is not None]
+    _LOGGER.debug("Discovered %s", devices)
+    return devices
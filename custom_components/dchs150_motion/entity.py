@@ -4,6 +4,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Any
 
+import homeassistant.util.dt
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
@@ -15,6 +16,36 @@ if TYPE_CHECKING:
 
 from .const import ATTRIBUTION, DOMAIN
 
+# What we persist across restarts, beyond the state itself
+RESTORED_FIELDS = (
+    "mac_address",
+    "model_name",
+    "firmware_version",
+    "hardware_version",
+    "device_name",
+    "vendor_name",
+)
+
+
+def restorable_data(data: dict[str, Any]) -> dict[str, Any]:
+    """Turn device data into something we can persist across a restart."""
+    last_detection = data.get("last_detection")
+    return {
+        **{field: data.get(field) for field in RESTORED_FIELDS},
+        "last_detection": last_detection.isoformat() if last_detection else None,
+    }
+
+
+def restored_data(stored: dict[str, Any]) -> dict[str, Any]:
+    """Turn what restorable_data() persisted back into device data."""
+    last_detection = stored.get("last_detection")
+    return {
+        **{field: stored.get(field) for field in RESTORED_FIELDS},
+        "last_detection": homeassistant.util.dt.parse_datetime(last_detection)
+        if last_detection
+        else None,
+    }
+
 
 class DlinkDchHassEntity(CoordinatorEntity):
     """Coordinating entity for DLink DCH-S150 and DCH-S160."""
@@ -28,6 +59,18 @@ class DlinkDchHassEntity(CoordinatorEntity):
         super().__init__(coordinator)
         self.config_entry = config_entry
 
+    @property
+    def data(self) -> dict[str, Any]:
+        """
+        Return the latest device data.  Until the first poll, fall back to what we
+        knew before a restart.
+        """
+        return (
+            self.coordinator.data
+            or getattr(self.coordinator, "restored_data", None)
+            or {}
+        )
+
     @property
     def unique_id(self) -> str | None:  # pyright: ignore
         """Return a unique ID to use for this entity."""
@@ -37,16 +80,16 @@ class DlinkDchHassEntity(CoordinatorEntity):
     def device_info(self) -> DeviceInfo | None:  # pyright: ignore
         """Return the device information."""
         return DeviceInfo(
-            identifiers={(DOMAIN, self.unique_id if self.unique_id else "")},
-            name=str(self.coordinator.data.get("device_name")),
-            model=str(self.coordinator.data.get("model_name")),
-            manufacturer=str(self.coordinator.data.get("vendor_name")),
+            identifiers={(DOMAIN, self.config_entry.entry_id)},
+            name=str(self.data.get("device_name")),
+            model=str(self.data.get("model_name")),
+            manufacturer=str(self.data.get("vendor_name")),
         )
 
     @property
     def device_state_attributes(self) -> dict:
         """Return the state attributes."""
-        mac_id = self.coordinator.data.get("mac_address", "00:00:00:00:00:00")
+        mac_id = self.data.get("mac_address", "00:00:00:00:00:00")
 
         return {
             "attribution": ATTRIBUTION,
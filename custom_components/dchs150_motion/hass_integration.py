@@ -5,27 +5,74 @@ For more details about this integration, please refer to
 https://github.com/updrytwist/dlink-dchs150-hass
 """
 
+from __future__ import annotations
+
+import asyncio
 import logging
-from datetime import timedelta
+import math
+import time
+from datetime import datetime, timedelta
 from functools import partial
+from random import randint
+from typing import TYPE_CHECKING, Any
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, callback
 from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import (
+    RANDOM_MICROSECOND_MAX,
+    RANDOM_MICROSECOND_MIN,
+    async_track_point_in_utc_time,
+)
+from homeassistant.helpers.restore_state import async_get as async_get_restore_state
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
-from .api import DlinkDchHassApiClient, fill_in_device_settings, fill_in_timezone
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+
+from .api import (
+    DlinkDchHassApiClient,
+    fill_in_device_settings,
+    fill_in_timezone,
+    get_time_info,
+    time_info_valid_until,
+)
 from .const import (
     BINARY_SENSOR,
     CONF_HOST,
     CONF_INTERVAL,
+    CONF_METRICS_EXPORT,
     CONF_PIN,
+    DEFAULT_METRICS_EXPORT,
     DEVICE_POLLING_FREQUENCY,
     DOMAIN,
+    INTERVAL_RECOVERY_POLLS,
+    INTERVAL_STRETCH_FACTOR,
+    MAX_INTERVAL_STRETCH,
+    METADATA_STORE,
+    METRICS_EXPORTER,
+    PLATFORMS,
     STARTUP_MESSAGE,
-    UPDATE_LISTENER_REMOVE,
+    STORAGE_KEY,
+    STORAGE_SAVE_DELAY,
+    STORAGE_VERSION,
+    TIME_TRANSITION_UNSUB,
 )
+from .dch_wifi import HNAPDeviceStatus
+from .entity import restored_data
+from .metrics import DetectionLatencyTracker, LatencyHistogram
+from .openmetrics import (
+    DlinkDchMetricsView,
+    OpenMetricsExporter,
+    histogram_samples,
+    sample,
+)
+from .profiling import profiler
+from .services import async_setup_services
 
 _LOGGER: logging.Logger = logging.getLogger(__name__)
 _PACKAGE_LOGGER: logging.Logger = logging.getLogger(__package__)
@@ -38,10 +85,77 @@ class HassIntegration:
     """
 
     @staticmethod
-    async def async_setup(_hass: HomeAssistant) -> bool:  # pylint: disable=unused-argument
-        """Set up this integration using YAML is not supported."""
+    async def async_setup(hass: HomeAssistant) -> bool:
+        """
+        Set up this integration using YAML is not supported.  But work out the time
+        zone info once, here, off the event loop, so each entry can just share it.
+        """
+        await hass.async_add_executor_job(get_time_info, hass.config.time_zone)
+        HassIntegration.schedule_time_transition(hass)
+        async_setup_services(hass)
+        hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP,
+            partial(HassIntegration.cancel_time_transition, hass),
+        )
         return True
 
+    @staticmethod
+    @callback
+    def cancel_time_transition(
+        hass: HomeAssistant, _event: Event | None = None
+    ) -> None:
+        """Stop waiting on the next DST change."""
+        unsub = hass.data.get(DOMAIN, {}).pop(TIME_TRANSITION_UNSUB, None)
+        if unsub:
+            unsub()
+
+    @staticmethod
+    @callback
+    def schedule_time_transition(hass: HomeAssistant) -> None:
+        """Arrange to re-check every device's time settings at the next DST change."""
+        hass.data.setdefault(DOMAIN, {})
+        HassIntegration.cancel_time_transition(hass)
+        transition = time_info_valid_until(hass.config.time_zone)
+        if transition is None:
+            return
+        _LOGGER.debug("Will re-check device time settings at %s", transition)
+        hass.data[DOMAIN][TIME_TRANSITION_UNSUB] = async_track_point_in_utc_time(
+            hass,
+            partial(HassIntegration.async_time_transition, hass),
+            # A second later, so the zone's offset has definitely changed
+            transition + timedelta(seconds=1),
+        )
+
+    @staticmethod
+    async def async_time_transition(hass: HomeAssistant, _now: datetime) -> None:
+        """
+        Recompute the time settings now that DST has changed, pushing them to our
+        devices only if they differ (e.g. new rules), and checking the devices still
+        have them otherwise.
+        """
+        hass.data[DOMAIN].pop(TIME_TRANSITION_UNSUB, None)
+        await hass.async_add_executor_job(get_time_info, hass.config.time_zone)
+        HassIntegration.schedule_time_transition(hass)
+
+        async def update(entry: ConfigEntry) -> None:
+            coordinator = hass.data[DOMAIN].get(entry.entry_id)
+            if coordinator is None:
+                return
+            try:
+                await coordinator.api.async_update_time_info(
+                    fill_in_timezone(hass.config.time_zone, entry.options),
+                )
+            except Exception as exception:  # pylint: disable=broad-except  # noqa: BLE001
+                _LOGGER.warning(
+                    "Unable to update time settings on %s: %s",
+                    coordinator.api.full_device_name,
+                    exception,
+                )
+
+        await asyncio.gather(
+            *(update(entry) for entry in hass.config_entries.async_entries(DOMAIN)),
+        )
+
     @staticmethod
     async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         """Set up this integration using UI."""
@@ -51,20 +165,10 @@ class HassIntegration:
 
         host = str(entry.data.get(CONF_HOST))
         pin = str(entry.data.get(CONF_PIN))
-        interval = entry.options.get(CONF_INTERVAL)
-        if not interval:
-            interval = DEVICE_POLLING_FREQUENCY
-        interval = float(interval)
-        update_interval = timedelta(seconds=interval)
-
-        time_info = await hass.async_add_executor_job(
-            partial(
-                fill_in_timezone,
-                time_zone_string=hass.config.time_zone,
-                entry=entry,
-            ),
-        )
-        device_detection_settings_info = fill_in_device_settings(entry)
+        update_interval = HassIntegration.get_update_interval(entry)
+
+        time_info = fill_in_timezone(hass.config.time_zone, entry.options)
+        device_detection_settings_info = fill_in_device_settings(entry.options)
 
         session = async_get_clientsession(hass)
         client = DlinkDchHassApiClient(
@@ -75,55 +179,208 @@ class HassIntegration:
             device_detection_settings_info,
         )
 
+        metadata_store = await HassIntegration.async_get_metadata_store(hass)
+        metadata_store.restore(entry.entry_id, client)
+
         coordinator = DlinkDchHassDataUpdateCoordinator(
             hass,
             client=client,
             update_interval=update_interval,
+            metadata_store=metadata_store,
+            entry_id=entry.entry_id,
+            entry_data=dict(entry.data),
         )
-        await coordinator.async_refresh()
+        coordinator.restored_data = HassIntegration.get_restored_data(hass, entry)
+        if coordinator.restored_data:
+            # The sensor can carry on from its restored state, so don't hold up startup
+            entry.async_create_background_task(
+                hass,
+                coordinator.async_refresh(),
+                name=f"{DOMAIN} - {entry.title} - first refresh",
+            )
+        else:
+            await coordinator.async_refresh()
 
-        if not coordinator.last_update_success:
-            _LOGGER.debug("Coordinator failed last_update_success()")
-            raise ConfigEntryNotReady
+            if not coordinator.last_update_success:
+                _LOGGER.debug("Coordinator failed last_update_success()")
+                raise ConfigEntryNotReady
 
         hass.data[DOMAIN][entry.entry_id] = coordinator
+        HassIntegration.apply_metrics_export(hass, entry, coordinator)
 
         job = hass.async_create_task(
-            hass.config_entries.async_forward_entry_setups(entry, [BINARY_SENSOR]),
+            hass.config_entries.async_forward_entry_setups(entry, PLATFORMS),
         )
         if job:
             await job
 
-        # If we haven't already, register to get update messages . . . but only once!
-        if (
-            UPDATE_LISTENER_REMOVE not in hass.data[DOMAIN]
-            or not hass.data[DOMAIN][UPDATE_LISTENER_REMOVE]
-        ):
-            _LOGGER.debug("Registering update listener")
-            hass.data[DOMAIN][UPDATE_LISTENER_REMOVE] = entry.add_update_listener(
-                HassIntegration.async_reload_entry,
-            )
+        # Register to hear about option changes (dropped when the entry is unloaded)
+        _LOGGER.debug("Registering update listener")
+        entry.async_on_unload(
+            entry.add_update_listener(HassIntegration.async_update_options),
+        )
 
+        # Only once we're set up, so a failed setup doesn't leave us polling
+        coordinator.async_start_polling()
         return True
 
+    @staticmethod
+    def get_restored_data(hass: HomeAssistant, entry: ConfigEntry) -> dict | None:
+        """Get the device data the entry's sensor saved before a restart, if any."""
+        entity_id = er.async_get(hass).async_get_entity_id(
+            BINARY_SENSOR,
+            DOMAIN,
+            entry.entry_id,
+        )
+        if entity_id is None:
+            return None
+        stored_state = async_get_restore_state(hass).last_states.get(entity_id)
+        if stored_state is None or stored_state.extra_data is None:
+            return None
+        return restored_data(stored_state.extra_data.as_dict())
+
+    @staticmethod
+    def get_update_interval(entry: ConfigEntry) -> timedelta:
+        """Get the polling interval configured for the entry."""
+        interval = entry.options.get(CONF_INTERVAL)
+        if not interval:
+            interval = DEVICE_POLLING_FREQUENCY
+        return timedelta(seconds=float(interval))
+
+    @staticmethod
+    async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """
+        Apply changed options to the running device, rather than reloading.  Only
+        settings that changed are pushed, and polling carries on throughout.
+        """
+        coordinator: DlinkDchHassDataUpdateCoordinator | None = hass.data[DOMAIN].get(
+            entry.entry_id
+        )
+        if coordinator is None or coordinator.entry_data != dict(entry.data):
+            # Not running, or connection details changed, so start over
+            await HassIntegration.async_reload_entry(hass, entry)
+            return
+
+        update_interval = HassIntegration.get_update_interval(entry)
+        if update_interval != coordinator.base_update_interval:
+            _LOGGER.debug(
+                "Changing update interval for %s to %s",
+                coordinator.api.full_device_name,
+                update_interval,
+            )
+            coordinator.set_base_update_interval(update_interval)
+        HassIntegration.apply_metrics_export(hass, entry, coordinator)
+
+        try:
+            await coordinator.api.async_update_settings(
+                fill_in_timezone(hass.config.time_zone, entry.options),
+                fill_in_device_settings(entry.options),
+            )
+        except Exception as exception:  # pylint: disable=broad-except  # noqa: BLE001
+            # They'll get pushed on the next login instead
+            _LOGGER.warning(
+                "Unable to push new settings to %s: %s",
+                coordinator.api.full_device_name,
+                exception,
+            )
+
+    @staticmethod
+    @callback
+    def apply_metrics_export(
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        coordinator: DlinkDchHassDataUpdateCoordinator,
+    ) -> None:
+        """Start or stop exporting the entry's metrics, as its options say."""
+        if not entry.options.get(CONF_METRICS_EXPORT, DEFAULT_METRICS_EXPORT):
+            if coordinator.exporter is not None:
+                coordinator.exporter.remove_device(entry.entry_id)
+                coordinator.exporter = None
+            return
+        if coordinator.exporter is None:
+            coordinator.exporter = HassIntegration.get_metrics_exporter(hass)
+
+    @staticmethod
+    @callback
+    def get_metrics_exporter(hass: HomeAssistant) -> OpenMetricsExporter:
+        """Get the (shared) metrics exporter, serving it the first time."""
+        exporter = hass.data[DOMAIN].get(METRICS_EXPORTER)
+        if exporter is None:
+            exporter = OpenMetricsExporter()
+            hass.data[DOMAIN][METRICS_EXPORTER] = exporter
+            # Views can't be removed, so this stays up (if empty) once registered
+            if hass.http is not None:
+                hass.http.register_view(DlinkDchMetricsView(exporter))
+            else:
+                _LOGGER.warning("HTTP isn't set up, so metrics can't be served")
+        return exporter
+
+    @staticmethod
+    async def async_get_metadata_store(hass: HomeAssistant) -> MetadataStore:
+        """Get the (shared) persistent metadata store, loading it the first time."""
+        metadata_store = hass.data[DOMAIN].get(METADATA_STORE)
+        if metadata_store is None:
+            metadata_store = MetadataStore(hass)
+            await metadata_store.async_load()
+            hass.data[DOMAIN][METADATA_STORE] = metadata_store
+        return metadata_store
+
+    @staticmethod
+    async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Forget anything we persisted about a removed entry."""
+        if hass.data.get(DOMAIN) is None:
+            hass.data.setdefault(DOMAIN, {})
+        metadata_store = await HassIntegration.async_get_metadata_store(hass)
+        metadata_store.remove(entry.entry_id)
+
     @staticmethod
     async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         """Handle removal of an entry."""
         # coordinator = hass.data[DOMAIN][entry.entry_id]
-        unloaded = await hass.config_entries.async_forward_entry_unload(
-            entry,
-            BINARY_SENSOR,
-        )
+        unloaded = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
         if unloaded:
-            hass.data[DOMAIN].pop(entry.entry_id)
+            coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+            coordinator.async_stop_polling()
+            if coordinator.exporter is not None:
+                coordinator.exporter.remove_device(entry.entry_id)
 
         return unloaded
 
     @staticmethod
     async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-        """Reload config entry."""
-        _ = await HassIntegration.async_unload_entry(hass, entry)
-        _ = await HassIntegration.async_setup_entry(hass, entry)
+        """
+        Reload config entry, through HA so the entry's on-unload callbacks (like
+        removing its update listener) run, rather than piling up.
+        """
+        await hass.config_entries.async_reload(entry.entry_id)
+
+
+class MetadataStore:
+    """Persists each device's metadata cache in HA storage, keyed by config entry."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize."""
+        self._store: Store[dict] = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._data: dict[str, dict] = {}
+
+    async def async_load(self) -> None:
+        """Load the store from disk."""
+        self._data = await self._store.async_load() or {}
+
+    def restore(self, entry_id: str, client: DlinkDchHassApiClient) -> None:
+        """Prime a client's metadata cache from what we persisted."""
+        if entry_id in self._data:
+            client.metadata_cache.load(self._data[entry_id])
+
+    def save(self, entry_id: str, client: DlinkDchHassApiClient) -> None:
+        """Schedule a save of a client's metadata cache."""
+        self._data[entry_id] = client.metadata_cache.as_dict()
+        self._store.async_delay_save(lambda: self._data, STORAGE_SAVE_DELAY)
+
+    def remove(self, entry_id: str) -> None:
+        """Drop an entry from the store."""
+        if self._data.pop(entry_id, None) is not None:
+            self._store.async_delay_save(lambda: self._data, STORAGE_SAVE_DELAY)
 
 
 class DlinkDchHassDataUpdateCoordinator(DataUpdateCoordinator):
@@ -134,9 +391,47 @@ class DlinkDchHassDataUpdateCoordinator(DataUpdateCoordinator):
         hass: HomeAssistant,
         client: DlinkDchHassApiClient,
         update_interval: timedelta,
+        *,
+        metadata_store: MetadataStore | None = None,
+        entry_id: str | None = None,
+        entry_data: dict | None = None,
     ) -> None:
         """Initialize."""
         self.api = client
+        # The connection data we were set up with
+        self.entry_data = entry_data
+        # Device data from before a restart, for entities to use until our first poll
+        self.restored_data: dict | None = None
+        self.latency = DetectionLatencyTracker()
+        self._last_detection: datetime | None = None
+        self.poll_latency = LatencyHistogram()
+        self.polls_succeeded = 0
+        self.polls_failed = 0
+        # Where to publish our metrics, if the entry has opted in
+        self.exporter: OpenMetricsExporter | None = None
+        # For spotting when polls fall behind:  the interval we were asked for (before
+        # any stretching), the one we're polling at, and when (in loop time) the next
+        # scheduled poll is due
+        self.base_update_interval = update_interval
+        self.poll_interval = update_interval
+        self._refresh_due: float | None = None
+        # The grid polls are scheduled on:  where it starts, its spacing, and how far
+        # it's staggered (like DataUpdateCoordinator does, so devices don't all poll
+        # at once)
+        self._tick_anchor: float | None = None
+        self._tick_interval: float | None = None
+        self._tick_stagger = (
+            randint(RANDOM_MICROSECOND_MIN, RANDOM_MICROSECOND_MAX) / 10**6  # noqa: S311
+        )
+        self._polling = False
+        self._next_poll: asyncio.TimerHandle | None = None
+        self.loop_lag = LatencyHistogram()
+        self.overruns = 0
+        self.behind = False
+        self._polls_that_fit = 0
+        self._metadata_store = metadata_store
+        self._entry_id = entry_id
+        self._saved_metadata_version = client.metadata_cache.version
 
         _LOGGER.debug(
             "Setting up %s with update interval of %s seconds",
@@ -144,21 +439,255 @@ class DlinkDchHassDataUpdateCoordinator(DataUpdateCoordinator):
             update_interval,
         )
 
+        # We schedule the polls ourselves (see async_start_polling), not HA
         super().__init__(
             hass,
             _PACKAGE_LOGGER,
             name=DOMAIN,
-            update_interval=update_interval,
+            update_interval=None,
         )
 
+    @callback
+    def async_start_polling(self) -> None:
+        """
+        Start polling on a fixed grid of the (monotonic) loop clock, rather than an
+        interval after the last poll finished, so polls don't drift later by however
+        long each one takes.  Ticks a poll overran are skipped.  This carries on until
+        async_stop_polling (or shutdown).
+        """
+        self._polling = True
+        self._schedule_poll()
+
+    @callback
+    def async_stop_polling(self) -> None:
+        """Stop polling (a poll already under way finishes, but no more start)."""
+        self._polling = False
+        if self._next_poll is not None:
+            self._next_poll.cancel()
+            self._next_poll = None
+
+    async def async_shutdown(self) -> None:
+        """Stop polling, then shut down as usual."""
+        self.async_stop_polling()
+        await super().async_shutdown()
+
+    @callback
+    def _schedule_poll(self) -> None:
+        """Schedule the next poll, on the next tick of the grid."""
+        if self._next_poll is not None:
+            self._next_poll.cancel()
+        self._next_poll = None
+        if self.config_entry and self.config_entry.pref_disable_polling:
+            return
+        self._refresh_due = self._next_tick(
+            self.hass.loop.time(),
+            self.poll_interval.total_seconds(),
+        )
+        self._next_poll = self.hass.loop.call_at(self._refresh_due, self._handle_tick)
+
+    def _next_tick(self, now: float, interval: float) -> float:
+        """Return the first tick of the poll grid after now."""
+        if self._tick_anchor is None or interval != self._tick_interval:
+            self._tick_anchor = now + self._tick_stagger
+            self._tick_interval = interval
+        ticks = math.floor((now - self._tick_anchor) / interval) + 1
+        return self._tick_anchor + max(ticks, 1) * interval
+
+    @callback
+    def _handle_tick(self) -> None:
+        """Start a scheduled poll, in the background."""
+        self._next_poll = None
+        if self.hass.is_stopping:
+            return
+        if self.config_entry:
+            self.config_entry.async_create_background_task(
+                self.hass,
+                self._async_poll(),
+                name=f"{self.name} - {self.config_entry.title} - refresh",
+                eager_start=True,
+            )
+        else:
+            self.hass.async_create_background_task(
+                self._async_poll(),
+                name=f"{self.name} - refresh",
+                eager_start=True,
+            )
+
+    async def _async_poll(self) -> None:
+        """Poll, then schedule the next one (unless polling stopped meanwhile)."""
+        try:
+            await self.async_refresh()
+        finally:
+            if self._polling and not self.hass.is_stopping:
+                self._schedule_poll()
+
+    def set_base_update_interval(self, update_interval: timedelta) -> None:
+        """Change the interval we were asked for, starting afresh on pacing."""
+        self.base_update_interval = update_interval
+        self.poll_interval = update_interval
+        self.behind = False
+        self._polls_that_fit = 0
+        self.api.shed_optional_calls = False
+
+    def _start_lag(self) -> float:
+        """Return how late this poll started, if it's a scheduled one."""
+        due = self._refresh_due
+        now = self.hass.loop.time()
+        if due is None or now < due:
+            # Someone asked for this one
+            return 0.0
+        self._refresh_due = None
+        lag = now - due
+        self.loop_lag.record(lag)
+        return lag
+
     async def _async_update_data(self) -> dict:
         """Update data via library."""
+        lag = self._start_lag()
+        started = time.perf_counter()
         try:
-            return await self.api.async_get_data()
+            with profiler.scope():
+                data = await self.api.async_get_data()
         except Exception as exception:
+            self._record_poll(started, lag, succeeded=False)
             _LOGGER.debug(
                 "Getting data failed for DCH-Sx0 integration: %s",
                 exception,
                 exc_info=exception,
             )
             raise UpdateFailed(self.api.full_device_name) from exception
+        self._track_detection(data.get("last_detection"))
+        self._record_poll(started, lag, succeeded=True)
+        self._save_metadata_if_changed()
+        return data
+
+    def _record_poll(self, started: float, lag: float, *, succeeded: bool) -> None:
+        """Count a poll, pace the next ones, and publish our metrics."""
+        duration = time.perf_counter() - started
+        self.poll_latency.record(duration)
+        self._pace(duration + lag)
+        if succeeded:
+            self.polls_succeeded += 1
+        else:
+            self.polls_failed += 1
+        if self.exporter is not None and self._entry_id:
+            self.exporter.set_device(
+                self._entry_id,
+                self.metric_families(up=succeeded),
+            )
+
+    def _pace(self, cost: float) -> None:
+        """
+        Stretch the interval when polls (counting how late they started) overrun it,
+        skipping optional calls until we've caught up, then relax it back once polls
+        would fit again.  That way a slow device or busy loop means slower polls,
+        rather than a backlog of them.
+        """
+        current = self.poll_interval.total_seconds()
+        if not current:
+            return
+        base = self.base_update_interval.total_seconds()
+        if cost > current:
+            self.overruns += 1
+            self._polls_that_fit = 0
+            interval = min(
+                max(current, cost) * INTERVAL_STRETCH_FACTOR,
+                base * MAX_INTERVAL_STRETCH,
+            )
+            if not self.behind:
+                _LOGGER.warning(
+                    "Polls of %s are taking %.2fs, more than the %.2fs interval; "
+                    "slowing down",
+                    self.api.full_device_name,
+                    cost,
+                    current,
+                )
+                self.behind = True
+        elif current > base and cost < current / INTERVAL_STRETCH_FACTOR:
+            self._polls_that_fit += 1
+            if self._polls_that_fit < INTERVAL_RECOVERY_POLLS:
+                return
+            self._polls_that_fit = 0
+            interval = max(base, current / INTERVAL_STRETCH_FACTOR)
+            if interval == base:
+                _LOGGER.info("Polls of %s have caught up", self.api.full_device_name)
+                self.behind = False
+        else:
+            return
+        self.poll_interval = timedelta(seconds=interval)
+        self.api.shed_optional_calls = self.behind
+
+    def pacing(self) -> dict[str, Any]:
+        """Return how polls are keeping up, for diagnostics."""
+        return {
+            "base_update_interval": self.base_update_interval.total_seconds(),
+            "update_interval": self.poll_interval.total_seconds(),
+            "behind": self.behind,
+            "overruns": self.overruns,
+            "start_lag": self.loop_lag.snapshot(),
+            "poll_duration": self.poll_latency.snapshot(),
+        }
+
+    def metric_families(self, *, up: bool) -> dict[str, list[str]]:
+        """Render our samples for each exported metric family."""
+        labels = {"device": str((self.entry_data or {}).get(CONF_HOST))}
+        metrics = self.api.call_metrics
+        return {
+            "up": [sample("up", labels, int(up))],
+            "polls": [
+                sample(
+                    "polls_total", {**labels, "result": "success"}, self.polls_succeeded
+                ),
+                sample(
+                    "polls_total", {**labels, "result": "failure"}, self.polls_failed
+                ),
+            ],
+            "poll_duration_seconds": histogram_samples(
+                "poll_duration_seconds",
+                labels,
+                self.poll_latency,
+            ),
+            "logins": [
+                sample(
+                    "logins_total",
+                    labels,
+                    metrics.entered(HNAPDeviceStatus.INITIALIZING),
+                ),
+            ],
+            "overruns": [sample("overruns_total", labels, self.overruns)],
+            "reboots": [
+                sample(
+                    "reboots_total",
+                    labels,
+                    metrics.entered(HNAPDeviceStatus.REBOOTING),
+                ),
+            ],
+            "last_detection_timestamp_seconds": [
+                sample(
+                    "last_detection_timestamp_seconds",
+                    labels,
+                    self._last_detection.timestamp(),
+                ),
+            ]
+            if self._last_detection
+            else [],
+        }
+
+    def _track_detection(self, last_detection: datetime | None) -> None:
+        """Start timing a new detection's journey to an HA state."""
+        if (
+            last_detection
+            and self._last_detection
+            and last_detection != self._last_detection
+        ):
+            self.latency.observed(last_detection.timestamp(), time.time())
+        self._last_detection = last_detection
+
+    def _save_metadata_if_changed(self) -> None:
+        """Persist the device metadata cache, if it changed since we last did."""
+        if not self._metadata_store or not self._entry_id:
+            return
+        version = self.api.metadata_cache.version
+        if version != self._saved_metadata_version:
+            self._saved_metadata_version = version
+            self._metadata_store.save(self._entry_id, self.api)
@@ -0,0 +1,41 @@
+"""
+The original ElementTree-based SOAP request builder (no HA dependencies).  Kept out of
+dch_wifi so that the XML libraries it needs aren't imported with the client;  the
+client builds its requests with a string template instead.
+"""
+
+from __future__ import annotations
+
+from io import BytesIO
+from typing import Any
+from xml.etree.ElementTree import Element, ElementTree  # nosec B405
+
+import defusedxml.ElementTree as DET  # noqa: N814
+
+from .dch_wifi import NanoSOAPClient
+
+
+def generate_request_xml(method: str, **kwargs: Any) -> str:  # noqa: ANN401
+    """Generate a SOAP request."""
+    body = Element("soap:Body")
+    action = Element(method, NanoSOAPClient.ACTION_NS)
+    body.append(action)
+
+    for param, value in kwargs.items():
+        element = Element(param)
+        if isinstance(value, str) and len(value) > 0 and value[0] == "<":
+            # Assume it's raw XML
+            sub = DET.fromstring(value)
+            element.append(sub)
+        else:
+            element.text = str(value)
+        action.append(element)
+
+    envelope = Element("soap:Envelope", NanoSOAPClient.BASE_NS)
+    envelope.append(body)
+
+    file_handle = BytesIO()
+    tree = ElementTree(envelope)
+    tree.write(file_handle, encoding="utf-8", xml_declaration=True)
+
+    return file_handle.getvalue().decode("utf-8")
@@ -0,0 +1,127 @@
+"""Lightweight latency metrics for the DCH-S150/DCH-S160 (no HA dependencies)."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any
+
+# Upper bounds (in seconds) of the latency buckets; anything slower lands in the last
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram.  Recording is a bisect and a few additions, and
+    percentiles are estimated by interpolating within the bucket they fall in.
+    """
+
+    __slots__ = ("bounds", "count", "counts", "max", "total")
+
+    def __init__(self, bounds: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS) -> None:
+        """Initialize an empty histogram."""
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        """Record a latency (in seconds)."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: LatencyHistogram) -> None:
+        """Add in another histogram's samples (it must have the same buckets)."""
+        if other.bounds != self.bounds:
+            raise ValueError("Can only merge histograms with the same buckets")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts, strict=True)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction: float) -> float | None:
+        """Estimate the latency below which the given fraction (0-1) of samples fall."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return a summary suitable for diagnostics."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.max if self.count else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": {
+                **{
+                    str(bound): count
+                    for bound, count in zip(self.bounds, self.counts, strict=False)
+                },
+                "+Inf": self.counts[-1],
+            },
+        }
+
+
+class DetectionLatencyTracker:
+    """
+    Tracks how long a detection takes to become an HA state:  from the time the
+    device says it detected something, to the poll that saw it, to the state write.
+    """
+
+    def __init__(self) -> None:
+        """Initialize with nothing tracked."""
+        self.to_observed = LatencyHistogram()
+        self.to_written = LatencyHistogram()
+        self.end_to_end = LatencyHistogram()
+        # (detected, observed) for a detection that hasn't been written yet
+        self._pending: tuple[float, float] | None = None
+
+    def observed(self, detected: float, observed: float) -> None:
+        """Note that a poll at `observed` saw a new detection made at `detected`."""
+        self._pending = (detected, observed)
+
+    def written(self, written: float) -> None:
+        """Note that the state was written, completing any pending detection."""
+        if self._pending is None:
+            return
+        detected, observed = self._pending
+        self._pending = None
+        # The device's clock can be a little ahead of ours
+        self.to_observed.record(max(observed - detected, 0.0))
+        self.to_written.record(max(written - observed, 0.0))
+        self.end_to_end.record(max(written - detected, 0.0))
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return a summary suitable for diagnostics."""
+        return {
+            "detected_to_observed": self.to_observed.snapshot(),
+            "observed_to_written": self.to_written.snapshot(),
+            "detected_to_written": self.end_to_end.snapshot(),
+        }
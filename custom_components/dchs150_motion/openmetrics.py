@@ -0,0 +1,152 @@
+"""OpenMetrics (Prometheus) export of per-device metrics for dlink_dchs150_hass."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, ClassVar
+
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+
+if TYPE_CHECKING:
+    from .metrics import LatencyHistogram
+
+from .const import DOMAIN, METRICS_URL
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+METRIC_PREFIX = "dchs150_"
+
+# (name, type, help) for each family we export, in the order they're rendered
+FAMILIES = (
+    ("up", "gauge", "Whether the last poll of the device succeeded."),
+    ("polls", "counter", "Polls of the device, by result."),
+    ("poll_duration_seconds", "histogram", "How long polls of the device take."),
+    ("logins", "counter", "Times we've had to log in to the device."),
+    (
+        "overruns",
+        "counter",
+        "Polls that took longer than the interval, counting how late they started.",
+    ),
+    ("reboots", "counter", "Times we've rebooted the device."),
+    (
+        "last_detection_timestamp_seconds",
+        "gauge",
+        "When the device last detected something, in seconds since the epoch.",
+    ),
+)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    """Render a label set."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def sample(name: str, labels: dict[str, str], value: float) -> str:
+    """Render one sample line."""
+    return f"{METRIC_PREFIX}{name}{_format_labels(labels)} {value}"
+
+
+def histogram_samples(
+    name: str,
+    labels: dict[str, str],
+    histogram: LatencyHistogram,
+) -> list[str]:
+    """Render the cumulative buckets, count and sum of a histogram."""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.bounds, histogram.counts, strict=False):
+        cumulative += count
+        lines.append(sample(f"{name}_bucket", {**labels, "le": str(bound)}, cumulative))
+    lines.extend(
+        [
+            sample(f"{name}_bucket", {**labels, "le": "+Inf"}, histogram.count),
+            sample(f"{name}_count", labels, histogram.count),
+            sample(f"{name}_sum", labels, histogram.total),
+        ],
+    )
+    return lines
+
+
+class OpenMetricsExporter:
+    """
+    Keeps each device's samples pre-rendered, per metric family.  A device update
+    only re-renders the families whose samples changed, and a scrape with nothing
+    new just returns the last body, so scrapes don't rebuild the whole fleet.
+    """
+
+    FAMILY_NAMES: ClassVar[tuple[str, ...]] = tuple(family[0] for family in FAMILIES)
+
+    def __init__(self) -> None:
+        """Initialize with no devices."""
+        # family -> device -> that device's rendered lines for the family
+        self._samples: dict[str, dict[str, str]] = {
+            name: {} for name in self.FAMILY_NAMES
+        }
+        self._rendered: dict[str, str] = {}
+        self._dirty: set[str] = set(self.FAMILY_NAMES)
+        self._body: str | None = None
+
+    def set_device(self, device_id: str, families: dict[str, list[str]]) -> None:
+        """Replace a device's samples, marking only families that changed."""
+        for name, lines in families.items():
+            rendered = "\n".join(lines)
+            if self._samples[name].get(device_id) != rendered:
+                self._samples[name][device_id] = rendered
+                self._dirty.add(name)
+
+    def remove_device(self, device_id: str) -> None:
+        """Stop exporting a device."""
+        for name, samples in self._samples.items():
+            if samples.pop(device_id, None) is not None:
+                self._dirty.add(name)
+
+    @property
+    def devices(self) -> set[str]:
+        """Return the devices we're exporting."""
+        return {device for samples in self._samples.values() for device in samples}
+
+    def render(self) -> str:
+        """Return the OpenMetrics text for every device."""
+        if self._body is not None and not self._dirty:
+            return self._body
+        for name, metric_type, help_text in FAMILIES:
+            if name not in self._dirty:
+                continue
+            samples = [lines for lines in self._samples[name].values() if lines]
+            self._rendered[name] = "\n".join(
+                [
+                    f"# TYPE {METRIC_PREFIX}{name} {metric_type}",
+                    f"# HELP {METRIC_PREFIX}{name} {help_text}",
+                    *samples,
+                ],
+            )
+        self._dirty.clear()
+        self._body = (
+            "\n".join(self._rendered[name] for name in self.FAMILY_NAMES) + "\n# EOF\n"
+        )
+        return self._body
+
+
+class DlinkDchMetricsView(HomeAssistantView):
+    """Serves the exported metrics, for Prometheus to scrape."""
+
+    url = METRICS_URL
+    name = f"api:{DOMAIN}:metrics"
+    requires_auth = True
+
+    def __init__(self, exporter: OpenMetricsExporter) -> None:
+        """Initialize the view."""
+        self._exporter = exporter
+
+    async def get(self, _request: web.Request) -> web.Response:
+        """Return the current metrics."""
+        return web.Response(
+            body=self._exporter.render(),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
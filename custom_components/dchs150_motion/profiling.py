@@ -0,0 +1,100 @@
+"""On-demand profiling of device polls (no HA dependencies)."""
+
+from __future__ import annotations
+
+import io
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import cProfile
+    from collections.abc import Iterator
+
+
+class UpdateProfiler:
+    """
+    Runs cProfile only while at least one device poll is in progress.  cProfile
+    sees the whole event loop thread, so anything else that runs while a poll is
+    waiting on the network is caught as well; the summary filters down to us.
+    """
+
+    def __init__(self) -> None:
+        """Initialize, not profiling."""
+        self._profile: cProfile.Profile | None = None
+        self._active = 0
+        self.updates = 0
+
+    @property
+    def running(self) -> bool:
+        """Return whether we're collecting a profile."""
+        return self._profile is not None
+
+    def start(self) -> None:
+        """
+        Start collecting a profile of the polls from now on.  Raises ValueError if
+        some other profiler is already running.
+        """
+        # Only imported when someone asks for a profile
+        import cProfile  # noqa: PLC0415
+
+        profile = cProfile.Profile()
+        # Find out now, rather than in the middle of a poll, if we can't profile
+        profile.enable()
+        profile.disable()
+        self._profile = profile
+        self._active = 0
+        self.updates = 0
+
+    def stop(self) -> cProfile.Profile | None:
+        """Stop collecting, and return what we collected."""
+        profile, self._profile = self._profile, None
+        if profile is not None and self._active:
+            profile.disable()
+        self._active = 0
+        return profile
+
+    @contextmanager
+    def scope(self) -> Iterator[None]:
+        """Profile the poll inside this, if we're collecting a profile."""
+        profile = self._profile
+        if profile is None:
+            yield
+            return
+        if not self._active:
+            profile.enable()
+        self._active += 1
+        self.updates += 1
+        try:
+            yield
+        finally:
+            # Unless stop() got here first
+            if profile is self._profile:
+                self._active -= 1
+                if not self._active:
+                    profile.disable()
+
+
+def write_profile(
+    profile: cProfile.Profile,
+    prof_path: str,
+    summary_path: str,
+    top: int,
+    restriction: str,
+) -> None:
+    """
+    Save the raw profile (for snakeviz, etc.), and a summary of the top functions
+    matching the restriction, by cumulative and then by internal time.
+    """
+    import pstats  # noqa: PLC0415
+
+    profile.dump_stats(prof_path)
+    summary = io.StringIO()
+    stats = pstats.Stats(profile, stream=summary)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(restriction, top)
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(restriction, top)
+    Path(summary_path).write_text(summary.getvalue(), encoding="utf-8")
+
+
+# Shared by every device's coordinator
+profiler = UpdateProfiler()
@@ -0,0 +1,199 @@
+"""Recording exchanges with a device, and replaying them without it."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import re
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any
+
+from aiohttp.client_exceptions import ServerDisconnectedError
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import Path
+
+from .const import TRAFFIC_RECORDING_LIMIT
+from .dch_wifi import ACTION_BASE_URL, GeneralCommunicationError, NanoSOAPClient
+
+CORPUS_VERSION = 1
+
+# What a recorded failure is replayed as; anything else is a GeneralCommunicationError
+REPLAYED_ERRORS: dict[str, type[Exception]] = {
+    "ServerDisconnectedError": ServerDisconnectedError,
+    "TimeoutError": TimeoutError,
+}
+
+# Login's secrets:  with the challenge, public key and password the PIN can be brute
+# forced offline, so they're recorded as this instead.  Replay doesn't check them.
+SCRUBBED = "REDACTED"
+SCRUBBED_PARAMS = frozenset({"Username", "LoginPassword"})
+_SCRUBBED_ELEMENTS = re.compile(r"<(Challenge|PublicKey|Cookie)>[^<]*</\1>")
+
+
+def scrub_text(text: str) -> str:
+    """Return a response with Login's secrets taken out."""
+    return _SCRUBBED_ELEMENTS.sub(rf"<\1>{SCRUBBED}</\1>", text)
+
+
+@dataclass(slots=True)
+class Exchange:
+    """One request to the device, and what came back."""
+
+    method: str
+    params: dict[str, str]
+    # When the request went out, in seconds since the recording started
+    at: float
+    # How long the response took to come back
+    duration: float
+    date: str | None = None
+    text: str | None = None
+    # The exception's class name, if the exchange failed
+    error: str | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the exchange as something JSON-friendly, leaving out what's unset."""
+        return {
+            name: value for name, value in asdict(self).items() if value is not None
+        }
+
+
+class TrafficRecorder:
+    """
+    Collects a SOAP client's exchanges with its device, with their timing, until
+    they're saved.  Attach it as the client's recorder to start recording.
+    """
+
+    def __init__(self, address: str, limit: int = TRAFFIC_RECORDING_LIMIT) -> None:
+        """Initialize, starting the clock for the recording."""
+        self.address = address
+        self.limit = limit
+        self.started = time.time()
+        self.exchanges: list[Exchange] = []
+        self.dropped = 0
+
+    def record(
+        self,
+        method: str,
+        params: dict[str, Any],
+        sent: float,
+        received: float,
+        *,
+        date: str | None = None,
+        text: str | None = None,
+        error: BaseException | None = None,
+    ) -> None:
+        """Add an exchange (without any login secrets), unless the recording is full."""
+        if len(self.exchanges) >= self.limit:
+            self.dropped += 1
+            return
+        self.exchanges.append(
+            Exchange(
+                method,
+                {
+                    name: SCRUBBED if name in SCRUBBED_PARAMS else str(value)
+                    for name, value in params.items()
+                },
+                round(sent - self.started, 6),
+                round(received - sent, 6),
+                date,
+                scrub_text(text) if text and method == "Login" else text,
+                type(error).__name__ if error is not None else None,
+            ),
+        )
+
+    def save(self, path: str | Path) -> int:
+        """
+        Write the recording out as gzipped JSON lines:  a header, then one exchange per
+        line.  Returns how many exchanges were written.  This blocks.
+        """
+        header = {
+            "version": CORPUS_VERSION,
+            "address": self.address,
+            "started": self.started,
+            "dropped": self.dropped,
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            file.write(json.dumps(header) + "\n")
+            for exchange in self.exchanges:
+                file.write(json.dumps(exchange.as_dict(), separators=(",", ":")) + "\n")
+        return len(self.exchanges)
+
+
+def load_corpus(path: str | Path) -> tuple[dict[str, Any], list[Exchange]]:
+    """Read a saved recording, returning its header and exchanges.  This blocks."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        header = json.loads(file.readline())
+        if header.get("version") != CORPUS_VERSION:
+            raise ValueError(f"Unsupported corpus version {header.get('version')}")
+        exchanges = [Exchange(**json.loads(line)) for line in file if line.strip()]
+    return header, exchanges
+
+
+class ReplaySOAPClient(NanoSOAPClient):
+    """
+    Answers calls from a recording instead of the device:  each method's recorded
+    responses in turn, after the recorded delay divided by speed (so 1 is as recorded,
+    10 is ten times faster, and 0 is no delay at all).  Everything past the transport
+    (parsing, the HNAPClient state machine) runs as it would against the device.
+
+    Date headers come back as recorded, so the client sees the device's clock as off
+    by however long ago the recording was made, and its skew correction maps the
+    recorded detections onto now.
+    """
+
+    def __init__(
+        self,
+        exchanges: Iterable[Exchange],
+        speed: float = 1.0,
+        *,
+        repeat: bool = False,
+        address: str = "replay",
+    ) -> None:
+        """Initialize, to replay the given exchanges."""
+        super().__init__(address, ACTION_BASE_URL)
+        self.speed = speed
+        # Start a method's responses over once they've all been replayed
+        self.repeat = repeat
+        self._recorded: dict[str, list[Exchange]] = {}
+        for exchange in exchanges:
+            self._recorded.setdefault(exchange.method, []).append(exchange)
+        self._replayed: Counter[str] = Counter()
+
+    @property
+    def replayed(self) -> int:
+        """Return how many exchanges we've replayed."""
+        return self._replayed.total()
+
+    async def _post(
+        self,
+        _request_xml: str,
+        headers: dict[str, str],
+        _timeout: int,
+    ) -> tuple[float, str | None, str]:
+        """Answer with the next recorded response to the method."""
+        method = headers["SOAPAction"].strip('"').rsplit("/", 1)[-1]
+        exchange = self._next_exchange(method)
+        if self.speed and exchange.duration:
+            await asyncio.sleep(exchange.duration / self.speed)
+        if exchange.error is not None:
+            error = REPLAYED_ERRORS.get(exchange.error, GeneralCommunicationError)
+            raise error(f"Replayed {exchange.error} from {method}")
+        return time.time(), exchange.date, exchange.text or ""
+
+    def _next_exchange(self, method: str) -> Exchange:
+        """Return the next recorded exchange for the method."""
+        recorded = self._recorded.get(method)
+        if not recorded:
+            raise GeneralCommunicationError(f"Nothing recorded for {method}")
+        index = self._replayed[method]
+        if index >= len(recorded):
+            if not self.repeat:
+                raise GeneralCommunicationError(f"Replayed every recorded {method}")
+            index %= len(recorded)
+        self._replayed[method] += 1
+        return recorded[index]
@@ -0,0 +1,83 @@
+"""Sensor platform for dlink_dchs150_hass:  diagnostics on how quickly we see detections."""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory, UnitOfTime
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.entity_platform import AddEntitiesCallback
+    from homeassistant.helpers.typing import UndefinedType
+    from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .const import DEFAULT_SENSOR_NAME, DOMAIN
+from .entity import DlinkDchHassEntity
+
+_LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# The detection-to-state latency percentiles we expose
+LATENCY_PERCENTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_devices: AddEntitiesCallback,
+) -> None:
+    """Set up sensor platform."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    async_add_devices(
+        [
+            DlinkDchHassLatencySensor(coordinator, entry, label, fraction)
+            for label, fraction in LATENCY_PERCENTILES
+        ],
+    )
+
+
+class DlinkDchHassLatencySensor(DlinkDchHassEntity, SensorEntity):  # pyright: ignore
+    """How long detections take to show up as a state change, end to end."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_suggested_display_precision = 0
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator[Any],
+        config_entry: ConfigEntry,
+        label: str,
+        fraction: float,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, config_entry)
+        self._label = label
+        self._fraction = fraction
+
+    @property
+    def unique_id(self) -> str | None:  # pyright: ignore
+        """Return a unique ID to use for this entity."""
+        return f"{self.config_entry.entry_id}_detection_latency_{self._label}"
+
+    @property
+    def name(self) -> str | UndefinedType | None:  # pyright: ignore
+        """Return the name of the sensor."""
+        name = self.data.get("device_name") or DEFAULT_SENSOR_NAME
+        return f"{name} detection latency {self._label}"
+
+    @property
+    def native_value(self) -> float | None:  # pyright: ignore
+        """Return the latency percentile, in milliseconds."""
+        latency = self.coordinator.latency.end_to_end.percentile(self._fraction)
+        return round(latency * 1000, 1) if latency is not None else None
@@ -0,0 +1,392 @@
+"""Services for dlink_dchs150_hass."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+from homeassistant.config_entries import SOURCE_IMPORT
+from homeassistant.core import SupportsResponse, callback
+from homeassistant.data_entry_flow import FlowResultType
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Iterable
+
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse
+
+    from .recording import TrafficRecorder
+
+from .api import fill_in_device_settings, fill_in_timezone
+from .const import (
+    ATTR_CLEAR,
+    ATTR_DEVICES,
+    ATTR_DURATION,
+    ATTR_FORMAT,
+    ATTR_HOSTS,
+    ATTR_SAMPLE_RATE,
+    ATTR_TOP,
+    BULK_CONCURRENCY,
+    CONF_BACKOFF,
+    CONF_HOST,
+    CONF_NTP_SERVER,
+    CONF_PIN,
+    CONF_SENSITIVITY,
+    DEFAULT_PROFILE_SECONDS,
+    DEFAULT_PROFILE_TOP,
+    DEFAULT_RECORD_SECONDS,
+    DOMAIN,
+    MAX_PROFILE_SECONDS,
+    MAX_RECORD_SECONDS,
+    PROFILE_RESTRICTION,
+    SERVICE_DUMP_TRACE,
+    SERVICE_ONBOARD,
+    SERVICE_PROFILE,
+    SERVICE_PUSH_SETTINGS,
+    SERVICE_RECORD_TRAFFIC,
+    SERVICE_SET_TRACE_SAMPLING,
+    TRACE_FORMAT_CHROME,
+    TRACE_FORMAT_JSON_LINES,
+)
+from .profiling import profiler, write_profile
+from .tracing import tracer
+
+_LOGGER: logging.Logger = logging.getLogger(__name__)
+
+SET_TRACE_SAMPLING_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_SAMPLE_RATE): vol.All(
+            vol.Coerce(float),
+            vol.Range(min=0, max=1),
+        ),
+    },
+)
+DUMP_TRACE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_FORMAT, default=TRACE_FORMAT_JSON_LINES): vol.In(
+            [TRACE_FORMAT_JSON_LINES, TRACE_FORMAT_CHROME],
+        ),
+        vol.Optional(ATTR_CLEAR, default=False): bool,
+    },
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=DEFAULT_PROFILE_SECONDS): vol.All(
+            vol.Coerce(float),
+            vol.Range(min=1, max=MAX_PROFILE_SECONDS),
+        ),
+        vol.Optional(ATTR_TOP, default=DEFAULT_PROFILE_TOP): vol.All(
+            vol.Coerce(int),
+            vol.Range(min=1),
+        ),
+    },
+)
+
+RECORD_TRAFFIC_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=DEFAULT_RECORD_SECONDS): vol.All(
+            vol.Coerce(float),
+            vol.Range(min=1, max=MAX_RECORD_SECONDS),
+        ),
+    },
+)
+
+# The settings that can be given for many devices at once
+DEVICE_SETTINGS = {
+    vol.Optional(CONF_SENSITIVITY): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+    vol.Optional(CONF_BACKOFF): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    vol.Optional(CONF_NTP_SERVER): cv.string,
+}
+
+ONBOARD_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICES): vol.All(
+            cv.ensure_list,
+            vol.Length(min=1),
+            [
+                vol.Schema(
+                    {
+                        vol.Required(CONF_HOST): cv.string,
+                        vol.Required(CONF_PIN): vol.All(
+                            cv.string, vol.Length(min=6, max=6)
+                        ),
+                        **DEVICE_SETTINGS,
+                    },
+                ),
+            ],
+        ),
+        **DEVICE_SETTINGS,
+    },
+)
+
+PUSH_SETTINGS_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional(ATTR_HOSTS): vol.All(cv.ensure_list, [cv.string]),
+            **DEVICE_SETTINGS,
+        },
+    ),
+    cv.has_at_least_one_key(*(key.schema for key in DEVICE_SETTINGS)),
+)
+
+
+async def _async_bounded(
+    awaitables: Iterable[Awaitable[dict[str, Any]]],
+) -> list[dict[str, Any]]:
+    """Run the awaitables concurrently, at most BULK_CONCURRENCY at a time, in order."""
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def run(awaitable: Awaitable[dict[str, Any]]) -> dict[str, Any]:
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(run(awaitable) for awaitable in awaitables))
+
+
+def _bulk_response(results: list[dict[str, Any]]) -> dict[str, Any]:
+    """Sum up how each device went."""
+    failed = sum(result["error"] is not None for result in results)
+    return {
+        "devices": results,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+    }
+
+
+async def _async_onboard(hass: HomeAssistant, device: dict[str, Any]) -> dict[str, Any]:
+    """Set up one device through the config flow's import step."""
+    result: dict[str, Any] = {"host": device[CONF_HOST], "entry_id": None}
+    try:
+        flow_result = await hass.config_entries.flow.async_init(
+            DOMAIN,
+            context={"source": SOURCE_IMPORT},
+            data=device,
+        )
+    except Exception as exc:  # noqa: BLE001
+        result["error"] = str(exc) or type(exc).__name__
+        return result
+    if flow_result["type"] is FlowResultType.CREATE_ENTRY:
+        result["entry_id"] = flow_result["result"].entry_id
+        result["error"] = None
+    else:
+        result["error"] = flow_result.get("reason", "not_created")
+    return result
+
+
+async def _async_push_settings(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    settings: dict[str, Any],
+) -> dict[str, Any]:
+    """
+    Push the settings to an entry's device (if it's running), then save them in its
+    options.  Pushing first leaves the options listener nothing to push.
+    """
+    result: dict[str, Any] = {
+        "host": entry.data.get(CONF_HOST),
+        "entry_id": entry.entry_id,
+        "error": None,
+    }
+    options = {**entry.options, **settings}
+    coordinator = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if coordinator is not None:
+        try:
+            await coordinator.api.async_update_settings(
+                fill_in_timezone(hass.config.time_zone, options),
+                fill_in_device_settings(options),
+            )
+        except Exception as exc:  # noqa: BLE001
+            # Saved anyway, so they're pushed on the next login
+            result["error"] = str(exc) or type(exc).__name__
+    hass.config_entries.async_update_entry(entry, options=options)
+    return result
+
+
+async def _async_record(
+    hass: HomeAssistant,
+    duration: float,
+) -> dict[str, TrafficRecorder | None]:
+    """Record every loaded entry's traffic for the duration, returning the recorders."""
+    coordinators = {
+        entry.entry_id: coordinator
+        for entry in hass.config_entries.async_entries(DOMAIN)
+        if (coordinator := hass.data.get(DOMAIN, {}).get(entry.entry_id))
+    }
+    for coordinator in coordinators.values():
+        coordinator.api.start_recording()
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        recorders = {
+            entry_id: coordinator.api.stop_recording()
+            for entry_id, coordinator in coordinators.items()
+        }
+    return recorders
+
+
+async def _async_save_recordings(
+    hass: HomeAssistant,
+    recorders: dict[str, TrafficRecorder | None],
+) -> dict[str, dict[str, Any]]:
+    """Save each entry's recording to the config directory, skipping empty ones."""
+    stamp = dt_util.now().strftime("%Y%m%d-%H%M%S")
+    recordings = {}
+    for entry_id, recorder in recorders.items():
+        if recorder is None or not recorder.exchanges:
+            continue
+        path = hass.config.path(f"{DOMAIN}_traffic_{stamp}_{entry_id}.jsonl.gz")
+        exchanges = await hass.async_add_executor_job(recorder.save, path)
+        recordings[recorder.address] = {"path": path, "exchanges": exchanges}
+    if not recordings:
+        raise HomeAssistantError("No device traffic was recorded")
+    _LOGGER.info("Recorded traffic from %s devices", len(recordings))
+    return recordings
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register our services (once, however many entries we have)."""
+    if hass.services.has_service(DOMAIN, SERVICE_SET_TRACE_SAMPLING):
+        return
+
+    async def async_set_trace_sampling(call: ServiceCall) -> None:
+        """Start (or stop, with 0) sampling polls for tracing."""
+        tracer.sample_rate = call.data[ATTR_SAMPLE_RATE]
+        _LOGGER.info("Tracing %.0f%% of device calls", tracer.sample_rate * 100)
+
+    async def async_dump_trace(call: ServiceCall) -> ServiceResponse:
+        """Write the spans traced so far to a file in the config directory."""
+        chrome = call.data[ATTR_FORMAT] == TRACE_FORMAT_CHROME
+        text = tracer.as_chrome_trace() if chrome else tracer.as_json_lines()
+        spans = len(tracer.spans)
+        if call.data[ATTR_CLEAR]:
+            tracer.clear()
+        path = hass.config.path(f"{DOMAIN}_trace.{'json' if chrome else 'jsonl'}")
+        await hass.async_add_executor_job(Path(path).write_text, text, "utf-8")
+        _LOGGER.info("Wrote %s trace spans to %s", spans, path)
+        return {"path": path, "spans": spans}
+
+    async def async_profile(call: ServiceCall) -> ServiceResponse:
+        """Profile every device's polls for a while, and write out the results."""
+        if profiler.running:
+            raise HomeAssistantError("A profile is already being collected")
+        try:
+            profiler.start()
+        except ValueError as exc:
+            raise HomeAssistantError(f"Unable to start profiling: {exc}") from exc
+        try:
+            await asyncio.sleep(call.data[ATTR_DURATION])
+        finally:
+            profile = profiler.stop()
+        updates = profiler.updates
+        if profile is None or not updates:
+            raise HomeAssistantError("No device polls ran while profiling")
+        stamp = dt_util.now().strftime("%Y%m%d-%H%M%S")
+        prof_path = hass.config.path(f"{DOMAIN}_profile_{stamp}.prof")
+        summary_path = hass.config.path(f"{DOMAIN}_profile_{stamp}.txt")
+        await hass.async_add_executor_job(
+            write_profile,
+            profile,
+            prof_path,
+            summary_path,
+            call.data[ATTR_TOP],
+            PROFILE_RESTRICTION,
+        )
+        _LOGGER.info("Profiled %s polls, to %s", updates, prof_path)
+        return {"profile": prof_path, "summary": summary_path, "updates": updates}
+
+    recording = asyncio.Lock()
+
+    async def async_record_traffic(call: ServiceCall) -> ServiceResponse:
+        """Record every device's traffic for a while, to replay without the devices."""
+        if recording.locked():
+            raise HomeAssistantError("Traffic is already being recorded")
+        async with recording:
+            recorders = await _async_record(hass, call.data[ATTR_DURATION])
+        return {"recordings": await _async_save_recordings(hass, recorders)}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_TRACE_SAMPLING,
+        async_set_trace_sampling,
+        schema=SET_TRACE_SAMPLING_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_DUMP_TRACE,
+        async_dump_trace,
+        schema=DUMP_TRACE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RECORD_TRAFFIC,
+        async_record_traffic,
+        schema=RECORD_TRAFFIC_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    _async_setup_bulk_services(hass)
+
+
+@callback
+def _async_setup_bulk_services(hass: HomeAssistant) -> None:
+    """Register the services that set up, or change, many devices at once."""
+
+    async def async_onboard(call: ServiceCall) -> ServiceResponse:
+        """Set up many devices at once, with the settings given."""
+        shared = {key: value for key, value in call.data.items() if key != ATTR_DEVICES}
+        results = await _async_bounded(
+            _async_onboard(hass, {**shared, **device})
+            for device in call.data[ATTR_DEVICES]
+        )
+        response = _bulk_response(results)
+        _LOGGER.info("Onboarded %s of %s devices", response["succeeded"], len(results))
+        return response
+
+    async def async_push_settings(call: ServiceCall) -> ServiceResponse:
+        """Change settings on many devices at once."""
+        settings = {key: value for key, value in call.data.items() if key != ATTR_HOSTS}
+        entries = hass.config_entries.async_entries(DOMAIN, include_ignore=False)
+        hosts = call.data.get(ATTR_HOSTS)
+        if hosts:
+            by_host = {entry.data.get(CONF_HOST): entry for entry in entries}
+            if unknown := [host for host in hosts if host not in by_host]:
+                raise HomeAssistantError(f"No device set up at {', '.join(unknown)}")
+            entries = [by_host[host] for host in hosts]
+        results = await _async_bounded(
+            _async_push_settings(hass, entry, settings) for entry in entries
+        )
+        response = _bulk_response(results)
+        _LOGGER.info(
+            "Pushed settings to %s of %s devices", response["succeeded"], len(results)
+        )
+        return response
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_ONBOARD,
+        async_onboard,
+        schema=ONBOARD_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PUSH_SETTINGS,
+        async_push_settings,
+        schema=PUSH_SETTINGS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -0,0 +1,176 @@
+"""Sampled tracing of where the time goes in a poll (no HA dependencies)."""
+
+from __future__ import annotations
+
+import itertools
+import json
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Self
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+from .const import TRACE_BUFFER_SIZE
+
+
+class Span:
+    """One timed, named piece of work, possibly nested in another."""
+
+    __slots__ = (
+        "_started",
+        "_token",
+        "attributes",
+        "duration",
+        "error",
+        "name",
+        "parent_id",
+        "span_id",
+        "start",
+        "trace_id",
+        "tracer",
+    )
+
+    def __init__(
+        self,
+        tracer: Tracer,
+        name: str,
+        parent: Span | None,
+        attributes: dict[str, Any],
+    ) -> None:
+        """Initialize the span.  It starts timing when entered."""
+        self.tracer = tracer
+        self.name = name
+        self.span_id = next(tracer.ids)
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start = 0.0
+        self._started = 0.0
+        self.duration = 0.0
+        self.error: str | None = None
+
+    def __enter__(self) -> Self:
+        """Start timing, and become the parent of any spans started inside."""
+        self._token = _current_span.set(self)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        _exc: BaseException | None,
+        _tb: TracebackType | None,
+    ) -> None:
+        """Stop timing, and hand the span to the tracer."""
+        self.duration = time.perf_counter() - self._started
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _current_span.reset(self._token)
+        self.tracer.spans.append(self)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the span as something JSON-friendly."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration * 1000,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _Unsampled:
+    """Marks a trace we decided not to sample, so its inner spans stay quiet too."""
+
+    __slots__ = ("_token",)
+
+    def __enter__(self) -> None:
+        self._token = _current_span.set(_UNSAMPLED)
+
+    def __exit__(self, *_args: object) -> None:
+        _current_span.reset(self._token)
+
+
+class _NoSpan:
+    """Does nothing, as cheaply as possible."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *_args: object) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+_UNSAMPLED: Any = object()
+_current_span: ContextVar[Span | None] = ContextVar("dchs150_span", default=None)
+
+
+class Tracer:
+    """
+    Records sampled, nested spans into a bounded buffer.  Whether to sample is
+    decided once per trace, at its outermost span.  With sampling off, a span is
+    just a check of the sample rate.
+    """
+
+    def __init__(self, capacity: int = TRACE_BUFFER_SIZE) -> None:
+        """Initialize with sampling off."""
+        self.sample_rate = 0.0
+        self.spans: deque[Span] = deque(maxlen=capacity)
+        self.ids = itertools.count(1)
+
+    def span(self, name: str, **attributes: Any) -> Any:  # noqa: ANN401
+        """Return a context manager that times the work inside it, if sampled."""
+        if not self.sample_rate:
+            return _NO_SPAN
+        parent = _current_span.get()
+        if parent is _UNSAMPLED:
+            return _NO_SPAN
+        if parent is None and random.random() >= self.sample_rate:  # noqa: S311
+            return _Unsampled()
+        return Span(self, name, parent, attributes)
+
+    def clear(self) -> None:
+        """Forget the spans recorded so far."""
+        self.spans.clear()
+
+    def as_json_lines(self) -> str:
+        """Return the recorded spans, one JSON object per line."""
+        return "".join(
+            json.dumps(span.as_dict(), default=str) + "\n" for span in self.spans
+        )
+
+    def as_chrome_trace(self) -> str:
+        """Return the recorded spans in Chrome's trace format (for Perfetto, etc.)."""
+        return json.dumps(
+            {
+                "traceEvents": [
+                    {
+                        "name": span.name,
+                        "ph": "X",
+                        "ts": span.start * 1_000_000,
+                        "dur": span.duration * 1_000_000,
+                        "pid": 1,
+                        # Each trace gets its own row
+                        "tid": span.trace_id,
+                        "args": {**span.attributes, "error": span.error},
+                    }
+                    for span in self.spans
+                ],
+                "displayTimeUnit": "ms",
+            },
+            default=str,
+        )
+
+
+# Shared by every device, so one trace can be read across the fleet
+tracer = Tracer()
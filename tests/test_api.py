@@ -1,11 +1,23 @@
 """Tests for dlink_dchs150_hass api."""
 
+from datetime import UTC, datetime
+from zoneinfo import ZoneInfo
+
 import pytest
 from _pytest.logging import (
     LogCaptureFixture,  # pyright: ignore[reportPrivateImportUsage]
 )
 from homeassistant.core import HomeAssistant
 
+from custom_components.dchs150_motion.api import (
+    compute_time_info,
+    fill_in_dst_rules,
+    fill_in_timezone,
+    get_time_info,
+    next_utc_offset_change,
+)
+from custom_components.dchs150_motion.dch_wifi import TimeInfo
+
 
 @pytest.mark.asyncio
 async def test_api(
@@ -91,3 +103,88 @@ async def test_api(
         and "Error parsing information from" in caplog.record_tuples[0][2]
     )
 """
+
+
+def test_next_utc_offset_change() -> None:
+    """Should find the next DST transition, to the second."""
+    chicago = ZoneInfo("America/Chicago")
+    after = datetime(2025, 1, 15, tzinfo=UTC)
+    # 2AM CST on 9 March 2025
+    assert next_utc_offset_change(chicago, after) == datetime(
+        2025,
+        3,
+        9,
+        8,
+        0,
+        0,
+        tzinfo=UTC,
+    )
+    assert next_utc_offset_change(ZoneInfo("UTC"), after) is None
+
+
+def test_time_info_is_shared() -> None:
+    """The time info should be computed once per zone, and copied per entry."""
+    time_info = get_time_info("America/Chicago")
+    assert get_time_info("America/Chicago") is time_info
+    assert time_info.tz_offset == -6
+    assert time_info.tz_dst
+
+    filled_in = fill_in_timezone("America/Chicago")
+    assert filled_in is not time_info
+    assert filled_in.tz_offset == time_info.tz_offset
+
+
+@pytest.mark.parametrize(
+    ("zone", "offset", "dst"),
+    [
+        ("America/Chicago", -6, True),
+        ("Australia/Sydney", 10, True),
+        ("Asia/Tokyo", 9, False),
+    ],
+)
+def test_time_info_same_all_year(zone: str, offset: int, *, dst: bool) -> None:
+    """
+    The device gets the standard offset and whether the zone has DST (and applies DST
+    itself), so summer and winter should give the same settings.
+    """
+    summer = compute_time_info(zone, datetime(2025, 7, 1, 12, tzinfo=UTC))
+    winter = compute_time_info(zone, datetime(2025, 1, 15, 12, tzinfo=UTC))
+    assert summer == winter
+    assert (summer.tz_offset, summer.tz_dst) == (offset, dst)
+
+
+def test_time_info_part_hour_offset(caplog: pytest.LogCaptureFixture) -> None:
+    """The device only takes whole hours, so part hours should be rounded, loudly."""
+    time_info = compute_time_info("Asia/Kolkata", datetime(2025, 7, 1, tzinfo=UTC))
+    assert time_info.tz_offset == 6
+    assert "whole hours" in caplog.text
+
+
+@pytest.mark.parametrize(
+    ("zone", "start", "end"),
+    [
+        ("America/Chicago", (3, 2, 0, "2:00AM"), (11, 1, 0, "2:00AM")),
+        ("Europe/London", (3, 5, 0, "1:00AM"), (10, 5, 0, "2:00AM")),
+        ("Australia/Sydney", (10, 1, 0, "2:00AM"), (4, 1, 0, "3:00AM")),
+    ],
+)
+def test_dst_rules_from_zone(
+    zone: str,
+    start: tuple[int, int, int, str],
+    end: tuple[int, int, int, str],
+) -> None:
+    """The DST rules should come from the zone's own transitions."""
+    time_info = TimeInfo()
+    fill_in_dst_rules(time_info, ZoneInfo(zone), datetime(2025, 6, 1, tzinfo=UTC))
+    assert (
+        time_info.tz_dst_start_month,
+        time_info.tz_dst_start_week,
+        time_info.tz_dst_start_day_of_week,
+        time_info.tz_dst_start_time,
+    ) == start
+    assert (
+        time_info.tz_dst_end_month,
+        time_info.tz_dst_end_week,
+        time_info.tz_dst_end_day_of_week,
+        time_info.tz_dst_end_time,
+    ) == end
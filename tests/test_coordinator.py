@@ -0,0 +1,106 @@
+"""Tests for the dlink_dchs150_hass update coordinator."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+from custom_components.dchs150_motion.hass_integration import (
+    DlinkDchHassDataUpdateCoordinator,
+)
+
+
+@pytest.mark.asyncio
+async def test_overruns_stretch_the_interval(hass: HomeAssistant) -> None:
+    """Polls that overrun should slow things down, until they fit again."""
+    api = MagicMock()
+    api.shed_optional_calls = False
+    coordinator = DlinkDchHassDataUpdateCoordinator(
+        hass,
+        client=api,
+        update_interval=timedelta(seconds=1),
+    )
+
+    coordinator._pace(3.0)  # noqa: SLF001
+
+    assert coordinator.overruns == 1
+    assert coordinator.behind
+    assert api.shed_optional_calls
+    assert coordinator.poll_interval == timedelta(seconds=4.5)
+
+    for _ in range(20):
+        coordinator._pace(0.1)  # noqa: SLF001
+
+    assert coordinator.poll_interval == timedelta(seconds=1)
+    assert not coordinator.behind
+    assert not api.shed_optional_calls
+    assert coordinator.overruns == 1
+
+
+@pytest.mark.asyncio
+async def test_stretch_is_capped(hass: HomeAssistant) -> None:
+    """However slow polls get, the interval shouldn't grow without limit."""
+    coordinator = DlinkDchHassDataUpdateCoordinator(
+        hass,
+        client=MagicMock(),
+        update_interval=timedelta(seconds=2),
+    )
+
+    for _ in range(5):
+        coordinator._pace(60.0)  # noqa: SLF001
+
+    assert coordinator.overruns == 5
+    assert coordinator.poll_interval == timedelta(seconds=10)
+
+
+@pytest.mark.asyncio
+async def test_polls_stay_on_a_fixed_grid(hass: HomeAssistant) -> None:
+    """Ticks shouldn't drift by how long each poll took, and overrun ticks are skipped."""
+    coordinator = DlinkDchHassDataUpdateCoordinator(
+        hass,
+        client=MagicMock(),
+        update_interval=timedelta(seconds=2),
+    )
+    coordinator._tick_stagger = 0.25  # noqa: SLF001
+
+    first = coordinator._next_tick(100.0, 2)  # noqa: SLF001
+    assert first == 102.25
+    # A poll that took 0.7s still gets the next tick on the grid
+    assert coordinator._next_tick(first + 0.7, 2) == 104.25  # noqa: SLF001
+    # One that took 5s skips the ticks it missed
+    assert coordinator._next_tick(first + 5, 2) == 108.25  # noqa: SLF001
+    # A new interval starts a new grid
+    assert coordinator._next_tick(110.0, 3) == 113.25  # noqa: SLF001
+
+
+@pytest.mark.asyncio
+async def test_polls_until_stopped(hass: HomeAssistant) -> None:
+    """Each poll should schedule the next, on our own timer rather than HA's."""
+    api = MagicMock()
+    api.async_get_data = AsyncMock(return_value={})
+    coordinator = DlinkDchHassDataUpdateCoordinator(
+        hass,
+        client=api,
+        update_interval=timedelta(seconds=0.05),
+    )
+    # HA mustn't schedule polls too
+    assert coordinator.update_interval is None
+
+    coordinator._tick_stagger = 0  # noqa: SLF001
+
+    coordinator.async_start_polling()
+    await asyncio.sleep(0.25)
+    polls = api.async_get_data.await_count
+    assert polls >= 2
+
+    await coordinator.async_shutdown()
+    assert coordinator._next_poll is None  # noqa: SLF001
+    await asyncio.sleep(0.15)
+    assert api.async_get_data.await_count == polls
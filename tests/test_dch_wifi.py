@@ -0,0 +1,420 @@
+"""Tests for the dlink_dchs150_hass HNAP client."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import subprocess  # nosec B404
+import sys
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from xml.parsers.expat import ExpatError  # nosec B407
+from zoneinfo import ZoneInfo
+
+import pytest
+import xmltodict
+from aiohttp import ClientSession, web
+from aiohttp.client_exceptions import ServerDisconnectedError
+from aiohttp.test_utils import TestServer
+
+from custom_components.dchs150_motion.dch_wifi import (
+    ClockSkewEstimator,
+    DeviceDetectionSettingsInfo,
+    GeneralCommunicationError,
+    HNAPClient,
+    HNAPDeviceStatus,
+    NanoSOAPClient,
+    RebootingError,
+    TimeInfo,
+)
+from custom_components.dchs150_motion.legacy_xml import generate_request_xml
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+DEVICE_SETTINGS = {
+    "DeviceMacId": "B0:C5:54:00:00:01",
+    "ModelName": "DCH-S150",
+    "FirmwareVersion": "1.22",
+    "HardwareVersion": "A1",
+    "DeviceName": "DCH-S150",
+    "VendorName": "D-Link",
+}
+
+
+class FakeSOAPClient:
+    """Stands in for NanoSOAPClient, counting the calls that reach the device."""
+
+    def __init__(self, delay: float = 0.01) -> None:
+        """Initialize the fake."""
+        self.address = "http://10.1.1.1/HNAP1"
+        self.headers: dict[str, str] = {}
+        self.delay = delay
+        self.calls: list[str] = []
+        self.responses: dict[str, Any] = {"GetDeviceSettings": DEVICE_SETTINGS}
+        self.recent_responses: list[tuple[float, str, dict]] = []
+
+    def connection_stats(self) -> dict[str, int]:
+        """Pretend every call reused one connection."""
+        return {"requests": len(self.calls), "new_connections": 1}
+
+    async def call(
+        self,
+        method: str,
+        _timeout: int,
+        *,
+        on_exchange: Any = None,  # noqa: ANN401
+        **_kwargs: Any,  # noqa: ANN401
+    ) -> dict:
+        """Pretend to call the device."""
+        self.calls.append(method)
+        await asyncio.sleep(self.delay)
+        if isinstance(self.responses.get(method), Exception):
+            raise self.responses[method]
+        return {
+            **self.responses.get(method, {}),
+            "Method": method,
+            "Count": len(self.calls),
+        }
+
+
+def make_client(soap: FakeSOAPClient) -> HNAPClient:
+    """Create a client that believes it is already logged in."""
+    client = HNAPClient(soap, "Admin", "123456")  # pyright: ignore[reportArgumentType]
+    client.set_status(HNAPDeviceStatus.ONLINE)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reads_are_coalesced() -> None:
+    """Identical concurrent reads should share one request."""
+    soap = FakeSOAPClient()
+    client = make_client(soap)
+
+    results = await asyncio.gather(
+        client.call("GetDeviceSettings", 10),
+        client.call("GetDeviceSettings", 10),
+        client.call("GetDeviceSettings", 10),
+    )
+
+    assert soap.calls == ["GetDeviceSettings"]
+    assert results[0] is results[1] is results[2]
+
+
+@pytest.mark.asyncio
+async def test_different_reads_are_not_coalesced() -> None:
+    """Reads with different parameters should each go to the device."""
+    soap = FakeSOAPClient()
+    client = make_client(soap)
+
+    await asyncio.gather(
+        client.call("GetModuleSOAPActions", 10, ModuleID=1),
+        client.call("GetModuleSOAPActions", 10, ModuleID=2),
+    )
+
+    assert len(soap.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_writes_are_not_coalesced() -> None:
+    """Writes should always go to the device."""
+    soap = FakeSOAPClient()
+    client = make_client(soap)
+
+    await asyncio.gather(
+        client.call("SetTimeSettings", 10, NTP="true"),
+        client.call("SetTimeSettings", 10, NTP="true"),
+    )
+
+    assert soap.calls == ["SetTimeSettings", "SetTimeSettings"]
+
+
+@pytest.mark.asyncio
+async def test_sequential_reads_are_not_coalesced() -> None:
+    """Once a read has finished, the next one should hit the device again."""
+    soap = FakeSOAPClient(delay=0)
+    client = make_client(soap)
+
+    await client.call("GetLatestDetection", 10, ModuleID=1)
+    await client.call("GetLatestDetection", 10, ModuleID=1)
+
+    assert len(soap.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_metadata_is_cached() -> None:
+    """Device metadata should only be fetched once while it's fresh."""
+    soap = FakeSOAPClient(delay=0)
+    client = make_client(soap)
+
+    first = await client.call("GetModuleSOAPActions", 10, ModuleID=1)
+    second = await client.call("GetModuleSOAPActions", 10, ModuleID=1)
+
+    assert soap.calls == ["GetModuleSOAPActions"]
+    assert first is second
+
+
+@pytest.mark.asyncio
+async def test_metadata_invalidated_by_set() -> None:
+    """A successful Set* should drop the matching cached Get*."""
+    soap = FakeSOAPClient(delay=0)
+    client = make_client(soap)
+
+    await client.call("GetMotionDetectorSettings", 10, ModuleID=1)
+    await client.call("SetMotionDetectorSettings", 10, ModuleID=1, Backoff=5)
+    await client.call("GetMotionDetectorSettings", 10, ModuleID=1)
+
+    assert soap.calls == [
+        "GetMotionDetectorSettings",
+        "SetMotionDetectorSettings",
+        "GetMotionDetectorSettings",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_metadata_snapshot_round_trip() -> None:
+    """A persisted snapshot should prime a new client's cache."""
+    soap = FakeSOAPClient(delay=0)
+    client = make_client(soap)
+    await client.call("GetDeviceSettings", 10)
+
+    other_soap = FakeSOAPClient(delay=0)
+    other = make_client(other_soap)
+    other.metadata_cache.load(client.metadata_cache.as_dict())
+    result = await other.call("GetDeviceSettings", 10)
+
+    assert other_soap.calls == []
+    assert result["Method"] == "GetDeviceSettings"
+
+
+@pytest.mark.asyncio
+async def test_only_changed_settings_are_pushed() -> None:
+    """Updating settings in place should only send what changed."""
+    soap = FakeSOAPClient(delay=0)
+    client = make_client(soap)
+    await client.run_initialization()
+    soap.calls.clear()
+
+    settings = DeviceDetectionSettingsInfo()
+    settings.backoff = 5
+    assert await client.update_device_detection_settings(settings)
+    assert soap.calls == ["SetMotionDetectorSettings"]
+
+    same_settings = DeviceDetectionSettingsInfo()
+    same_settings.backoff = 5
+    assert not await client.update_device_detection_settings(same_settings)
+    assert not await client.update_time_info(None)
+    assert soap.calls == ["SetMotionDetectorSettings"]
+
+
+@pytest.mark.asyncio
+async def test_time_settings_only_pushed_when_changed() -> None:
+    """Time settings shouldn't be re-sent when nothing changed."""
+    soap = FakeSOAPClient(delay=0)
+    client = make_client(soap)
+    time_info = TimeInfo()
+    assert await client.update_time_info(time_info)
+    await client.run_initialization()
+    assert soap.calls.count("SetTimeSettings") == 1
+
+    same = TimeInfo()
+    assert not await client.update_time_info(same)
+    await client.set_time_settings()
+    assert soap.calls.count("SetTimeSettings") == 1
+
+    changed = TimeInfo()
+    changed.tz_offset = -5
+    assert await client.update_time_info(changed)
+    assert soap.calls.count("SetTimeSettings") == 2
+
+
+def test_clock_skew_estimate() -> None:
+    """Whole-second device times should still give a sub-second estimate."""
+    estimator = ClockSkewEstimator(min_samples=5)
+    for sample in range(40):
+        sent = 1_700_000_000 + sample * 1.37
+        received = sent + (0.05 if sample % 4 else 2.0)
+        device_time = math.floor((sent + received) / 2 + 10.0)
+        estimator.add_sample(sent, received, device_time)
+        if sample < 4:
+            assert estimator.offset is None
+
+    offset = estimator.offset
+    assert offset is not None
+    assert abs(offset - 10.0) < 0.25
+
+
+@pytest.mark.asyncio
+async def test_clock_samples_are_per_call() -> None:
+    """Concurrent calls should each hand back their own exchange's device time."""
+
+    class DatedSOAPClient(NanoSOAPClient):
+        async def _post(
+            self,
+            _request_xml: str,
+            headers: dict[str, str],
+            _timeout: int,
+        ) -> tuple[float, str | None, str]:
+            method = headers["SOAPAction"].strip('"').rsplit("/", 1)[-1]
+            # The first call answers last, after the second has come and gone
+            await asyncio.sleep(0.05 if method == "GetDeviceSettings" else 0)
+            day = 1 if method == "GetDeviceSettings" else 2
+            text = (
+                f"<soap:Envelope><soap:Body><{method}Response><{method}Result>OK"
+                f"</{method}Result></{method}Response></soap:Body></soap:Envelope>"
+            )
+            return time.time(), f"Mon, {day:02d} Jan 2024 00:00:00 GMT", text
+
+    soap = DatedSOAPClient("10.1.1.1", "http://purenetworks.com/HNAP1/")
+    samples: dict[str, list[float]] = {
+        "GetDeviceSettings": [],
+        "GetLatestDetection": [],
+    }
+
+    def collect(method: str) -> Callable[[float, float, float], None]:
+        return lambda _sent, _received, device_time: samples[method].append(device_time)
+
+    await asyncio.gather(
+        *(soap.call(method, on_exchange=collect(method)) for method in samples),
+    )
+    assert samples == {
+        "GetDeviceSettings": [datetime(2024, 1, 1, tzinfo=UTC).timestamp()],
+        "GetLatestDetection": [datetime(2024, 1, 2, tzinfo=UTC).timestamp()],
+    }
+
+
+@pytest.mark.asyncio
+async def test_call_metrics() -> None:
+    """Calls, failures, and status changes should all be counted."""
+    soap = FakeSOAPClient(delay=0)
+    soap.responses["GetLatestDetection"] = ServerDisconnectedError()
+    client = make_client(soap)
+
+    await client.call("GetDeviceSettings", 10)
+    with pytest.raises(GeneralCommunicationError):
+        await client.call("GetLatestDetection", 10, ModuleID=1)
+
+    snapshot = client.metrics.snapshot()
+    assert snapshot["calls"]["GetDeviceSettings"]["count"] == 1
+    assert snapshot["calls"]["GetLatestDetection"]["count"] == 1
+    assert snapshot["errors"] == {"ServerDisconnectedError": 1}
+    assert snapshot["status_transitions"] == {
+        "UNKNOWN->ONLINE": 1,
+        "ONLINE->DISCONNECTED": 1,
+    }
+    diagnostics = client.diagnostics()
+    assert diagnostics["status"] == "DISCONNECTED"
+    assert diagnostics["metrics"] == snapshot
+
+
+@pytest.mark.asyncio
+async def test_soap_client_diagnostics() -> None:
+    """The SOAP client should keep recent responses and see connections reused."""
+
+    async def handler(request: web.Request) -> web.Response:
+        method = request.headers["SOAPAction"].strip('"').rsplit("/", 1)[-1]
+        return web.Response(
+            text='<?xml version="1.0" encoding="utf-8"?>'
+            '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+            f"<soap:Body><{method}Response><{method}Result>OK</{method}Result>"
+            f"</{method}Response></soap:Body></soap:Envelope>",
+            content_type="text/xml",
+        )
+
+    app = web.Application()
+    app.router.add_post("/HNAP1", handler)
+    async with TestServer(app) as server, ClientSession() as session:
+        soap = NanoSOAPClient(
+            f"{server.host}:{server.port}",
+            "http://purenetworks.com/HNAP1/",
+            session=session,
+        )
+        for _ in range(3):
+            await soap.call("GetDeviceSettings")
+
+    assert soap.connection_stats() == {
+        "requests": 3,
+        "new_connections": 1,
+        "reused_connections": 2,
+    }
+    assert len(soap.recent_responses) == 3
+    assert soap.recent_responses[-1][1:] == (
+        "GetDeviceSettings",
+        {"GetDeviceSettingsResult": "OK"},
+    )
+
+
+@pytest.mark.asyncio
+async def test_reboot_deadline_ignores_wall_clock(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A jump in the wall clock shouldn't make the device reboot early."""
+    soap = FakeSOAPClient(delay=0)
+    client = make_client(soap)
+    deadline = client._next_reboot_deadline  # noqa: SLF001
+    assert deadline is not None
+
+    real_time = time.time
+    monkeypatch.setattr(time, "time", lambda: real_time() + 2 * 86400)
+    await client.resolve_state()
+    assert client.get_status() is HNAPDeviceStatus.ONLINE
+
+    monkeypatch.setattr(time, "monotonic", lambda: deadline + 1)
+    with pytest.raises(RebootingError):
+        await client.resolve_state()
+    assert soap.calls == ["Reboot"]
+
+
+def test_injected_clock_and_time_zone() -> None:
+    """The client should stamp requests and schedule reboots from what it's given."""
+    zone = ZoneInfo("Europe/London")
+    client = HNAPClient(
+        FakeSOAPClient(),  # pyright: ignore[reportArgumentType]
+        "Admin",
+        "123456",
+        clock=lambda: 1_700_000_000,  # 22:13 on 14 November 2023, in London
+        time_zone=zone,
+    )
+    assert client._next_reboot_at == datetime(2023, 11, 15, 3, tzinfo=zone)  # noqa: SLF001
+    client._private_key = "KEY"  # noqa: SLF001
+    client._update_nauth_token("GetLatestDetection")  # noqa: SLF001
+    assert client._timestamp == 1_700_000_000  # noqa: SLF001
+
+
+def test_imports_without_home_assistant() -> None:
+    """The HNAP client shouldn't need Home Assistant."""
+    script = (
+        "import sys, custom_components.dchs150_motion.dch_wifi\n"
+        "print(sorted(m for m in sys.modules if m.startswith('homeassistant')))"
+    )
+    result = subprocess.run(  # noqa: S603  # nosec B603
+        [sys.executable, "-c", script],
+        capture_output=True,
+        check=True,
+        cwd=Path(__file__).parent.parent,
+        text=True,
+    )
+    assert result.stdout.strip() == "[]"
+
+
+@pytest.mark.asyncio
+async def test_unparseable_response() -> None:
+    """A response that isn't XML should get us to log in again."""
+    soap = FakeSOAPClient(delay=0)
+    soap.responses["GetLatestDetection"] = ExpatError("not well-formed")
+    client = make_client(soap)
+    with pytest.raises(GeneralCommunicationError, match="Invalid response"):
+        await client.call("GetLatestDetection", 10)
+    assert client.get_status() is HNAPDeviceStatus.INTERNAL_ERROR
+
+
+def test_legacy_request_xml() -> None:
+    """The ElementTree request builder should build the same request as the client."""
+    request = xmltodict.parse(
+        generate_request_xml("SetTest", ModuleID=1, Raw="<Inner>2</Inner>"),
+    )
+    action = request["soap:Envelope"]["soap:Body"]["SetTest"]
+    assert action["ModuleID"] == "1"
+    assert action["Raw"] == {"Inner": "2"}
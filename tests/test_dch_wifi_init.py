@@ -0,0 +1,82 @@
+"""Tests for provisioning devices' Wi-Fi settings."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from utils.dch_wifi_init import (
+    NO_SECURITY,
+    WPA2_SECURITY,
+    Provisioning,
+    load_batch,
+    provision_batch,
+)
+from utils.hnap_simulator import Faults, SimulatedFleet
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_load_batch(tmp_path: Path) -> None:
+    """The batch file should skip comments, and an empty password means none."""
+    path = tmp_path / "batch.csv"
+    path.write_text(
+        "# Upstairs\nip,pin,mac,ssid,password\n"
+        "10.0.0.5,123456,B0:C5:54:00:00:01,Home,secret\n"
+        "10.0.0.6,654321,B0:C5:54:00:00:02,Home,\n",
+        encoding="utf-8",
+    )
+    assert load_batch(path) == [
+        Provisioning("10.0.0.5", "123456", "B0:C5:54:00:00:01", "Home", "secret"),
+        Provisioning("10.0.0.6", "654321", "B0:C5:54:00:00:02", "Home"),
+    ]
+    path.write_text("ip,pin,ssid\n10.0.0.5,123456,Home\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="has no mac"):
+        load_batch(path)
+
+
+@pytest.mark.asyncio
+async def test_provision_batch() -> None:
+    """Each device should get its own result, with retries only where they'd help."""
+    async with SimulatedFleet.build(4) as fleet:
+        fleet.devices[3].faults = Faults(drop_rate=1.0)
+        devices = [
+            Provisioning(address, "123456", f"B0:C5:54:00:00:0{index}", "Home")
+            for index, address in enumerate(fleet.addresses)
+        ]
+        devices[1].wifi_password = "secret"  # noqa: S105
+        devices[2].pin = "000000"
+
+        results = await provision_batch(devices, parallel=2, retry_delay=0)
+
+    assert [result.ip for result in results] == [device.ip for device in devices]
+    assert [(result.ok, result.attempts) for result in results] == [
+        (True, 1),
+        (True, 1),
+        (False, 1),
+        (False, 3),
+    ]
+    assert "PIN" in (results[2].error or "")
+    assert results[0].response
+    assert results[0].response["SetAPClientSettingsResult"] == "OK"
+
+    settings = [device.ap_client_settings for device in fleet.devices]
+    assert settings[0]["SSID"] == "Home"
+    assert settings[0]["MacAddress"] == "B0:C5:54:00:00:00"
+    assert settings[0]["SupportedSecurity"] == parsed(NO_SECURITY)
+    assert settings[1]["SupportedSecurity"] == parsed(WPA2_SECURITY)
+    assert settings[0]["Key"] != settings[1]["Key"]
+    # Provisioning shouldn't push time or detector settings
+    assert set(fleet.devices[0].calls) == {"Login", "SetAPClientSettings"}
+
+
+def parsed(security: str) -> dict:
+    """Return the security info as the device sees it."""
+    return {
+        "SecurityInfo": {
+            "SecurityType": "NONE" if security == NO_SECURITY else "WPA2-PSK",
+            "Encryptions": {"string": "NONE" if security == NO_SECURITY else "AES"},
+        },
+    }
@@ -0,0 +1,42 @@
+"""Tests for dlink_dchs150_hass diagnostics."""
+
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+import pytest
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.dchs150_motion.api import DlinkDchHassApiClient
+from custom_components.dchs150_motion.const import CONF_HOST, CONF_PIN, DOMAIN
+from custom_components.dchs150_motion.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+
+@pytest.mark.asyncio
+async def test_diagnostics_redacts_host(hass: HomeAssistant) -> None:
+    """Diagnostics get posted in public issues, so shouldn't say where the device is."""
+    host = "192.168.77.23"
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: host, CONF_PIN: "123456"})
+    api = DlinkDchHassApiClient(host, "123456", async_get_clientsession(hass))
+    hass.data[DOMAIN] = {
+        entry.entry_id: SimpleNamespace(
+            last_update_success=True,
+            data={},
+            latency=SimpleNamespace(snapshot=dict),
+            pacing=dict,
+            api=api,
+        ),
+    }
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+    assert diagnostics["entry"]["data"][CONF_HOST] == "**REDACTED**"
+    assert diagnostics["device"]["address"] == "**REDACTED**"
+    assert host not in json.dumps(diagnostics, default=str)
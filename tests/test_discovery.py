@@ -0,0 +1,137 @@
+"""Tests for finding detectors on the LAN."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+from aiohttp import ClientSession
+from homeassistant import config_entries
+from homeassistant.data_entry_flow import FlowResultType
+
+from custom_components.dchs150_motion.const import (
+    CONF_HOST,
+    CONF_PIN,
+    CONF_SUBNETS,
+    DOMAIN,
+)
+from custom_components.dchs150_motion.discovery import (
+    DiscoveredDevice,
+    scan,
+    subnet_hosts,
+)
+from utils.hnap_simulator import WATER_MODEL, SimulatedDevice, SimulatedFleet
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+
+def test_subnet_hosts() -> None:
+    """Subnets should be expanded to their hosts, once each, within reason."""
+    assert subnet_hosts(["10.0.0.0/30", " 10.0.0.2/31"]) == [
+        "10.0.0.1",
+        "10.0.0.2",
+        "10.0.0.3",
+    ]
+    with pytest.raises(ValueError, match="hosts to scan"):
+        subnet_hosts(["10.0.0.0/21"])
+    with pytest.raises(ValueError, match="does not appear"):
+        subnet_hosts(["not a subnet"])
+
+
+@pytest.mark.asyncio
+async def test_scan() -> None:
+    """Only the HNAP devices should turn up, with their models and MAC addresses."""
+    fleet = SimulatedFleet(
+        [
+            SimulatedDevice("123456"),
+            SimulatedDevice("123456", WATER_MODEL, "B0:C5:54:00:00:02"),
+        ],
+    )
+    async with fleet, ClientSession() as session:
+        # Nothing listens on port 1
+        devices = await scan(session, [*fleet.addresses, "127.0.0.1:1"], 2)
+        assert devices == [
+            DiscoveredDevice(
+                fleet.addresses[0],
+                "DCH-S150",
+                "B0:C5:54:00:00:01",
+                "D-Link DCH-S150",
+            ),
+            DiscoveredDevice(
+                fleet.addresses[1],
+                "DCH-S160",
+                "B0:C5:54:00:00:02",
+                "D-Link DCH-S160",
+            ),
+        ]
+        assert all(device.supported for device in devices)
+
+
+@pytest.mark.asyncio
+async def test_discovery_config_flow(
+    hass: HomeAssistant,
+    enable_custom_integrations: None,
+) -> None:
+    """Leaving out the host should search for it, then set up the one picked."""
+    async with SimulatedFleet.build(2) as fleet:
+        fleet.devices[1].mac_address = "B0:C5:54:00:00:02"
+        with (
+            patch(
+                "custom_components.dchs150_motion.config_flow.local_subnet",
+                return_value="192.168.1.0/24",
+            ),
+            patch(
+                "custom_components.dchs150_motion.config_flow.subnet_hosts",
+                return_value=fleet.addresses,
+            ) as subnet_hosts,
+            patch(
+                "custom_components.dchs150_motion.async_setup_entry",
+                return_value=True,
+            ),
+        ):
+            result = await hass.config_entries.flow.async_init(
+                DOMAIN,
+                context={"source": config_entries.SOURCE_USER},
+            )
+            result = await hass.config_entries.flow.async_configure(
+                result["flow_id"],
+                user_input={CONF_PIN: "123456"},
+            )
+            assert result["type"] == FlowResultType.FORM
+            assert result["step_id"] == "discovery"
+            schema = result["data_schema"].schema
+            assert next(iter(schema)).default() == "192.168.1.0/24"
+
+            result = await hass.config_entries.flow.async_configure(
+                result["flow_id"],
+                user_input={CONF_SUBNETS: "192.168.1.0/24, 192.168.2.0/24"},
+            )
+            subnet_hosts.assert_called_with(["192.168.1.0/24", " 192.168.2.0/24"])
+            assert result["type"] == FlowResultType.FORM
+            assert result["step_id"] == "pick_device"
+            assert result["description_placeholders"] == {"count": "2"}
+
+            result = await hass.config_entries.flow.async_configure(
+                result["flow_id"],
+                user_input={CONF_HOST: fleet.addresses[1]},
+            )
+            assert result["type"] == FlowResultType.CREATE_ENTRY
+            assert result["data"] == {
+                CONF_HOST: fleet.addresses[1],
+                CONF_PIN: "123456",
+            }
+            assert result["result"].unique_id == "B0:C5:54:00:00:02"
+
+            # The device that's set up shouldn't turn up again
+            result = await hass.config_entries.flow.async_init(
+                DOMAIN,
+                context={"source": config_entries.SOURCE_USER},
+                data={CONF_PIN: "123456"},
+            )
+            result = await hass.config_entries.flow.async_configure(
+                result["flow_id"],
+                user_input={CONF_SUBNETS: "192.168.1.0/24"},
+            )
+            assert result["description_placeholders"] == {"count": "1"}
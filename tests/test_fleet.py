@@ -0,0 +1,89 @@
+"""Tests for the fleet command-line tool."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from aiohttp import ClientSession
+
+from utils.fleet import (
+    FleetDevice,
+    bench,
+    connect,
+    format_table,
+    load_inventory,
+    poll_fleet,
+)
+from utils.hnap_simulator import SimulatedFleet
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_load_inventory(tmp_path: Path) -> None:
+    """The inventory should skip comments and blank hosts, and name is optional."""
+    path = tmp_path / "devices.csv"
+    path.write_text(
+        "# The house\nhost,pin,name\n10.0.0.5, 123456 ,Hall\n,000000,\n10.0.0.6,654321,\n",
+        encoding="utf-8",
+    )
+    assert load_inventory(path) == [
+        FleetDevice("10.0.0.5", "123456", "Hall"),
+        FleetDevice("10.0.0.6", "654321"),
+    ]
+    path.write_text("address,pin\n10.0.0.5,123456\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="has no host"):
+        load_inventory(path)
+
+
+@pytest.mark.asyncio
+async def test_poll_and_bench() -> None:
+    """Polling should log every device in, and report their detections and failures."""
+    async with SimulatedFleet.build(3) as fleet, ClientSession() as session:
+        fleet.devices[0].detect(1_700_000_000)
+        devices = [FleetDevice(address, "123456") for address in fleet.addresses]
+        devices[2].pin = "000000"
+        connect(devices, session)
+
+        await poll_fleet(devices, parallel=2)
+        assert [device.status for device in devices] == [
+            "ONLINE",
+            "ONLINE",
+            "INVALID_PIN",
+        ]
+        assert devices[0].last_detection is not None
+        assert devices[0].last_detection.timestamp() == pytest.approx(
+            1_700_000_000,
+            abs=2,
+        )
+        assert devices[1].last_detection is None
+        assert devices[2].error
+        table = format_table(devices).splitlines()
+        assert len(table) == 4
+        assert "INVALID_PIN" in table[3]
+
+        results = await bench(devices[:2], parallel=2, seconds=0.3)
+        assert results["polls"] > 2
+        assert results["failed"] == 0
+        assert results["p50_ms"] is not None
+
+
+@pytest.mark.asyncio
+async def test_poll_garbage_detection() -> None:
+    """A device that sends a nonsense detection time should only fail itself."""
+    async with SimulatedFleet.build(3) as fleet, ClientSession() as session:
+        fleet.devices[0].detect(1_700_000_000)
+        fleet.devices[1].last_detection = "yesterday"  # type: ignore[assignment]
+        fleet.devices[2].last_detection = {"Time": "1700000000"}  # type: ignore[assignment]
+        devices = [FleetDevice(address, "123456") for address in fleet.addresses]
+        connect(devices, session)
+
+        await poll_fleet(devices, parallel=3)
+        assert devices[0].last_detection is not None
+        assert devices[0].error is None
+        for device in devices[1:]:
+            assert device.failures == 1
+            assert device.error
+            assert "LatestDetectTime" in device.error
+            assert device.last_detection is None
@@ -0,0 +1,164 @@
+"""Tests for the HNAP client against the simulated devices."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+from aiohttp import ClientSession
+
+from custom_components.dchs150_motion.dch_wifi import (
+    AuthenticationError,
+    DeviceDetectionSettingsInfo,
+    GeneralCommunicationError,
+    HNAPClient,
+    HNAPDeviceStatus,
+    NanoSOAPClient,
+    RebootingError,
+    TimeInfo,
+)
+from utils.hnap_simulator import (
+    ACTION_BASE_URL,
+    WATER_MODEL,
+    Faults,
+    SimulatedDevice,
+    SimulatedFleet,
+)
+
+
+def make_client(
+    session: ClientSession,
+    address: str,
+    pin: str = "123456",
+) -> HNAPClient:
+    """Create a client for a simulated device."""
+    settings = DeviceDetectionSettingsInfo()
+    settings.nick_name = "Hallway"
+    settings.description = "By the stairs"
+    return HNAPClient(
+        NanoSOAPClient(address, ACTION_BASE_URL, session=session),
+        "Admin",
+        pin,
+        TimeInfo(),
+        settings,
+    )
+
+
+@pytest.mark.asyncio
+async def test_login_initialization_and_detection() -> None:
+    """The client should log in, push its settings and see detections."""
+    async with SimulatedFleet.build(1) as fleet, ClientSession() as session:
+        device = fleet.devices[0]
+        client = make_client(session, fleet.addresses[0])
+        await client.login()
+
+        assert client.get_status() == HNAPDeviceStatus.ONLINE
+        assert client.model_name == "DCH-S150"
+        assert device.detector_settings["NickName"] == "Hallway"
+        assert device.time_settings["NTPServer"] == TimeInfo.ntp_server
+
+        device.detect(1_700_000_000)
+        result = await client.get_latest_detection()
+        assert result["LatestDetectTime"] == "1700000000"
+        assert "Login" in await client.device_actions()
+
+
+@pytest.mark.asyncio
+async def test_water_detector() -> None:
+    """A DCH-S160 should get the water detector settings."""
+    fleet = SimulatedFleet([SimulatedDevice("654321", WATER_MODEL)])
+    async with fleet, ClientSession() as session:
+        client = make_client(session, fleet.addresses[0], "654321")
+        await client.login()
+
+        assert client.model_name == WATER_MODEL
+        assert fleet.devices[0].calls["SetWaterDetectorSettings"] == 1
+        assert fleet.devices[0].detector_settings["NickName"] == "Hallway"
+
+
+@pytest.mark.asyncio
+async def test_wrong_pin() -> None:
+    """A wrong PIN should fail the HMAC handshake."""
+    async with SimulatedFleet.build(1) as fleet, ClientSession() as session:
+        client = make_client(session, fleet.addresses[0], "000000")
+        with pytest.raises(AuthenticationError):
+            await client.login()
+        assert client.get_status() == HNAPDeviceStatus.INVALID_PIN
+
+
+@pytest.mark.asyncio
+async def test_expired_session_logs_in_again() -> None:
+    """Once the device forgets the session, the next poll should log in again."""
+    async with SimulatedFleet.build(1) as fleet, ClientSession() as session:
+        device = fleet.devices[0]
+        client = make_client(session, fleet.addresses[0])
+        await client.login()
+
+        device.expire_sessions()
+        with pytest.raises(GeneralCommunicationError):
+            await client.get_latest_detection()
+        assert client.get_status() == HNAPDeviceStatus.COMMUNICATION_ERROR
+
+        await client.get_latest_detection()
+        assert client.get_status() == HNAPDeviceStatus.ONLINE
+        assert device.calls["Login"] == 4
+
+
+@pytest.mark.asyncio
+async def test_dropped_connection() -> None:
+    """A dropped connection should surface as a communication error."""
+    async with SimulatedFleet.build(1) as fleet, ClientSession() as session:
+        client = make_client(session, fleet.addresses[0])
+        await client.login()
+
+        fleet.devices[0].faults.drop_rate = 1.0
+        with pytest.raises(GeneralCommunicationError):
+            await client.get_latest_detection()
+        assert client.get_status() == HNAPDeviceStatus.DISCONNECTED
+        assert fleet.devices[0].dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_reboot() -> None:
+    """After a reboot the device is off the air, and then wants a fresh login."""
+    faults = Faults(reboot_seconds=0.2)
+    async with (
+        SimulatedFleet.build(1, faults=faults) as fleet,
+        ClientSession() as session,
+    ):
+        device = fleet.devices[0]
+        client = make_client(session, fleet.addresses[0])
+        await client.login()
+
+        await client.reboot()
+        assert device.rebooting
+        with pytest.raises(RebootingError):
+            await client.get_latest_detection()
+
+        await asyncio.sleep(0.2)
+        assert not device.rebooting
+        client._reboot_seconds = 0  # noqa: SLF001
+        await client.get_latest_detection()
+        assert client.get_status() == HNAPDeviceStatus.ONLINE
+        assert device.reboots == 1
+
+
+@pytest.mark.asyncio
+async def test_fleet_with_latency() -> None:
+    """A fleet of slow devices should be pollable concurrently."""
+    faults = Faults(latency=0.05)
+    async with (
+        SimulatedFleet.build(50, faults=faults) as fleet,
+        ClientSession() as session,
+    ):
+        clients = [make_client(session, address) for address in fleet.addresses]
+        await asyncio.gather(*(client.login() for client in clients))
+
+        started = time.monotonic()
+        await asyncio.gather(*(client.get_latest_detection() for client in clients))
+        # Not 50 round trips back to back
+        assert time.monotonic() - started < 50 * faults.latency / 2
+
+    assert fleet.stats()["calls"]["GetLatestDetection"] == 50
+    assert len({device.mac_address for device in fleet.devices}) == 50
@@ -0,0 +1,67 @@
+"""
+Guards what importing the integration costs Home Assistant's bootstrap, using
+`python -X importtime` in a fresh interpreter.  `make importtime` shows the detail.
+"""
+
+from __future__ import annotations
+
+import subprocess  # nosec B404
+import sys
+from pathlib import Path
+
+PACKAGE = "custom_components.dchs150_motion"
+# What HA imports when it loads the integration
+INTEGRATION_MODULES = (
+    PACKAGE,
+    f"{PACKAGE}.config_flow",
+    f"{PACKAGE}.hass_integration",
+    f"{PACKAGE}.binary_sensor",
+    f"{PACKAGE}.sensor",
+    f"{PACKAGE}.diagnostics",
+)
+# Only needed by rarely used services, or not at all, so only imported when asked for
+LAZY_MODULES = (
+    "cProfile",
+    "defusedxml",
+    "pstats",
+    f"{PACKAGE}.legacy_xml",
+    f"{PACKAGE}.recording",
+)
+# Generous, so only a real regression (not a slow machine) trips it
+OWN_MODULES_BUDGET_SECONDS = 0.25
+
+
+def import_times(*modules: str) -> dict[str, tuple[float, float]]:
+    """
+    Import the modules in a fresh interpreter, returning the (self, cumulative)
+    seconds it took to import each module that they pulled in.
+    """
+    result = subprocess.run(  # noqa: S603  # nosec B603
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        capture_output=True,
+        check=True,
+        cwd=Path(__file__).parent.parent,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+
+def test_client_imports_no_xml_tree_libraries() -> None:
+    """The HNAP client parses with xmltodict, and doesn't need ElementTree."""
+    times = import_times(f"{PACKAGE}.dch_wifi")
+    assert f"{PACKAGE}.dch_wifi" in times
+    assert not {"xml.etree.ElementTree", *LAZY_MODULES} & times.keys()
+
+
+def test_integration_import_time() -> None:
+    """Loading the integration shouldn't import what it rarely needs, or take long."""
+    times = import_times(*INTEGRATION_MODULES)
+    assert not set(LAZY_MODULES) & times.keys()
+    own = {name: own for name, (own, _) in times.items() if name.startswith(PACKAGE)}
+    assert sum(own.values()) < OWN_MODULES_BUDGET_SECONDS, own
@@ -1,8 +1,12 @@
 """Test dlink_dchs150_hass setup process."""
 
+from unittest.mock import patch
+
 import pytest
+from homeassistant.config_entries import ConfigEntryState
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
+from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 from custom_components.dchs150_motion import (
     async_reload_entry,
@@ -10,10 +14,12 @@ from custom_components.dchs150_motion import (
     async_unload_entry,
 )
 from custom_components.dchs150_motion.const import (
+    CONF_HOST,
     DOMAIN,
 )
 from custom_components.dchs150_motion.hass_integration import (
     DlinkDchHassDataUpdateCoordinator,
+    HassIntegration,
 )
 
 
@@ -66,3 +72,40 @@ async def test_setup_entry_exception(
     # an error.
     with pytest.raises(ConfigEntryNotReady):
         assert await async_setup_entry(hass, config_entry)
+
+
+@pytest.mark.asyncio
+async def test_reload_keeps_one_update_listener(
+    hass: HomeAssistant,
+    enable_custom_integrations: None,
+    config_data,  # noqa: ANN001
+) -> None:
+    """Each change to the entry's data should reload it once, with one listener."""
+    entry = MockConfigEntry(domain=DOMAIN, data=config_data, entry_id="test")
+    entry.add_to_hass(hass)
+    with (
+        patch(
+            "custom_components.dchs150_motion.api.DlinkDchHassApiClient.async_get_data",
+            return_value={},
+        ),
+        patch.object(
+            HassIntegration,
+            "async_setup_entry",
+            wraps=HassIntegration.async_setup_entry,
+        ) as setup_entry,
+    ):
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+        for host in ("10.1.1.2", "10.1.1.3"):
+            hass.config_entries.async_update_entry(
+                entry,
+                data={**config_data, CONF_HOST: host},
+            )
+            await hass.async_block_till_done()
+
+        # Set up, then reloaded once per change
+        assert setup_entry.call_count == 3
+        assert len(entry.update_listeners) == 1
+        assert entry.state is ConfigEntryState.LOADED
+        assert hass.data[DOMAIN]["test"].entry_data[CONF_HOST] == "10.1.1.3"
+        assert await hass.config_entries.async_unload(entry.entry_id)
@@ -0,0 +1,64 @@
+"""Tests for the dlink_dchs150_hass latency metrics."""
+
+from __future__ import annotations
+
+import pytest
+
+from custom_components.dchs150_motion.metrics import (
+    DetectionLatencyTracker,
+    LatencyHistogram,
+)
+
+
+def test_histogram_percentiles() -> None:
+    """Percentiles should land in the right bucket and never exceed the max."""
+    histogram = LatencyHistogram((0.1, 1.0, 10.0))
+    assert histogram.percentile(0.5) is None
+
+    for _ in range(90):
+        histogram.record(0.05)
+    for _ in range(10):
+        histogram.record(5.0)
+
+    p50 = histogram.percentile(0.5)
+    p99 = histogram.percentile(0.99)
+    assert p50 is not None
+    assert p99 is not None
+    assert 0 < p50 <= 0.1
+    assert 1.0 < p99 <= 5.0
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["max"] == 5.0
+    assert snapshot["buckets"] == {"0.1": 90, "1.0": 0, "10.0": 10, "+Inf": 0}
+
+
+def test_histogram_merge() -> None:
+    """Merging should add up the samples, and refuse different buckets."""
+    fleet = LatencyHistogram((0.1, 1.0))
+    for value in (0.05, 0.5):
+        device = LatencyHistogram((0.1, 1.0))
+        device.record(value)
+        fleet.merge(device)
+
+    assert fleet.counts == [1, 1, 0]
+    assert fleet.count == 2
+    assert fleet.total == pytest.approx(0.55)
+    assert fleet.max == 0.5
+    with pytest.raises(ValueError, match="same buckets"):
+        fleet.merge(LatencyHistogram((0.1,)))
+
+
+def test_tracker_times_each_detection_once() -> None:
+    """A detection should be recorded when written, and only once."""
+    tracker = DetectionLatencyTracker()
+    tracker.written(100.0)
+    assert tracker.end_to_end.count == 0
+
+    tracker.observed(detected=100.0, observed=102.0)
+    tracker.written(102.5)
+    tracker.written(103.0)
+
+    assert tracker.end_to_end.count == 1
+    assert tracker.to_observed.total == pytest.approx(2.0)
+    assert tracker.to_written.total == pytest.approx(0.5)
+    assert tracker.end_to_end.total == pytest.approx(2.5)
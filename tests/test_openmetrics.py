@@ -0,0 +1,61 @@
+"""Tests for the dlink_dchs150_hass OpenMetrics exporter."""
+
+from __future__ import annotations
+
+from custom_components.dchs150_motion.metrics import LatencyHistogram
+from custom_components.dchs150_motion.openmetrics import (
+    OpenMetricsExporter,
+    histogram_samples,
+    sample,
+)
+
+
+def test_exporter_renders_families_across_devices() -> None:
+    """Samples from every device should be grouped under each family."""
+    exporter = OpenMetricsExporter()
+    exporter.set_device("a", {"up": [sample("up", {"device": "10.1.1.1"}, 1)]})
+    exporter.set_device("b", {"up": [sample("up", {"device": '10.1.1."2'}, 0)]})
+
+    body = exporter.render()
+
+    assert body.endswith("\n# EOF\n")
+    up_family = body.split("# TYPE dchs150_up gauge\n", 1)[1]
+    assert up_family.startswith(
+        "# HELP dchs150_up Whether the last poll of the device succeeded.\n"
+        'dchs150_up{device="10.1.1.1"} 1\n'
+        'dchs150_up{device="10.1.1.\\"2"} 0\n',
+    )
+
+
+def test_exporter_only_rerenders_on_change() -> None:
+    """A scrape with nothing new should return the same body, without rebuilding."""
+    exporter = OpenMetricsExporter()
+    exporter.set_device("a", {"up": [sample("up", {}, 1)]})
+    body = exporter.render()
+
+    exporter.set_device("a", {"up": [sample("up", {}, 1)]})
+    assert exporter.render() is body
+
+    exporter.set_device("a", {"up": [sample("up", {}, 0)]})
+    assert "dchs150_up 0" in exporter.render()
+
+    exporter.remove_device("a")
+    assert "\ndchs150_up " not in exporter.render()
+    assert exporter.devices == set()
+
+
+def test_histogram_samples_are_cumulative() -> None:
+    """Histogram buckets should be cumulative, ending with +Inf."""
+    histogram = LatencyHistogram((0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.record(value)
+
+    lines = histogram_samples("poll_duration_seconds", {}, histogram)
+
+    assert lines == [
+        'dchs150_poll_duration_seconds_bucket{le="0.1"} 1',
+        'dchs150_poll_duration_seconds_bucket{le="1.0"} 3',
+        'dchs150_poll_duration_seconds_bucket{le="+Inf"} 4',
+        "dchs150_poll_duration_seconds_count 4",
+        "dchs150_poll_duration_seconds_sum 6.05",
+    ]
@@ -0,0 +1,41 @@
+"""Tests for the dlink_dchs150_hass poll profiler."""
+
+from __future__ import annotations
+
+import hashlib
+from typing import TYPE_CHECKING
+
+from custom_components.dchs150_motion.profiling import UpdateProfiler, write_profile
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def busy_poll() -> None:
+    """Do something worth profiling."""
+    for _ in range(100):
+        hashlib.md5(b"dchs150").hexdigest()  # noqa: S324
+
+
+def test_profiles_only_inside_polls(tmp_path: Path) -> None:
+    """Only work inside a poll's scope should be profiled."""
+    profiler = UpdateProfiler()
+    with profiler.scope():
+        busy_poll()
+    assert not profiler.running
+
+    profiler.start()
+    busy_poll()
+    with profiler.scope(), profiler.scope():
+        busy_poll()
+    profile = profiler.stop()
+
+    assert profile is not None
+    assert profiler.updates == 2
+    prof_path = tmp_path / "poll.prof"
+    summary_path = tmp_path / "poll.txt"
+    write_profile(profile, str(prof_path), str(summary_path), 10, "test_profiling")
+    assert prof_path.stat().st_size > 0
+    summary = summary_path.read_text(encoding="utf-8")
+    assert summary.count("busy_poll") == 2
+    assert "ncalls" in summary
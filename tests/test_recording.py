@@ -0,0 +1,183 @@
+"""Tests for recording device traffic and replaying it."""
+
+from __future__ import annotations
+
+import gzip
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+from aiohttp import ClientSession
+
+from custom_components.dchs150_motion.api import DlinkDchHassApiClient
+from custom_components.dchs150_motion.dch_wifi import (
+    ACTION_BASE_URL,
+    GeneralCommunicationError,
+    HNAPClient,
+    HNAPDeviceStatus,
+    NanoSOAPClient,
+)
+from custom_components.dchs150_motion.recording import (
+    SCRUBBED,
+    Exchange,
+    ReplaySOAPClient,
+    TrafficRecorder,
+    load_corpus,
+)
+from utils.hnap_simulator import SimulatedFleet
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def envelope(method: str, body: str) -> str:
+    """Wrap a response body up as the device would."""
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+        f"<soap:Body><{method}Response>{body}</{method}Response></soap:Body>"
+        "</soap:Envelope>"
+    )
+
+
+@pytest.mark.asyncio
+async def test_record_and_replay(tmp_path: Path) -> None:
+    """Replaying a recording should take a client through the same calls."""
+    path = tmp_path / "traffic.jsonl.gz"
+    async with SimulatedFleet.build(1) as fleet, ClientSession() as session:
+        device = fleet.devices[0]
+        address = fleet.addresses[0]
+        soap = NanoSOAPClient(address, ACTION_BASE_URL, session=session)
+        soap.recorder = TrafficRecorder(address)
+        client = HNAPClient(soap, "Admin", "123456")
+        recorded = []
+        for when in (1_700_000_000, 1_700_000_060):
+            device.detect(when)
+            recorded.append(await client.get_latest_detection())
+        # The session expires, so the client fails a call and logs in again
+        device.expire_sessions()
+        with pytest.raises(GeneralCommunicationError):
+            await client.get_latest_detection()
+        recorded.append(await client.get_latest_detection())
+        assert soap.recorder.save(path) == 9
+
+    header, exchanges = load_corpus(path)
+    assert header["address"] == address
+    assert [exchange.method for exchange in exchanges] == [
+        "Login",
+        "Login",
+        "GetDeviceSettings",
+        "GetLatestDetection",
+        "GetLatestDetection",
+        "GetLatestDetection",
+        "Login",
+        "Login",
+        "GetLatestDetection",
+    ]
+    assert all(exchange.date and exchange.duration >= 0 for exchange in exchanges)
+
+    replay = ReplaySOAPClient(exchanges, speed=0)
+    client = HNAPClient(replay, "Admin", "123456")
+    replayed = [await client.get_latest_detection() for _ in range(2)]
+    with pytest.raises(GeneralCommunicationError):
+        await client.get_latest_detection()
+    assert client.get_status() == HNAPDeviceStatus.COMMUNICATION_ERROR
+    replayed.append(await client.get_latest_detection())
+    assert replayed == recorded
+    assert client.model_name == "DCH-S150"
+    assert replay.replayed == 9
+
+
+@pytest.mark.asyncio
+async def test_replay_speed_errors_and_repeat() -> None:
+    """Replay should scale the recorded delays, raise recorded errors, and repeat."""
+    exchanges = [
+        Exchange(
+            "GetLatestDetection",
+            {"ModuleID": "1"},
+            0.0,
+            0.2,
+            text=envelope(
+                "GetLatestDetection", "<LatestDetectTime>1</LatestDetectTime>"
+            ),
+        ),
+        Exchange(
+            "GetLatestDetection",
+            {"ModuleID": "1"},
+            1.0,
+            0.0,
+            error="ServerDisconnectedError",
+        ),
+    ]
+    replay = ReplaySOAPClient(exchanges, speed=10)
+    started = time.monotonic()
+    assert (await replay.call("GetLatestDetection"))["LatestDetectTime"] == "1"
+    assert 0.015 <= time.monotonic() - started < 0.15
+    with pytest.raises(Exception, match="Replayed ServerDisconnectedError") as info:
+        await replay.call("GetLatestDetection")
+    assert type(info.value).__name__ == "ServerDisconnectedError"
+    with pytest.raises(GeneralCommunicationError, match="every recorded"):
+        await replay.call("GetLatestDetection")
+    with pytest.raises(GeneralCommunicationError, match="Nothing recorded"):
+        await replay.call("GetDeviceSettings")
+
+    replay = ReplaySOAPClient(exchanges, speed=0, repeat=True)
+    for _ in range(3):
+        await replay.call("GetLatestDetection")
+        with pytest.raises(Exception, match="Replayed"):
+            await replay.call("GetLatestDetection")
+
+
+@pytest.mark.asyncio
+async def test_replay_firmware_without_detect_time() -> None:
+    """Firmware that leaves out LatestDetectTime should still give a detection time."""
+    exchanges = [
+        Exchange(
+            "GetLatestDetection",
+            {"ModuleID": "1"},
+            0.0,
+            0.0,
+            text=envelope(
+                "GetLatestDetection",
+                "<GetLatestDetectionResult>OK</GetLatestDetectionResult>",
+            ),
+        ),
+    ]
+    async with ClientSession() as session:
+        api = DlinkDchHassApiClient("replay", "123456", session)
+    api._client._client = ReplaySOAPClient(exchanges, speed=0)  # noqa: SLF001
+    api._client.set_status(HNAPDeviceStatus.ONLINE)  # noqa: SLF001
+
+    detected = await api.get_latest_detection()
+    assert detected.year == 2020
+
+
+@pytest.mark.asyncio
+async def test_recording_leaves_out_login_secrets(tmp_path: Path) -> None:
+    """Nothing that would let the PIN be brute forced should end up in a recording."""
+    path = tmp_path / "traffic.jsonl.gz"
+    async with SimulatedFleet.build(1) as fleet, ClientSession() as session:
+        device = fleet.devices[0]
+        soap = NanoSOAPClient(fleet.addresses[0], ACTION_BASE_URL, session=session)
+        soap.recorder = TrafficRecorder(fleet.addresses[0])
+        client = HNAPClient(soap, "Admin", "123456")
+        detection = await client.get_latest_detection()
+        soap.recorder.save(path)
+        secrets = {
+            value
+            for cookie, login in device._sessions.items()  # noqa: SLF001
+            for value in (cookie, login.challenge, login.public_key, login.private_key)
+        }
+
+    assert secrets
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        corpus = file.read()
+    assert not {secret for secret in secrets if secret in corpus}
+    assert "Admin" not in corpus
+    _, exchanges = load_corpus(path)
+    logins = [exchange for exchange in exchanges if exchange.method == "Login"]
+    assert logins[1].params["LoginPassword"] == SCRUBBED
+
+    # Replay doesn't need them
+    client = HNAPClient(ReplaySOAPClient(exchanges, speed=0), "Admin", "123456")
+    assert await client.get_latest_detection() == detection
@@ -1,14 +1,21 @@
 """Test dlink_dchs150_hass switch."""
 
 # from unittest.mock import call
-# from unittest.mock import patch
+import asyncio
+from unittest.mock import patch
+
 import pytest
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, State
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import (
+    mock_restore_cache_with_extra_data,
+)
 
 from custom_components.dchs150_motion import (
     async_setup_entry,
 )
+from custom_components.dchs150_motion.const import BINARY_SENSOR, DOMAIN
 
 # from custom_components.dchs150_motion.const import (
 #     DEFAULT_NAME,
@@ -25,3 +32,59 @@ async def test_sensor_services(hass: HomeAssistant, config_entry: ConfigEntry) -
 
 
 # TODO(tathamg@gmail.com):  Write some actual tests . . .  # noqa: TD003 FIX002
+
+
+@pytest.mark.asyncio
+async def test_sensor_restores_state(
+    hass: HomeAssistant,
+    enable_custom_integrations,  # noqa: ANN001
+    config_entry,  # noqa: ANN001
+) -> None:
+    """The sensor should come up with its pre-restart state, without waiting on a poll."""
+    config_entry.add_to_hass(hass)
+    entity_id = f"{BINARY_SENSOR}.hall_sensor"
+    er.async_get(hass).async_get_or_create(
+        BINARY_SENSOR,
+        DOMAIN,
+        config_entry.entry_id,
+        config_entry=config_entry,
+        suggested_object_id="hall_sensor",
+    )
+    mock_restore_cache_with_extra_data(
+        hass,
+        [
+            (
+                State(entity_id, "off"),
+                {
+                    "last_detection": "2024-01-01T12:00:00+00:00",
+                    "mac_address": "B0:C5:54:00:00:01",
+                    "model_name": "DCH-S150",
+                    "firmware_version": "1.22",
+                    "hardware_version": "A1",
+                    "device_name": "Hall Sensor",
+                    "vendor_name": "D-Link",
+                },
+            ),
+        ],
+    )
+
+    first_poll = asyncio.Event()
+
+    async def slow_get_data(*_args: object) -> dict:
+        await first_poll.wait()
+        raise ValueError("Device unreachable")
+
+    with patch(
+        "custom_components.dchs150_motion.api.DlinkDchHassApiClient.async_get_data",
+        side_effect=slow_get_data,
+    ):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+
+        state = hass.states.get(entity_id)
+        assert state is not None
+        assert state.state == "off"
+        assert state.attributes.get("device_class") == "motion"
+
+        first_poll.set()
+        await hass.async_block_till_done(wait_background_tasks=True)
@@ -0,0 +1,143 @@
+"""Tests for the services that set up, or change, many devices at once."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+import voluptuous as vol
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from custom_components.dchs150_motion.api import (
+    DlinkDchHassApiClient,
+    fill_in_timezone,
+)
+from custom_components.dchs150_motion.const import (
+    ATTR_DEVICES,
+    ATTR_HOSTS,
+    CONF_BACKOFF,
+    CONF_HOST,
+    CONF_NTP_SERVER,
+    CONF_PIN,
+    CONF_SENSITIVITY,
+    DOMAIN,
+    SERVICE_ONBOARD,
+    SERVICE_PUSH_SETTINGS,
+)
+from custom_components.dchs150_motion.services import (
+    ONBOARD_SCHEMA,
+    async_setup_services,
+)
+from utils.hnap_simulator import SimulatedFleet
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+
+@pytest.mark.parametrize("pin", ["12345", "1234567"])
+def test_onboard_pin_length(pin: str) -> None:
+    """A PIN is exactly six characters, so anything else is caught up front."""
+    ONBOARD_SCHEMA({ATTR_DEVICES: [{CONF_HOST: "10.1.1.1", CONF_PIN: "123456"}]})
+    with pytest.raises(vol.Invalid):
+        ONBOARD_SCHEMA({ATTR_DEVICES: [{CONF_HOST: "10.1.1.1", CONF_PIN: pin}]})
+
+
+@pytest.mark.asyncio
+async def test_onboard_and_push_settings(
+    hass: HomeAssistant,
+    enable_custom_integrations: None,
+) -> None:
+    """Devices should be set up, and changed, together, each reporting how it went."""
+    async with SimulatedFleet.build(3) as fleet:
+        hosts = fleet.addresses
+        with patch(
+            "custom_components.dchs150_motion.async_setup_entry",
+            return_value=True,
+        ):
+            async_setup_services(hass)
+            response = await hass.services.async_call(
+                DOMAIN,
+                SERVICE_ONBOARD,
+                {
+                    ATTR_DEVICES: [
+                        {CONF_HOST: hosts[0], CONF_PIN: "123456", CONF_SENSITIVITY: 50},
+                        {CONF_HOST: hosts[1], CONF_PIN: "123456"},
+                        {CONF_HOST: hosts[2], CONF_PIN: "000000"},
+                    ],
+                    CONF_BACKOFF: 10,
+                },
+                blocking=True,
+                return_response=True,
+            )
+            assert response
+            assert (response["succeeded"], response["failed"]) == (2, 1)
+            results = response["devices"]
+            assert [result["host"] for result in results] == hosts
+            assert results[2]["error"] == "authentication_error"
+
+            entries = {
+                entry.entry_id: entry
+                for entry in hass.config_entries.async_entries(DOMAIN)
+            }
+            first = entries[results[0]["entry_id"]]
+            assert first.data == {CONF_HOST: hosts[0], CONF_PIN: "123456"}
+            assert first.options == {CONF_SENSITIVITY: 50, CONF_BACKOFF: 10}
+            assert first.unique_id == "B0:C5:54:00:00:00"
+            assert entries[results[1]["entry_id"]].options == {CONF_BACKOFF: 10}
+
+            # Already set up, so not again
+            response = await hass.services.async_call(
+                DOMAIN,
+                SERVICE_ONBOARD,
+                {ATTR_DEVICES: {CONF_HOST: hosts[0], CONF_PIN: "123456"}},
+                blocking=True,
+                return_response=True,
+            )
+            assert response
+            assert response["devices"][0]["error"] == "already_configured"
+
+            # Only the first is running, so only it gets the settings pushed right away
+            client = DlinkDchHassApiClient(
+                hosts[0],
+                "123456",
+                async_get_clientsession(hass),
+                fill_in_timezone(hass.config.time_zone, first.options),
+                None,
+            )
+            await client.async_get_data()
+            hass.data.setdefault(DOMAIN, {})[first.entry_id] = SimpleNamespace(
+                api=client,
+            )
+            response = await hass.services.async_call(
+                DOMAIN,
+                SERVICE_PUSH_SETTINGS,
+                {
+                    ATTR_HOSTS: hosts[:2],
+                    CONF_SENSITIVITY: 60,
+                    CONF_NTP_SERVER: "pool.ntp.org",
+                },
+                blocking=True,
+                return_response=True,
+            )
+            assert response
+            assert (response["succeeded"], response["failed"]) == (2, 0)
+            assert fleet.devices[0].detector_settings["Sensitivity"] == "60"
+            assert fleet.devices[0].detector_settings["Backoff"] == "10"
+            assert fleet.devices[0].time_settings["NTPServer"] == "pool.ntp.org"
+            assert entries[results[1]["entry_id"]].options == {
+                CONF_BACKOFF: 10,
+                CONF_SENSITIVITY: 60,
+                CONF_NTP_SERVER: "pool.ntp.org",
+            }
+
+            with pytest.raises(HomeAssistantError, match="No device set up"):
+                await hass.services.async_call(
+                    DOMAIN,
+                    SERVICE_PUSH_SETTINGS,
+                    {ATTR_HOSTS: [hosts[2]], CONF_SENSITIVITY: 60},
+                    blocking=True,
+                    return_response=True,
+                )
@@ -0,0 +1,59 @@
+"""Tests for the dlink_dchs150_hass tracing."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from custom_components.dchs150_motion.tracing import Tracer
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_awaits() -> None:
+    """Spans should record their parents, even across tasks."""
+    tracer = Tracer()
+    tracer.sample_rate = 1.0
+
+    async def inner() -> None:
+        with tracer.span("inner", method="GetLatestDetection"):
+            await asyncio.sleep(0)
+
+    with tracer.span("outer"):
+        await asyncio.gather(inner(), asyncio.ensure_future(inner()))
+
+    inner_one, inner_two, outer = tracer.spans
+    assert outer.name == "outer"
+    assert outer.parent_id is None
+    assert inner_one.parent_id == inner_two.parent_id == outer.span_id
+    assert {inner_one.trace_id, inner_two.trace_id} == {outer.span_id}
+
+    lines = tracer.as_json_lines().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["inner", "inner", "outer"]
+    events = json.loads(tracer.as_chrome_trace())["traceEvents"]
+    assert events[0]["ph"] == "X"
+    assert events[0]["args"]["method"] == "GetLatestDetection"
+
+
+def test_unsampled_traces_stay_quiet() -> None:
+    """Nothing should be recorded when sampling is off, or the trace isn't sampled."""
+    tracer = Tracer()
+    with tracer.span("outer"), tracer.span("inner"):
+        pass
+    assert not tracer.spans
+
+    tracer.sample_rate = 1e-12
+    with tracer.span("outer"), tracer.span("inner"):
+        pass
+    assert not tracer.spans
+
+
+def test_span_records_errors() -> None:
+    """A span that ends in an exception should say so."""
+    tracer = Tracer()
+    tracer.sample_rate = 1.0
+    with pytest.raises(TimeoutError), tracer.span("network"):
+        raise TimeoutError
+
+    assert tracer.spans[0].error == "TimeoutError"
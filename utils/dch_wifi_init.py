@@ -19,15 +19,22 @@ from __future__ import annotations
 import argparse
 import asyncio
 import binascii
+import csv
 import logging
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
 
 import aiohttp
 from Crypto.Cipher import AES  # nosec
 
 from custom_components.dchs150_motion.const import DEFAULT_SOAP_TIMEOUT
 from custom_components.dchs150_motion.dch_wifi import (
+    GeneralCommunicationError,
     HNAPClient,
     NanoSOAPClient,
+    UnableToConnectError,
     str2hexstr,
 )
 
@@ -35,6 +42,25 @@ _LOGGER = logging.getLogger(__name__)
 
 ACTION_BASE_URL = "http://purenetworks.com/HNAP1/"
 
+# Format here was largely gotten at through guessing, and by looking at some of the XML
+# used by DLink HNAP-based access points.  For sure it works for open access; it /may/
+# work for WPA2-PSK (never got that to work, but that's also related to my networking
+# environment).
+NO_SECURITY = "<SecurityInfo><SecurityType>NONE</SecurityType><Encryptions><string>NONE</string></Encryptions></SecurityInfo>"
+WPA2_SECURITY = "<SecurityInfo><SecurityType>WPA2-PSK</SecurityType><Encryptions><string>AES</string></Encryptions></SecurityInfo>"
+
+DEFAULT_PARALLEL = 8
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_DELAY = 2.0
+# Worth another go:  the device didn't answer, or answered with something odd
+RETRYABLE_ERRORS = (
+    GeneralCommunicationError,
+    UnableToConnectError,
+    aiohttp.ClientError,
+    TimeoutError,
+)
+BATCH_COLUMNS = ("ip", "pin", "mac", "ssid")
+
 
 def code_wifi_password(wifi_password: str, private_key: str | None) -> str:
     """Encode the wifi password for the DCH-S150 device."""
@@ -51,20 +77,13 @@ def code_wifi_password(wifi_password: str, private_key: str | None) -> str:
     return bytes.hex(encoded)  # Convert bytes to a hex string
 
 
-async def do_our_stuff(
-    ip: str,
-    pin: str,  # get this from the label on the back
-    mac_address: str,  # get this from the label on the back
+async def set_wifi(
+    client: HNAPClient,
+    mac_address: str,
     access_point_ssid: str,
     wifi_password: str | None = None,
-) -> None:  # use None to indicate no security
-    """Set the wifi settings for the DCH-S150 device."""
-    # Connect to the motion detector (as an AP) and login
-    session = aiohttp.ClientSession()
-    soap = NanoSOAPClient(ip, ACTION_BASE_URL, session=session)
-    client = HNAPClient(soap, "Admin", pin)
-    await client.login()
-
+) -> dict[str, Any]:
+    """Point a logged-in device at the access point (no password for no security)."""
     # If you're curious . . .
     #  print(f"Supported actions:")
     #  print("\n".join(client.actions))
@@ -75,20 +94,15 @@ async def do_our_stuff(
     #  resp = await client.call("GetAPClientSettings", RadioID="RADIO_2.4GHz")
     #  print( resp )
 
-    # Format here was largely gotten at through guessing, and by looking at some of the XML
-    # used by DLink HNAP-based access points.  For sure it works for open access; it /may/
-    # work for WPA2-PSK (never got that to work, but that's also related to my networking
-    # environment).
-
     if not wifi_password:
-        supported_security = "<SecurityInfo><SecurityType>NONE</SecurityType><Encryptions><string>NONE</string></Encryptions></SecurityInfo>"
+        supported_security = NO_SECURITY
         wifi_password = "x"  # noqa: S105  # nosec
     else:
-        supported_security = "<SecurityInfo><SecurityType>WPA2-PSK</SecurityType><Encryptions><string>AES</string></Encryptions></SecurityInfo>"
+        supported_security = WPA2_SECURITY
 
     encoded_key = code_wifi_password(wifi_password, client.private_key)
 
-    resp = await client.call(
+    return await client.call(
         "SetAPClientSettings",
         RadioID="RADIO_2.4GHz",
         Enabled="true",
@@ -100,11 +114,145 @@ async def do_our_stuff(
         timeout=DEFAULT_SOAP_TIMEOUT,
     )
 
-    print(resp)  # noqa: T201
-    await session.close()
 
+async def do_our_stuff(
+    ip: str,
+    pin: str,  # get this from the label on the back
+    mac_address: str,  # get this from the label on the back
+    access_point_ssid: str,
+    wifi_password: str | None = None,  # use None to indicate no security
+    *,
+    session: aiohttp.ClientSession | None = None,
+) -> dict[str, Any]:
+    """Set the wifi settings for the DCH-S150 device, returning its response."""
+    own_session = session is None
+    session = session or aiohttp.ClientSession()
+    try:
+        # Connect to the motion detector (as an AP) and login.  All we want is the
+        # private key, so don't bother pushing time and detector settings.
+        soap = NanoSOAPClient(ip, ACTION_BASE_URL, session=session)
+        client = HNAPClient(soap, "Admin", pin)
+        client.skip_initialization = True
+        await client.login()
+        return await set_wifi(client, mac_address, access_point_ssid, wifi_password)
+    finally:
+        if own_session:
+            await session.close()
 
-if __name__ == "__main__":
+
+@dataclass
+class Provisioning:
+    """One device to provision, from a line of the batch file."""
+
+    ip: str
+    pin: str
+    mac_address: str
+    ssid: str
+    wifi_password: str | None = None
+
+
+@dataclass
+class ProvisioningResult:
+    """How provisioning one device went."""
+
+    ip: str
+    ok: bool
+    attempts: int
+    error: str | None = None
+    response: dict[str, Any] | None = None
+
+
+def load_batch(path: str | Path) -> list[Provisioning]:
+    """
+    Read the devices to provision from a CSV with a header row:  ip, pin, mac, ssid
+    and optionally password (empty for no security).  Lines starting with # are
+    ignored.
+    """
+    with Path(path).open(encoding="utf-8", newline="") as file:
+        rows = csv.DictReader(line for line in file if not line.startswith("#"))
+        missing = set(BATCH_COLUMNS) - set(rows.fieldnames or ())
+        if missing:
+            raise ValueError(f"Batch file {path} has no {', '.join(sorted(missing))}")
+        return [
+            Provisioning(
+                row["ip"].strip(),
+                row["pin"].strip(),
+                row["mac"].strip(),
+                row["ssid"].strip(),
+                (row.get("password") or "").strip() or None,
+            )
+            for row in rows
+            if row["ip"] and row["ip"].strip()
+        ]
+
+
+async def provision(
+    session: aiohttp.ClientSession,
+    device: Provisioning,
+    retries: int = DEFAULT_RETRIES,
+    retry_delay: float = DEFAULT_RETRY_DELAY,
+) -> ProvisioningResult:
+    """
+    Provision one device, trying again (after retry_delay, doubling each time) if it
+    doesn't answer.  A wrong PIN, etc., fails straight away.
+    """
+    error = None
+    for attempt in range(1, retries + 2):
+        try:
+            response = await do_our_stuff(
+                device.ip,
+                device.pin,
+                device.mac_address,
+                device.ssid,
+                device.wifi_password,
+                session=session,
+            )
+        except RETRYABLE_ERRORS as exc:
+            error = str(exc) or type(exc).__name__
+            _LOGGER.info("Attempt %d for %s failed: %s", attempt, device.ip, error)
+            if attempt <= retries:
+                await asyncio.sleep(retry_delay * 2 ** (attempt - 1))
+        except Exception as exc:  # noqa: BLE001
+            return ProvisioningResult(
+                device.ip, ok=False, attempts=attempt, error=str(exc)
+            )
+        else:
+            return ProvisioningResult(
+                device.ip,
+                ok=True,
+                attempts=attempt,
+                response=response,
+            )
+    return ProvisioningResult(
+        device.ip,
+        ok=False,
+        attempts=retries + 1,
+        error=error,
+    )
+
+
+async def provision_batch(
+    devices: list[Provisioning],
+    parallel: int = DEFAULT_PARALLEL,
+    retries: int = DEFAULT_RETRIES,
+    retry_delay: float = DEFAULT_RETRY_DELAY,
+) -> list[ProvisioningResult]:
+    """
+    Provision the devices concurrently, at most `parallel` at a time, over one
+    session.  Returns a result for each, in the same order.
+    """
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def provision_one(device: Provisioning) -> ProvisioningResult:
+        async with semaphore:
+            return await provision(session, device, retries, retry_delay)
+
+    async with aiohttp.ClientSession() as session:
+        return await asyncio.gather(*(provision_one(device) for device in devices))
+
+
+def main() -> None:
+    """Parse the command line and provision one device, or a batch of them."""
     parser = argparse.ArgumentParser(description="Wifi connector")
     parser.add_argument(
         "--ip",
@@ -126,17 +274,44 @@ if __name__ == "__main__":
         help="Password to connect to the AP - don't provide if no security",
         default=None,
     )
+    parser.add_argument(
+        "--batch",
+        help="CSV of devices to provision (ip, pin, mac, ssid, password) instead",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=DEFAULT_PARALLEL,
+        help="Most devices to provision at once, with --batch",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="Times to try a device again if it doesn't answer, with --batch",
+    )
     args = parser.parse_args()
 
-    logging.basicConfig(level=logging.DEBUG)
-    our_loop = asyncio.get_event_loop()
-
-    our_loop.run_until_complete(
-        do_our_stuff(
-            args.ip,
-            args.pin,
-            args.mac,
-            args.ssid,
-            args.password,
-        ),
+    if not args.batch:
+        logging.basicConfig(level=logging.DEBUG)
+        print(  # noqa: T201
+            asyncio.run(
+                do_our_stuff(args.ip, args.pin, args.mac, args.ssid, args.password),
+            ),
+        )
+        return
+
+    logging.basicConfig(level=logging.INFO)
+    results = asyncio.run(
+        provision_batch(load_batch(args.batch), args.parallel, args.retries),
     )
+    for result in results:
+        outcome = "OK" if result.ok else f"FAILED: {result.error}"
+        print(f"{result.ip:<21} {result.attempts} attempt(s)  {outcome}")  # noqa: T201
+    failed = sum(not result.ok for result in results)
+    print(f"{len(results) - failed} of {len(results)} provisioned")  # noqa: T201
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
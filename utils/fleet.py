@@ -0,0 +1,299 @@
+"""
+Triage a fleet of DLink DCH-S150/DCH-S160 detectors from the command line, without Home
+Assistant.
+
+Devices come from an inventory file:  CSV with a header row, a `host` and `pin` column,
+and optionally a `name` column (lines starting with # are ignored).  Every device is
+talked to concurrently, at most --parallel at a time:
+
+    python -m utils.fleet poll devices.csv        # poll everything once
+    python -m utils.fleet watch devices.csv       # keep polling, as a live table
+    python -m utils.fleet bench devices.csv       # poll flat out, report latency
+
+Use --simulate COUNT instead of an inventory to run against simulated devices (see
+hnap_simulator.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import logging
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+
+from custom_components.dchs150_motion.dch_wifi import (
+    ACTION_BASE_URL,
+    DEFAULT_LOGIN_NAME,
+    HNAPClient,
+    HNAPDeviceStatus,
+    NanoSOAPClient,
+    parse_detect_time,
+)
+from custom_components.dchs150_motion.metrics import LatencyHistogram
+from utils.hnap_simulator import SimulatedFleet
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PARALLEL = 32
+# Move the cursor home and clear the screen, to redraw the table in place
+_REDRAW = "\x1b[H\x1b[J"
+
+
+@dataclass
+class FleetDevice:
+    """A device in the inventory, and what we last heard from it."""
+
+    host: str
+    pin: str
+    name: str = ""
+    client: HNAPClient | None = None
+    last_detection: datetime | None = None
+    # Seconds the last poll took, if it worked
+    rtt: float | None = None
+    error: str | None = None
+    polls: int = 0
+    failures: int = 0
+    latency: LatencyHistogram = field(
+        default_factory=LatencyHistogram,
+        compare=False,
+        repr=False,
+    )
+
+    @property
+    def status(self) -> str:
+        """Return the client's idea of the device's status."""
+        return self.client.get_status().name if self.client else "UNKNOWN"
+
+
+def load_inventory(path: str | Path) -> list[FleetDevice]:
+    """Read the devices from an inventory file."""
+    with Path(path).open(encoding="utf-8", newline="") as file:
+        rows = csv.DictReader(line for line in file if not line.startswith("#"))
+        missing = {"host", "pin"} - set(rows.fieldnames or ())
+        if missing:
+            raise ValueError(f"Inventory {path} has no {', '.join(sorted(missing))}")
+        return [
+            FleetDevice(
+                row["host"].strip(),
+                row["pin"].strip(),
+                (row.get("name") or "").strip(),
+            )
+            for row in rows
+            if row["host"] and row["host"].strip()
+        ]
+
+
+def connect(devices: Iterable[FleetDevice], session: aiohttp.ClientSession) -> None:
+    """Give each device a client, sharing the session (they log in when first used)."""
+    for device in devices:
+        soap = NanoSOAPClient(device.host, ACTION_BASE_URL, session=session)
+        device.client = HNAPClient(soap, DEFAULT_LOGIN_NAME, device.pin)
+
+
+async def poll_device(device: FleetDevice) -> None:
+    """Ask the device for its latest detection, noting how long it took."""
+    if device.client is None:
+        raise ValueError(f"{device.host} isn't connected")
+    device.polls += 1
+    started = time.perf_counter()
+    try:
+        response = await device.client.get_latest_detection()
+        rtt = time.perf_counter() - started
+        # A device that's never detected anything says 0
+        value = response.get("LatestDetectTime", 0)
+        detected = parse_detect_time(value)
+        if detected is None:
+            raise ValueError(f"Unexpected LatestDetectTime: {value!r}")
+    except Exception as exc:  # noqa: BLE001
+        device.failures += 1
+        device.rtt = None
+        device.error = str(exc) or type(exc).__name__
+        return
+    device.rtt = rtt
+    device.latency.record(rtt)
+    device.error = None
+    if detected.timestamp():
+        # Take out how far the device's clock is off from ours, when it matters
+        device.last_detection = device.client.clock_skew.correct(detected).astimezone()
+
+
+async def poll_fleet(devices: list[FleetDevice], parallel: int) -> None:
+    """Poll every device once, at most `parallel` at a time."""
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def poll(device: FleetDevice) -> None:
+        async with semaphore:
+            await poll_device(device)
+
+    await asyncio.gather(*(poll(device) for device in devices))
+
+
+def format_table(devices: Iterable[FleetDevice]) -> str:
+    """Lay out what we know about each device as a table."""
+    rows = [("DEVICE", "STATUS", "LAST DETECTION", "RTT MS", "POLLS", "FAILED", "")]
+    rows.extend(
+        (
+            device.name or device.host,
+            device.status,
+            device.last_detection.strftime("%Y-%m-%d %H:%M:%S")
+            if device.last_detection
+            else "-",
+            f"{device.rtt * 1000:.1f}" if device.rtt is not None else "-",
+            str(device.polls),
+            str(device.failures),
+            device.error or "",
+        )
+        for device in devices
+    )
+    widths = [max(len(row[column]) for row in rows) for column in range(6)]
+    return "\n".join(
+        "  ".join(
+            [
+                *(cell.ljust(width) for cell, width in zip(row, widths, strict=False)),
+                row[6],
+            ],
+        ).rstrip()
+        for row in rows
+    )
+
+
+async def watch(devices: list[FleetDevice], parallel: int, interval: float) -> None:
+    """Poll every device every interval, redrawing the table each time, forever."""
+    while True:
+        started = time.monotonic()
+        await poll_fleet(devices, parallel)
+        online = sum(
+            device.client is not None
+            and device.client.get_status() is HNAPDeviceStatus.ONLINE
+            for device in devices
+        )
+        print(  # noqa: T201
+            f"{_REDRAW}{datetime.now().astimezone():%H:%M:%S}  "
+            f"{online}/{len(devices)} online\n\n{format_table(devices)}",
+            flush=True,
+        )
+        await asyncio.sleep(max(interval - (time.monotonic() - started), 0.0))
+
+
+async def bench(
+    devices: list[FleetDevice],
+    parallel: int,
+    seconds: float,
+) -> dict[str, Any]:
+    """
+    Poll the devices back to back for a while, each as fast as it answers, at most
+    `parallel` at a time.  Returns the throughput and latency percentiles (in ms).
+    """
+    semaphore = asyncio.Semaphore(parallel)
+    # Log in first, so that isn't what gets measured
+    await poll_fleet(devices, parallel)
+    for device in devices:
+        device.polls = device.failures = 0
+        device.latency = LatencyHistogram()
+    deadline = time.monotonic() + seconds
+
+    async def hammer(device: FleetDevice) -> None:
+        while time.monotonic() < deadline:
+            async with semaphore:
+                await poll_device(device)
+
+    started = time.monotonic()
+    await asyncio.gather(*(hammer(device) for device in devices))
+    elapsed = time.monotonic() - started
+
+    latency = LatencyHistogram()
+    for device in devices:
+        latency.merge(device.latency)
+    polls = sum(device.polls for device in devices)
+
+    def ms(value: float | None) -> float | None:
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "devices": len(devices),
+        "parallel": parallel,
+        "seconds": round(elapsed, 3),
+        "polls": polls,
+        "failed": sum(device.failures for device in devices),
+        "polls_per_second": round(polls / elapsed, 1) if elapsed else None,
+        "p50_ms": ms(latency.percentile(0.5)),
+        "p95_ms": ms(latency.percentile(0.95)),
+        "p99_ms": ms(latency.percentile(0.99)),
+        "max_ms": ms(latency.max if latency.count else None),
+    }
+
+
+async def _run(args: argparse.Namespace) -> int:
+    """Run the subcommand, returning the exit status."""
+    async with contextlib.AsyncExitStack() as stack:
+        if args.simulate:
+            fleet = await stack.enter_async_context(SimulatedFleet.build(args.simulate))
+            devices = [
+                FleetDevice(address, device.pin)
+                for address, device in zip(fleet.addresses, fleet.devices, strict=True)
+            ]
+        else:
+            devices = load_inventory(args.inventory)
+        session = await stack.enter_async_context(
+            aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.parallel)),
+        )
+        connect(devices, session)
+
+        if args.command == "poll":
+            await poll_fleet(devices, args.parallel)
+            print(format_table(devices))  # noqa: T201
+            return 1 if any(device.error for device in devices) else 0
+        if args.command == "watch":
+            await watch(devices, args.parallel, args.interval)
+        else:
+            results = await bench(devices, args.parallel, args.seconds)
+            for name, value in results.items():
+                print(f"{name:>16}: {value}")  # noqa: T201
+        return 0
+
+
+def main() -> None:
+    """Parse the command line and run the subcommand."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    commands = parser.add_subparsers(dest="command", required=True)
+    poll = commands.add_parser("poll", help="Poll every device once")
+    watch = commands.add_parser("watch", help="Keep polling, as a live table")
+    watch.add_argument("--interval", type=float, default=5.0, help="Seconds")
+    bench = commands.add_parser("bench", help="Measure latency and throughput")
+    bench.add_argument("--seconds", type=float, default=10.0)
+    for command in (poll, watch, bench):
+        source = command.add_mutually_exclusive_group(required=True)
+        source.add_argument("inventory", nargs="?", help="CSV of host, pin, name")
+        source.add_argument(
+            "--simulate",
+            type=int,
+            metavar="COUNT",
+            help="Use this many simulated devices instead",
+        )
+        command.add_argument(
+            "--parallel",
+            type=int,
+            default=DEFAULT_PARALLEL,
+            help="Most devices to talk to at once",
+        )
+        command.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    with contextlib.suppress(KeyboardInterrupt):
+        sys.exit(asyncio.run(_run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,578 @@
+"""
+Simulates DLink DCH-S150 motion and DCH-S160 water detectors, for load and fault testing.
+
+Each simulated device listens on its own localhost port and speaks enough HNAP for the
+integration (and utils/):  Login (challenge, public key, cookie, and the HMAC
+handshake), with every later call checked against its HNAP_AUTH, GetDeviceSettings,
+GetLatestDetection, the Get/Set detector and time settings, SetAPClientSettings,
+GetModuleSOAPActions and Reboot, plus the unauthenticated GET that discovery uses.
+Faults can be dialed in per device:  latency (with jitter), dropped connections,
+sessions that expire and how long a reboot takes.  As with the real thing, a call the
+device doesn't like gets back something that isn't SOAP.
+
+Run it stand-alone to put a fleet on the network for a dev HA instance, e.g.:
+
+    python -m utils.hnap_simulator --count 200 --base-port 18000 --latency 0.05
+
+or use SimulatedFleet (or serve_in_process) from tests and benchmarks.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import logging
+import math
+import random
+import secrets
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from typing import TYPE_CHECKING, Any, Self
+from xml.sax.saxutils import escape
+
+import xmltodict
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from multiprocessing.connection import Connection
+    from types import TracebackType
+
+_LOGGER = logging.getLogger(__name__)
+
+ACTION_BASE_URL = "http://purenetworks.com/HNAP1/"
+MOTION_MODEL = "DCH-S150"
+WATER_MODEL = "DCH-S160"
+
+# What the DCH-S150 reports, as far as the integration cares
+_COMMON_ACTIONS = (
+    "GetDeviceSettings",
+    "GetLatestDetection",
+    "GetModuleSOAPActions",
+    "GetTimeSettings",
+    "Login",
+    "Reboot",
+    "SetAPClientSettings",
+    "SetTimeSettings",
+)
+_DETECTOR_ACTIONS = {
+    MOTION_MODEL: ("GetMotionDetectorSettings", "SetMotionDetectorSettings"),
+    WATER_MODEL: ("GetWaterDetectorSettings", "SetWaterDetectorSettings"),
+}
+
+
+def _hmac(key: str, message: str) -> str:
+    """Return the HMAC the device uses for the login handshake and HNAP_AUTH."""
+    return (
+        hmac.new(key.encode(), message.encode(), digestmod=hashlib.md5)
+        .hexdigest()
+        .upper()
+    )
+
+
+def _to_xml(values: dict[str, Any]) -> str:
+    """Render a (possibly nested) dict as elements; lists repeat the element."""
+    parts = []
+    for name, value in values.items():
+        for item in value if isinstance(value, list) else [value]:
+            inner = _to_xml(item) if isinstance(item, dict) else escape(str(item))
+            parts.append(f"<{name}>{inner}</{name}>")
+    return "".join(parts)
+
+
+@dataclass
+class Faults:
+    """How badly a simulated device behaves."""
+
+    # Seconds added to every response, plus up to `jitter` more
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Fraction (0-1) of requests that get their connection dropped instead of answered
+    drop_rate: float = 0.0
+    # Seconds a login stays good for (None for forever)
+    session_lifetime: float | None = None
+    # Seconds the device stays off the air after a Reboot
+    reboot_seconds: float = 5.0
+    # How far the device's clock is off from ours, in seconds
+    clock_offset: float = 0.0
+
+
+@dataclass
+class _Session:
+    """One login, from the challenge on."""
+
+    challenge: str
+    public_key: str
+    private_key: str
+    created: float
+    authenticated: bool = False
+
+
+@dataclass
+class SimulatedDevice:
+    """One fake DCH-S150 or DCH-S160."""
+
+    pin: str
+    model: str = MOTION_MODEL
+    mac_address: str = "B0:C5:54:00:00:01"
+    faults: Faults = field(default_factory=Faults)
+    firmware_version: str = "1.22"
+    # When the device last detected something (seconds since the epoch)
+    last_detection: int = 0
+    detector_settings: dict[str, str] = field(default_factory=dict)
+    time_settings: dict[str, str] = field(default_factory=dict)
+    # The Wi-Fi network the device was last told to join
+    ap_client_settings: dict[str, Any] = field(default_factory=dict)
+    # Calls answered, by method
+    calls: Counter = field(default_factory=Counter)
+    dropped: int = 0
+    reboots: int = 0
+    _sessions: dict[str, _Session] = field(default_factory=dict)
+    _rebooting_until: float = 0.0
+    _handlers: dict[str, Callable[[dict[str, Any]], dict[str, Any]]] = field(
+        init=False,
+        repr=False,
+    )
+
+    def __post_init__(self) -> None:
+        """Start with the settings a factory-fresh device has."""
+        if self.model not in _DETECTOR_ACTIONS:
+            raise ValueError(f"Unsupported model {self.model}")
+        self.detector_settings = self.detector_settings or {
+            "ModuleID": "1",
+            "NickName": "Motion Sensor" if self.model == MOTION_MODEL else "Water",
+            "Description": "",
+            "OPStatus": "true",
+            **(
+                {"Sensitivity": "80", "Backoff": "30"}
+                if self.model == MOTION_MODEL
+                else {}
+            ),
+        }
+        get_detector, set_detector = _DETECTOR_ACTIONS[self.model]
+        self._handlers = {
+            "GetDeviceSettings": self._get_device_settings,
+            "GetModuleSOAPActions": self._get_module_soap_actions,
+            "GetLatestDetection": self._get_latest_detection,
+            "GetTimeSettings": self._get_time_settings,
+            "SetTimeSettings": self._set_time_settings,
+            "SetAPClientSettings": self._set_ap_client_settings,
+            "Reboot": self._reboot,
+            get_detector: self._get_detector_settings,
+            set_detector: self._set_detector_settings,
+        }
+
+    @property
+    def rebooting(self) -> bool:
+        """Return whether the device is off the air, rebooting."""
+        return time.monotonic() < self._rebooting_until
+
+    def detect(self, when: float | None = None) -> None:
+        """Make the device detect something (now, unless told when)."""
+        self.last_detection = int(time.time() if when is None else when)
+
+    def expire_sessions(self) -> None:
+        """Forget every login, as if they'd all timed out."""
+        self._sessions.clear()
+
+    def application(self) -> web.Application:
+        """Return an aiohttp app serving this device."""
+        app = web.Application()
+        app.router.add_post("/HNAP1", self.handle)
+        app.router.add_post("/HNAP1/", self.handle)
+        app.router.add_get("/HNAP1/", self.handle_probe)
+        return app
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        """Answer an HNAP request, or misbehave as configured."""
+        faults = self.faults
+        if faults.latency or faults.jitter:
+            await asyncio.sleep(faults.latency + random.uniform(0, faults.jitter))  # noqa: S311
+        if self.rebooting or random.random() < faults.drop_rate:  # noqa: S311
+            return self._drop(request)
+
+        method = request.headers.get("SOAPAction", "").strip('"').rsplit("/", 1)[-1]
+        body = await request.text()
+        try:
+            params = xmltodict.parse(body)["soap:Envelope"]["soap:Body"][method] or {}
+        except Exception:  # noqa: BLE001
+            return web.Response(status=400, text="Bad request")
+        session_id = request.cookies.get("uid", "")
+
+        if method == "Login":
+            result = self._login(params, session_id)
+        elif not self._authorized(method, session_id, request.headers):
+            # Not SOAP, so the client gives up on the session and logs in again
+            return web.Response(status=401, text="<html>Unauthorized</html>")
+        else:
+            handler = self._handlers.get(method)
+            result = handler(params) if handler else {f"{method}Result": "ERROR"}
+        self.calls[method] += 1
+        return web.Response(
+            text=self._envelope(method, result),
+            content_type="text/xml",
+            headers={
+                "Date": formatdate(time.time() + faults.clock_offset, usegmt=True)
+            },
+        )
+
+    async def handle_probe(self, request: web.Request) -> web.StreamResponse:
+        """Answer a GET of /HNAP1/ with the device settings, as the device does."""
+        if self.rebooting:
+            return self._drop(request)
+        self.calls["probe"] += 1
+        return web.Response(
+            text=self._envelope("GetDeviceSettings", self._get_device_settings({})),
+            content_type="text/xml",
+        )
+
+    def _drop(self, request: web.Request) -> web.Response:
+        """Hang up on the client without answering."""
+        self.dropped += 1
+        if request.transport is not None:
+            request.transport.close()
+        return web.Response()
+
+    @staticmethod
+    def _envelope(method: str, result: dict[str, Any]) -> str:
+        """Wrap a result up the way the device does."""
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"'
+            ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+            ' xmlns:xsd="http://www.w3.org/2001/XMLSchema">'
+            f'<soap:Body><{method}Response xmlns="{ACTION_BASE_URL}">'
+            f"{_to_xml(result)}</{method}Response></soap:Body></soap:Envelope>"
+        )
+
+    def _login(self, params: dict[str, Any], session_id: str) -> dict[str, Any]:
+        """Either hand out a challenge, or check the answer to one."""
+        if params.get("Action") == "request":
+            challenge = secrets.token_hex(10).upper()
+            public_key = secrets.token_hex(10).upper()
+            cookie = secrets.token_hex(5).upper()
+            self._sessions[cookie] = _Session(
+                challenge,
+                public_key,
+                _hmac(public_key + self.pin, challenge),
+                time.monotonic(),
+            )
+            return {
+                "LoginResult": "OK",
+                "Challenge": challenge,
+                "Cookie": cookie,
+                "PublicKey": public_key,
+            }
+        session = self._sessions.get(session_id)
+        if session is None or params.get("LoginPassword") != _hmac(
+            session.private_key,
+            session.challenge,
+        ):
+            self._sessions.pop(session_id, None)
+            return {"LoginResult": "failed"}
+        session.authenticated = True
+        session.created = time.monotonic()
+        return {"LoginResult": "success"}
+
+    def _authorized(self, method: str, session_id: str, headers: Any) -> bool:  # noqa: ANN401
+        """Check the call comes from a live login, signed with its private key."""
+        session = self._sessions.get(session_id)
+        if session is None or not session.authenticated:
+            return False
+        lifetime = self.faults.session_lifetime
+        if lifetime is not None and time.monotonic() - session.created > lifetime:
+            del self._sessions[session_id]
+            return False
+        auth, _, timestamp = headers.get("HNAP_AUTH", "").partition(" ")
+        return hmac.compare_digest(
+            auth,
+            _hmac(session.private_key, f'{timestamp}"{ACTION_BASE_URL}{method}"'),
+        )
+
+    def _actions(self) -> list[str]:
+        """Return the SOAP actions the device supports."""
+        return [
+            ACTION_BASE_URL + action
+            for action in (*_COMMON_ACTIONS, *_DETECTOR_ACTIONS[self.model])
+        ]
+
+    def _get_device_settings(self, _params: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "GetDeviceSettingsResult": "OK",
+            "Type": "Sensor",
+            "DeviceName": f"D-Link {self.model}",
+            "DeviceMacId": self.mac_address,
+            "ModelName": self.model,
+            "ModelDescription": "Motion Sensor"
+            if self.model == MOTION_MODEL
+            else "Water Sensor",
+            "HardwareVersion": "A1",
+            "FirmwareVersion": self.firmware_version,
+            "FirmwareRegion": "Default",
+            "VendorName": "D-Link",
+            "PresentationURL": "",
+            "SOAPActions": {"string": self._actions()},
+        }
+
+    def _get_module_soap_actions(self, _params: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "GetModuleSOAPActionsResult": "OK",
+            "ModuleSOAPList": {
+                "ModuleSOAPInfo": {
+                    "ModuleID": "1",
+                    "SOAPActions": {"Action": list(_DETECTOR_ACTIONS[self.model])},
+                },
+            },
+        }
+
+    def _get_latest_detection(self, _params: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "GetLatestDetectionResult": "OK",
+            "ModuleID": "1",
+            "LatestDetectTime": self.last_detection,
+        }
+
+    def _get_detector_settings(self, _params: dict[str, Any]) -> dict[str, Any]:
+        return {
+            f"Get{self._detector()}DetectorSettingsResult": "OK",
+            **self.detector_settings,
+        }
+
+    def _set_detector_settings(self, params: dict[str, Any]) -> dict[str, Any]:
+        self.detector_settings.update(
+            {
+                name: str(value)
+                for name, value in params.items()
+                if name in self.detector_settings
+            },
+        )
+        return {f"Set{self._detector()}DetectorSettingsResult": "OK"}
+
+    def _detector(self) -> str:
+        return "Motion" if self.model == MOTION_MODEL else "Water"
+
+    def _get_time_settings(self, _params: dict[str, Any]) -> dict[str, Any]:
+        return {"GetTimeSettingsResult": "OK", **self.time_settings}
+
+    def _set_time_settings(self, params: dict[str, Any]) -> dict[str, Any]:
+        self.time_settings = {
+            name: str(value) for name, value in params.items() if name[0] != "@"
+        }
+        return {"SetTimeSettingsResult": "OK"}
+
+    def _set_ap_client_settings(self, params: dict[str, Any]) -> dict[str, Any]:
+        self.ap_client_settings = {
+            name: value for name, value in params.items() if name[0] != "@"
+        }
+        return {"SetAPClientSettingsResult": "OK"}
+
+    def _reboot(self, _params: dict[str, Any]) -> dict[str, Any]:
+        self.reboots += 1
+        self._sessions.clear()
+        self._rebooting_until = time.monotonic() + self.faults.reboot_seconds
+        return {"RebootResult": "REBOOT"}
+
+
+class SimulatedFleet:
+    """A bunch of simulated devices, each on its own localhost port."""
+
+    def __init__(self, devices: list[SimulatedDevice], host: str = "127.0.0.1") -> None:
+        """Initialize; nothing listens until start()."""
+        self.devices = devices
+        self.host = host
+        self.addresses: list[str] = []
+        self._runners: list[web.AppRunner] = []
+
+    @classmethod
+    def build(
+        cls,
+        count: int,
+        pin: str = "123456",
+        model: str = MOTION_MODEL,
+        faults: Faults | None = None,
+        host: str = "127.0.0.1",
+    ) -> SimulatedFleet:
+        """Make a fleet of identical devices (other than their MACs)."""
+        return cls(
+            [
+                SimulatedDevice(
+                    pin,
+                    model,
+                    mac_address="B0:C5:54:"
+                    + ":".join(f"{byte:02X}" for byte in index.to_bytes(3)),
+                    faults=faults or Faults(),
+                )
+                for index in range(count)
+            ],
+            host,
+        )
+
+    async def start(self, base_port: int = 0) -> None:
+        """
+        Start serving every device, on consecutive ports from base_port (or on
+        whatever ports the OS hands out, for 0).
+        """
+        for index, device in enumerate(self.devices):
+            runner = web.AppRunner(device.application(), access_log=None)
+            await runner.setup()
+            site = web.TCPSite(
+                runner,
+                self.host,
+                base_port + index if base_port else 0,
+            )
+            await site.start()
+            self._runners.append(runner)
+            port = runner.addresses[0][1]
+            self.addresses.append(f"{self.host}:{port}")
+
+    async def close(self) -> None:
+        """Stop serving."""
+        await asyncio.gather(*(runner.cleanup() for runner in self._runners))
+        self._runners.clear()
+        self.addresses.clear()
+
+    async def __aenter__(self) -> Self:
+        """Start serving, on ports handed out by the OS."""
+        await self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc: BaseException | None,
+        _tb: TracebackType | None,
+    ) -> None:
+        """Stop serving."""
+        await self.close()
+
+    def stats(self) -> dict[str, Any]:
+        """Return what the fleet has been asked to do."""
+        calls: Counter = Counter()
+        for device in self.devices:
+            calls.update(device.calls)
+        return {
+            "calls": dict(calls),
+            "dropped": sum(device.dropped for device in self.devices),
+            "reboots": sum(device.reboots for device in self.devices),
+        }
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    """Run a fleet until interrupted, making detections every so often."""
+    fleet = SimulatedFleet.build(
+        args.count,
+        args.pin,
+        args.model,
+        Faults(
+            latency=args.latency,
+            jitter=args.jitter,
+            drop_rate=args.drop_rate,
+            session_lifetime=args.session_lifetime,
+            reboot_seconds=args.reboot_seconds,
+        ),
+        args.host,
+    )
+    await fleet.start(args.base_port)
+    try:
+        _LOGGER.info("Serving %d devices, PIN %s:", args.count, args.pin)
+        for address in fleet.addresses:
+            _LOGGER.info("  %s", address)
+        while True:
+            await asyncio.sleep(args.detect_every or 3600)
+            if args.detect_every:
+                random.choice(fleet.devices).detect()  # noqa: S311
+                _LOGGER.debug("Calls so far: %s", fleet.stats())
+    finally:
+        await fleet.close()
+
+
+def serve_in_process(
+    count: int,
+    connection: Connection,
+    detect_every: float,
+    faults: Faults | None = None,
+) -> None:
+    """
+    Serve a fleet from this (child) process, so that it doesn't share a CPU or event
+    loop with whatever is being measured.  Sends the fleet's addresses down the
+    connection, then makes detections until anything is sent back, and replies with
+    the fleet's stats.  Each device detects every detect_every seconds on average,
+    always on a whole second, as that's all the device reports.
+    """
+    asyncio.run(_serve_in_process(count, connection, detect_every, faults))
+
+
+async def _serve_in_process(
+    count: int,
+    connection: Connection,
+    detect_every: float,
+    faults: Faults | None,
+) -> None:
+    """Serve the fleet for serve_in_process()."""
+    fleet = SimulatedFleet.build(count, faults=faults)
+    await fleet.start()
+    try:
+        connection.send(fleet.addresses)
+        while not connection.poll():
+            second = math.floor(time.time()) + 1
+            await asyncio.sleep(second - time.time())
+            for device in fleet.devices:
+                if random.random() * detect_every < 1:  # noqa: S311
+                    device.detect(second)
+        connection.send(fleet.stats())
+    finally:
+        await fleet.close()
+
+
+def main() -> None:
+    """Parse the command line and serve the fleet."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--count", type=int, default=1, help="Devices to simulate")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument(
+        "--base-port",
+        type=int,
+        default=18000,
+        help="Port of the first device; the rest follow on",
+    )
+    parser.add_argument("--pin", default="123456", help="PIN for every device")
+    parser.add_argument(
+        "--model",
+        choices=sorted(_DETECTOR_ACTIONS),
+        default=MOTION_MODEL,
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Seconds")
+    parser.add_argument(
+        "--drop-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests to hang up on",
+    )
+    parser.add_argument(
+        "--session-lifetime",
+        type=float,
+        default=None,
+        help="Seconds before a login expires",
+    )
+    parser.add_argument("--reboot-seconds", type=float, default=5.0)
+    parser.add_argument(
+        "--detect-every",
+        type=float,
+        default=10.0,
+        help="Seconds between detections (on a random device); 0 for never",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_serve(args))
+
+
+if __name__ == "__main__":
+    main()